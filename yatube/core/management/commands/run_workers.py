@@ -0,0 +1,64 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import tasks
+
+
+def serve(queue, worker, stop, once):
+    try:
+        return tasks.work(queue, worker, stop, once)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи: по потоку на каждое место очереди '
+        'из TASK_QUEUES'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Очередь для обработки; по умолчанию - все'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых к выполнению задач не останется'
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(settings.TASK_QUEUES)
+        unknown = [name for name in queues if name not in settings.TASK_QUEUES]
+        if unknown:
+            raise CommandError(f'Неизвестные очереди: {", ".join(unknown)}')
+        purged = tasks.purge()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        slots = [
+            (queue, f'{prefix}:{queue}:{number}')
+            for queue in queues
+            for number in range(settings.TASK_QUEUES[queue])
+        ]
+        stop = threading.Event()
+        with ThreadPoolExecutor(
+            max_workers=len(slots), thread_name_prefix='tasks'
+        ) as pool:
+            futures = [
+                pool.submit(serve, queue, worker, stop, options['once'])
+                for queue, worker in slots
+            ]
+            try:
+                done = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                # Потоки доделывают текущие задачи и выходят.
+                stop.set()
+                done = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {done}, удалено старых: {purged}'
+        ))
@@ -0,0 +1,75 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneError(Exception):
+    """Один и тот же запрос повторяется в рамках одного запроса к сайту."""
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем ему отведено."""
+
+
+class QueryInspector:
+    """
+    Считает SQL-запросы представления.
+
+    Запросы сравниваются по тексту SQL до подстановки параметров, поэтому
+    выборки в цикле вида «автор поста N» дают одну и ту же форму.
+    """
+
+    def __init__(self, action, threshold):
+        self.action = action
+        self.threshold = threshold
+        self.total = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.shapes[sql] += 1
+            if self.shapes[sql] == self.threshold:
+                self.report(
+                    NPlusOneError,
+                    f'Запрос повторен {self.threshold} раз: {sql}'
+                )
+        return execute(sql, params, many, context)
+
+    def report(self, error, message):
+        if self.action == 'raise':
+            raise error(message)
+        logger.warning(message)
+
+
+class QueryInspectorMiddleware:
+    """
+    Ищет N+1 и следит за бюджетом запросов по имени URL.
+
+    QUERY_INSPECTOR_ACTION: 'log', 'raise' или None (проверка отключена).
+    QUERY_BUDGETS: максимальное число запросов для имени URL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        action = getattr(settings, 'QUERY_INSPECTOR_ACTION', None)
+        if action is None:
+            return self.get_response(request)
+        inspector = QueryInspector(action, settings.NPLUSONE_THRESHOLD)
+        with connection.execute_wrapper(inspector):
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = settings.QUERY_BUDGETS.get(match and match.view_name)
+        if budget is not None and inspector.total > budget:
+            inspector.report(
+                QueryBudgetExceeded,
+                f'{match.view_name}: {inspector.total} запросов '
+                f'при бюджете {budget}'
+            )
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Функция')),
+                ('queue', models.CharField(max_length=50, verbose_name='Очередь')),
+                ('args', models.TextField(default='[]', verbose_name='Аргументы в JSON')),
+                ('key', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ключ идемпотентности')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Не выполнена')], default='queued', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Число попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(verbose_name='Предел попыток')),
+                ('run_at', models.DateTimeField(verbose_name='Выполнить не раньше')),
+                ('slot', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Место')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занята до')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Обработчик')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['queue', 'status', 'run_at'], name='core_task_queue_status_run_at'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('queue', 'slot'), name='core_task_queue_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, status='failed'), fields=('key',), name='core_task_key'),
+        ),
+    ]
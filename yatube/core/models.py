@@ -0,0 +1,64 @@
+from django.db import models
+
+
+class Task(models.Model):
+    """Фоновая задача: вызов функции из реестра core.tasks."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Функция', max_length=255)
+    queue = models.CharField('Очередь', max_length=50)
+    args = models.TextField('Аргументы в JSON', default='[]')
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=255,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField('Число попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Предел попыток')
+    run_at = models.DateTimeField('Выполнить не раньше')
+    # Место выполняющейся задачи среди TASK_QUEUES[queue] мест очереди.
+    slot = models.PositiveSmallIntegerField('Место', null=True, blank=True)
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    worker = models.CharField('Обработчик', max_length=100, blank=True)
+    error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['queue', 'slot'],
+                name='core_task_queue_slot'
+            ),
+            # Упавшая задача не мешает поставить ее снова.
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=~models.Q(status='failed'),
+                name='core_task_key'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['queue', 'status', 'run_at'],
+                name='core_task_queue_status_run_at'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.queue}:{self.name}:{self.pk}'
@@ -0,0 +1,223 @@
+"""
+Фоновые задачи в таблице Task без внешнего брокера.
+
+Функция-задача помечается декоратором task и ставится в очередь
+enqueue() той же транзакцией, что и данные запроса: откат запроса
+отменяет и задачу. Задачи выполняет команда run_workers.
+
+Очередь выполняет одновременно не больше TASK_QUEUES[queue] задач во
+всех процессах: выполняющаяся задача занимает одно из мест очереди, а
+место защищено уникальным ключом (queue, slot). Упавшая задача
+повторяется через растущую паузу, пока не кончатся попытки; задача
+процесса, который умер, снова доступна после TASK_LEASE_TIMEOUT.
+Ключ идемпотентности не дает поставить ту же задачу дважды, пока она
+ждет, выполняется или, выполненная, хранится (TASK_RETENTION); задачу,
+которая исчерпала попытки, с тем же ключом можно поставить снова.
+Ошибка базы в цикле обработчика, например занятая SQLite, не
+останавливает его: обработчик пишет ее в лог и ждет.
+"""
+import json
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+from importlib import import_module
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import (DatabaseError, IntegrityError, close_old_connections,
+                       transaction)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry: Dict[str, Callable] = {}
+
+
+def task(queue: str = 'default',
+         max_attempts: Optional[int] = None) -> Callable:
+    """Регистрирует функцию как задачу очереди queue."""
+    def decorator(func: Callable) -> Callable:
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.task_queue = queue
+        func.task_max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+    return decorator
+
+
+def resolve(name: str) -> Callable:
+    """Задача по имени; модуль импортируется, чтобы она зарегистрировалась."""
+    if name not in _registry:
+        import_module(name.rpartition('.')[0])
+    return _registry[name]
+
+
+def enqueue(func: Callable, *args: Any, key: Optional[str] = None,
+            delay: float = 0) -> None:
+    """
+    Ставит func(*args) в очередь; аргументы должны сохраняться в JSON.
+
+    Задача с тем же key, которая еще хранится и не упала окончательно,
+    повторно не ставится.
+    При TASKS_EAGER задача выполняется сразу.
+    """
+    payload = json.dumps(args)
+    if settings.TASKS_EAGER:
+        func(*json.loads(payload))
+        return
+    Task.objects.bulk_create([Task(
+        name=func.task_name,
+        queue=func.task_queue,
+        args=payload,
+        key=key,
+        max_attempts=func.task_max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+def backoff(attempts: int) -> float:
+    """Пауза перед повтором: удвоение с разбросом от половины до целой."""
+    delay = min(
+        settings.TASK_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASK_RETRY_DELAY_MAX,
+    )
+    return random.uniform(delay / 2, delay)
+
+
+def _take(task_obj: Task, slot: int, worker: str) -> bool:
+    """Захватывает задачу, если ее не изменили и место свободно."""
+    now = timezone.now()
+    changes = {
+        'status': Task.RUNNING,
+        'slot': slot,
+        'worker': worker,
+        'locked_until': now + timedelta(seconds=settings.TASK_LEASE_TIMEOUT),
+        'updated_at': now,
+    }
+    try:
+        with transaction.atomic():
+            taken = Task.objects.filter(
+                pk=task_obj.pk, status=task_obj.status,
+                attempts=task_obj.attempts,
+            ).update(attempts=F('attempts') + 1, **changes)
+    except IntegrityError:
+        # Место заняла задача другого процесса.
+        return False
+    if taken:
+        task_obj.attempts += 1
+        for field, value in changes.items():
+            setattr(task_obj, field, value)
+    return bool(taken)
+
+
+def claim(queue: str, worker: str) -> Optional[Task]:
+    """Следующая задача очереди или None, если задач или мест нет."""
+    now = timezone.now()
+    tasks = Task.objects.filter(queue=queue)
+    # Брошенная задача забирается вместе со своим местом.
+    stale = tasks.filter(
+        status=Task.RUNNING, locked_until__lte=now
+    ).order_by('locked_until').first()
+    if stale is not None and stale.attempts < stale.max_attempts:
+        return stale if _take(stale, stale.slot, worker) else None
+    if stale is not None:
+        # Попыток не осталось: задача не выполнена, место свободно.
+        _finish(
+            stale, status=Task.FAILED,
+            error='Обработчик не завершил задачу за TASK_LEASE_TIMEOUT',
+        )
+    taken = set(tasks.filter(status=Task.RUNNING).values_list(
+        'slot', flat=True
+    ))
+    free = [
+        slot for slot in range(settings.TASK_QUEUES[queue])
+        if slot not in taken
+    ]
+    if not free:
+        return None
+    pending = tasks.filter(status=Task.QUEUED, run_at__lte=now).order_by(
+        'run_at', 'pk'
+    ).first()
+    if pending is None or not _take(pending, free[0], worker):
+        return None
+    return pending
+
+
+def _finish(task_obj: Task, **changes: Any) -> None:
+    # Задачу, отобранную по истечении срока, уже ведет другой обработчик.
+    Task.objects.filter(
+        pk=task_obj.pk, worker=task_obj.worker, attempts=task_obj.attempts
+    ).update(
+        slot=None, locked_until=None, updated_at=timezone.now(), **changes
+    )
+
+
+def execute(task_obj: Task) -> bool:
+    """Выполняет захваченную задачу; при ошибке назначает повтор."""
+    try:
+        resolve(task_obj.name)(*json.loads(task_obj.args))
+    except Exception:
+        logger.exception('Задача %s упала', task_obj)
+        error = traceback.format_exc()
+        if task_obj.attempts < task_obj.max_attempts:
+            _finish(
+                task_obj, status=Task.QUEUED, error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=backoff(task_obj.attempts)
+                ),
+            )
+        else:
+            _finish(task_obj, status=Task.FAILED, error=error)
+        return False
+    _finish(task_obj, status=Task.DONE, error='')
+    return True
+
+
+def work(queue: str, worker: str, stop: Optional[threading.Event] = None,
+         once: bool = False) -> int:
+    """
+    Цикл обработчика очереди; возвращает число выполненных задач.
+
+    once - выйти, как только задач, готовых к выполнению, не осталось.
+    """
+    stop = stop or threading.Event()
+    done = 0
+    errors = 0
+    while not stop.is_set():
+        # Как между запросами: соединение, которое упало или устарело,
+        # открывается заново; внутри чужой транзакции его не трогаем.
+        if not transaction.get_connection().in_atomic_block:
+            close_old_connections()
+        try:
+            task_obj = claim(queue, worker)
+            if task_obj is not None:
+                done += execute(task_obj)
+        except DatabaseError:
+            # Задача, которую не удалось завершить, вернется в очередь
+            # по истечении TASK_LEASE_TIMEOUT.
+            errors += 1
+            logger.exception('Обработчик %s: ошибка базы', worker)
+            if once:
+                break
+            stop.wait(backoff(errors))
+            continue
+        errors = 0
+        if task_obj is None:
+            if once:
+                break
+            stop.wait(settings.TASK_POLL_INTERVAL)
+    return done
+
+
+def purge() -> int:
+    """Удаляет завершенные и упавшие задачи старше TASK_RETENTION."""
+    deadline = timezone.now() - timedelta(seconds=settings.TASK_RETENTION)
+    deleted, _ = Task.objects.filter(
+        status__in=(Task.DONE, Task.FAILED), updated_at__lt=deadline
+    ).delete()
+    return deleted
@@ -0,0 +1,18 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    В тестах N+1 и превышение бюджета запросов - ошибки, а не записи
+    в лог, которые никто не читает.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(QUERY_INSPECTOR_ACTION='raise')
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment, Follow
 
 
@@ -16,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=search.matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'description',)
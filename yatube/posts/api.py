@@ -0,0 +1,380 @@
+"""
+JSON API чтения: посты, группы, профили, комментарии и лента подписок.
+
+Списки листаются по ключу (дата, id): курсоры ?after= и ?before= берутся
+из links, ?limit= - размер страницы. Проекции ?fields= и ?include=
+описаны в serializers. ETag и Last-Modified строятся теми же
+валидаторами, что и у HTML-страниц, без запроса самого ответа.
+Адреса /since/ отдают только посты новее ?since_id= или ?since_ts=,
+а пока новых нет - 204 по отметке ленты в кэше (см. feeds).
+"""
+import re
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_safe
+
+from . import batch, feeds
+from .conditional import (conditional_page, follow_validators,
+                          group_validators, groups_validators,
+                          index_validators, post_validators,
+                          profile_stats_validators, profile_validators,
+                          with_comments)
+from .middleware import page_cache_exempt
+from .models import Comment, Group, Post, User
+from .serializers import (COMMENTS, GROUPS, POSTS, USERS, InvalidQuery,
+                          Projection, Resource, names)
+from .timeline import follow_rows
+from .utils import (CURSOR_AFTER, CURSOR_BEFORE, ValuesCursorPaginator,
+                    decode_cursor)
+
+
+# Только ASCII-цифры: str.isdigit() пропускает и '²', на котором int() падает.
+DIGITS = re.compile(r'[0-9]+')
+# Наибольший ключ, который поместится в колонку BigAutoField.
+ID_MAX = 2 ** 63 - 1
+
+
+def _response(payload: Dict, status: int = 200) -> JsonResponse:
+    return JsonResponse(
+        payload, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _error(message: str, status: int) -> JsonResponse:
+    return _response({'errors': [message]}, status)
+
+
+def api_view(view: Callable) -> Callable:
+    """
+    Ошибки параметров запроса - ответ 400 с текстом ошибки.
+
+    Кэш страниц API не касается: его записи сбрасывает только поколение
+    постов, а ответы API зависят и от групп, профилей и комментариев.
+    Повторные запросы API экономят на ETag.
+    """
+    @wraps(view)
+    def wrapper(request: Any, *args: Any, **kwargs: Any) -> JsonResponse:
+        try:
+            return view(request, *args, **kwargs)
+        except InvalidQuery as error:
+            return _error(str(error), 400)
+    return page_cache_exempt(wrapper)
+
+
+def _projection(request: Any, resource: Resource,
+                prefix: str = '') -> Projection:
+    return Projection(
+        resource,
+        resource.parse_fields(request.GET.get('fields')),
+        resource.parse_include(request.GET.get('include')),
+        prefix,
+    )
+
+
+def _integer(value: str, low: int, high: int) -> Optional[int]:
+    """Число от low до high или None, если value не такое число."""
+    # Длина проверяется до int(): тысячи цифр - это ValueError
+    # из-за предела длины строки, а не число вне диапазона.
+    if not DIGITS.fullmatch(value) or len(value) > len(str(high)):
+        return None
+    number = int(value)
+    return number if low <= number <= high else None
+
+
+def _limit(request: Any) -> int:
+    value = request.GET.get('limit')
+    if not value:
+        return settings.API_PAGE_SIZE
+    limit = _integer(value, 1, settings.API_PAGE_SIZE_MAX)
+    if limit is None:
+        raise InvalidQuery(
+            f'limit - число от 1 до {settings.API_PAGE_SIZE_MAX}'
+        )
+    return limit
+
+
+def _ids(request: Any) -> List[int]:
+    values = names(request.GET.get('ids'))
+    if len(values) > settings.API_BATCH_SIZE:
+        raise InvalidQuery(
+            f'Не больше {settings.API_BATCH_SIZE} id за запрос'
+        )
+    ids = [_integer(value, 1, ID_MAX) for value in values]
+    if None in ids:
+        raise InvalidQuery(
+            f'ids - список чисел от 1 до {ID_MAX} через запятую'
+        )
+    return list(dict.fromkeys(ids))
+
+
+def _since(request: Any) -> Tuple[Optional[int], Optional[datetime]]:
+    since_id = request.GET.get('since_id')
+    since_ts = request.GET.get('since_ts')
+    if since_id is None and since_ts is None:
+        raise InvalidQuery('Нужен since_id или since_ts')
+    if since_id is not None:
+        since_id = _integer(since_id, 0, ID_MAX)
+        if since_id is None:
+            raise InvalidQuery(f'since_id - число от 0 до {ID_MAX}')
+    if since_ts is not None:
+        try:
+            since_ts = parse_datetime(since_ts)
+        except ValueError:
+            since_ts = None
+        if since_ts is None:
+            raise InvalidQuery('since_ts - дата и время в ISO 8601')
+        if timezone.is_naive(since_ts):
+            since_ts = timezone.make_aware(since_ts)
+    return since_id, since_ts
+
+
+def _link(request: Any, key: str, cursor: Optional[str]) -> Optional[str]:
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop(CURSOR_AFTER, None)
+    query.pop(CURSOR_BEFORE, None)
+    query[key] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def _list(request: Any, rows: Any, resource: Resource,
+          key_fields: Tuple[str, str] = ('pub_date', 'pk'),
+          prefix: str = '') -> JsonResponse:
+    projection = _projection(request, resource, prefix)
+    paginator = ValuesCursorPaginator(
+        rows.values_list(*projection.columns, *key_fields),
+        _limit(request), key_fields
+    )
+    before = decode_cursor(request.GET.get(CURSOR_BEFORE))
+    if before is not None:
+        page = paginator.page_before(before)
+    else:
+        page = paginator.page_after(
+            decode_cursor(request.GET.get(CURSOR_AFTER))
+        )
+    data, included = projection.serialize(page.object_list)
+    return _response({
+        'data': data,
+        'included': included,
+        'links': {
+            'next': _link(request, CURSOR_AFTER, page.next_cursor),
+            'previous': _link(request, CURSOR_BEFORE, page.previous_cursor),
+        },
+    })
+
+
+def _detail(request: Any, rows: Any, resource: Resource) -> JsonResponse:
+    projection = _projection(request, resource)
+    row = rows.values_list(*projection.columns).first()
+    if row is None:
+        return _error('Не найдено', 404)
+    data, included = projection.serialize([row])
+    return _response({'data': data[0], 'included': included})
+
+
+def _delta(request: Any, feed: str, source: Callable) -> HttpResponse:
+    """
+    Посты ленты новее since_id и since_ts по возрастанию id.
+
+    Пока отметка ленты в кэше не новее запроса, ответ - 204 без
+    обращения к базе.
+    """
+    since_id, since_ts = _since(request)
+    fields = POSTS.parse_fields(request.GET.get('fields'))
+    include = POSTS.parse_include(request.GET.get('include'))
+    limit = _limit(request)
+    head = feeds.get_head(feed, source)
+    if not feeds.has_newer(head, since_id, since_ts):
+        return HttpResponse(status=204)
+    rows, id_field, prefix, _ = source()
+    if since_id is not None:
+        rows = rows.filter(**{f'{id_field}__gt': since_id})
+    if since_ts is not None:
+        rows = rows.filter(pub_date__gt=since_ts)
+    projection = Projection(POSTS, fields, include, prefix)
+    found = list(rows.order_by(id_field).values_list(
+        *projection.columns, id_field
+    )[:limit + 1])
+    data, included = projection.serialize(found[:limit])
+    return _response({
+        'data': data,
+        'included': included,
+        'head': {'id': head['id'], 'pub_date': head['pub_date']},
+        'links': {
+            'next': _link(
+                request, 'since_id',
+                str(found[limit - 1][-1]) if len(found) > limit else None
+            ),
+        },
+    })
+
+
+def _follow_source(user: Any) -> feeds.Source:
+    rows, pull_authors = follow_rows(user)
+    if not pull_authors:
+        return feeds.Source(rows, id_field='post_id', prefix='post__')
+    return feeds.Source(rows, depends=tuple(
+        feeds.author(author_id) for author_id in pull_authors
+    ))
+
+
+def _group_id(slug: str) -> Optional[int]:
+    return Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+
+
+def _user_id(username: str) -> Optional[int]:
+    return User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+
+
+@require_safe
+@conditional_page(with_comments(index_validators))
+@api_view
+def post_list(request):
+    return _list(request, Post.objects.all(), POSTS)
+
+
+@require_safe
+@api_view
+def post_batch(request):
+    """Посты по ?ids=1,2,3 с авторами и группами; missing - ненайденные."""
+    post_ids = _ids(request)
+    found = batch.get_posts(post_ids)
+    entries = [found[pk] for pk in post_ids if pk in found]
+    users = {entry['author']['id']: entry['author'] for entry in entries}
+    groups = {
+        entry['group']['id']: entry['group']
+        for entry in entries if entry['group']
+    }
+    return _response({
+        'data': [entry['post'] for entry in entries],
+        'included': {
+            USERS.name: list(users.values()),
+            GROUPS.name: list(groups.values()),
+        },
+        'missing': [pk for pk in post_ids if pk not in found],
+    })
+
+
+@require_safe
+@conditional_page(post_validators)
+@api_view
+def post_detail(request, post_id):
+    return _detail(request, Post.objects.filter(pk=post_id), POSTS)
+
+
+@require_safe
+@conditional_page(post_validators)
+@api_view
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден', 404)
+    return _list(
+        request, Comment.objects.filter(post_id=post_id), COMMENTS,
+        key_fields=('created', 'pk')
+    )
+
+
+@require_safe
+@conditional_page(groups_validators)
+@api_view
+def group_list(request):
+    projection = _projection(request, GROUPS)
+    data, included = projection.serialize(
+        Group.objects.order_by('title').values_list(*projection.columns)
+    )
+    return _response({'data': data, 'included': included})
+
+
+@require_safe
+@conditional_page(group_validators)
+@api_view
+def group_detail(request, slug):
+    return _detail(request, Group.objects.filter(slug=slug), GROUPS)
+
+
+@require_safe
+@conditional_page(with_comments(group_validators))
+@api_view
+def group_post_list(request, slug):
+    group_id = _group_id(slug)
+    if group_id is None:
+        return _error('Группа не найдена', 404)
+    return _list(request, Post.objects.filter(group_id=group_id), POSTS)
+
+
+@require_safe
+@conditional_page(profile_stats_validators)
+@api_view
+def profile_detail(request, username):
+    return _detail(request, User.objects.filter(username=username), USERS)
+
+
+@require_safe
+@conditional_page(with_comments(profile_validators))
+@api_view
+def profile_post_list(request, username):
+    user_id = _user_id(username)
+    if user_id is None:
+        return _error('Пользователь не найден', 404)
+    return _list(request, Post.objects.filter(author_id=user_id), POSTS)
+
+
+@require_safe
+@conditional_page(with_comments(follow_validators))
+@api_view
+def follow_list(request):
+    if not request.user.is_authenticated:
+        return _error('Нужна авторизация', 401)
+    rows, pull_authors = follow_rows(request.user)
+    if not pull_authors:
+        return _list(
+            request, rows, POSTS,
+            key_fields=('pub_date', 'post_id'), prefix='post__'
+        )
+    return _list(request, rows, POSTS)
+
+
+@require_safe
+@api_view
+def post_since(request):
+    return _delta(
+        request, feeds.POSTS, lambda: feeds.Source(Post.objects.all())
+    )
+
+
+@require_safe
+@api_view
+def group_post_since(request, slug):
+    return _delta(request, feeds.group(slug), lambda: feeds.Source(
+        Post.objects.filter(group__slug=slug)
+    ))
+
+
+@require_safe
+@api_view
+def profile_post_since(request, username):
+    return _delta(request, feeds.profile(username), lambda: feeds.Source(
+        Post.objects.filter(author__username=username)
+    ))
+
+
+@require_safe
+@api_view
+def follow_since(request):
+    if not request.user.is_authenticated:
+        return _error('Нужна авторизация', 401)
+    return _delta(
+        request, feeds.follow(request.user.pk),
+        lambda: _follow_source(request.user)
+    )
@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(using, **kwargs):
+    from . import search
+    search.restore_triggers(connections[using])
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from sorl.thumbnail.base import EXTENSIONS
+
+        from . import signals  # noqa: F401
+        post_migrate.connect(restore_search_triggers, sender=self)
+        # sorl знает расширения только JPEG, PNG, GIF и WEBP и берет
+        # расширение миниатюры из этого словаря модуля, а не из настроек.
+        # Добавляем AVIF один раз при запуске, а не при импорте thumbnails.
+        EXTENSIONS.setdefault('AVIF', 'avif')
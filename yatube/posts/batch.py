@@ -0,0 +1,87 @@
+"""
+Пакетная выдача постов по списку id для JSON API.
+
+Сериализованный пост лежит в кэше под ключом по id вместе с версией
+карточки - поколениями его автора и группы. Пачка читается одним
+get_many постов и одним get_many поколений; промахи и устаревшие записи
+добираются одним in_bulk с авторами и группами и кладутся обратно одним
+set_many. Изменение поста или его комментариев удаляет запись сигналом.
+"""
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import generations
+from .models import Post
+from .serializers import GROUPS, POSTS, USERS
+
+PREFIX = 'api-post'
+
+Entry = Dict[str, Dict]
+
+
+def key(post_id: int) -> str:
+    return f'{PREFIX}:{post_id}'
+
+
+def forget(*post_ids: int) -> None:
+    cache.delete_many([key(pk) for pk in post_ids])
+
+
+def _card(entry: Entry) -> tuple:
+    return entry['post']['author'], entry['post']['group']
+
+
+def _columns() -> List[str]:
+    return (
+        [POSTS.columns[name] for name in POSTS.default]
+        + [f'author__{USERS.columns[name]}' for name in USERS.included]
+        + [f'group__{GROUPS.columns[name]}' for name in GROUPS.included]
+    )
+
+
+def _load(post_ids: List[int]) -> Dict[int, Entry]:
+    posts = Post.objects.select_related('author', 'group').only(
+        *_columns()
+    ).in_bulk(post_ids)
+    return {
+        pk: {
+            'post': POSTS.dump(post, POSTS.default),
+            'author': USERS.dump(post.author, USERS.included),
+            'group': post.group and GROUPS.dump(post.group, GROUPS.included),
+        }
+        for pk, post in posts.items()
+    }
+
+
+def get_posts(post_ids: Iterable[int]) -> Dict[int, Entry]:
+    """Записи {'post', 'author', 'group'} найденных постов по id."""
+    post_ids = list(post_ids)
+    cached = cache.get_many([key(pk) for pk in post_ids])
+    versions = generations.card_versions(
+        _card(entry) for entry in cached.values()
+    )
+    found = {
+        entry['post']['id']: entry for entry in cached.values()
+        if entry['version'] == versions[_card(entry)]
+    }
+    missing = [pk for pk in post_ids if pk not in found]
+    if not missing:
+        return found
+    loaded = _load(missing)
+    # Автора и группу поста до чтения из базы не знаем, поэтому версия
+    # читается после него. Переименование в этот промежуток оставит
+    # устаревшую запись самое большее на POST_CACHE_TIMEOUT
+    # (в кэше процесса - на LOCAL_CACHE_TIMEOUT).
+    versions = generations.card_versions(
+        _card(entry) for entry in loaded.values()
+    )
+    for entry in loaded.values():
+        entry['version'] = versions[_card(entry)]
+    cache.set_many(
+        {key(pk): entry for pk, entry in loaded.items()},
+        generations.timeout(settings.POST_CACHE_TIMEOUT)
+    )
+    found.update(loaded)
+    return found
@@ -0,0 +1,181 @@
+"""
+Условный GET для страниц чтения.
+
+Валидаторы строятся по поколениям кэша фрагментов и счетчикам, не выполняя
+запрос страницы: на If-None-Match / If-Modified-Since клиент получает 304
+после одного обращения к кэшу и, самое большее, одного запроса по индексу.
+Страница зависит от того, кто ее смотрит, поэтому в ETag входит
+пользователь, а ответ варьируется по Cookie.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from . import generations
+from .models import Comment, Group, Post, User
+
+Validators = Tuple[Optional[str], Optional[datetime]]
+
+
+def _variant(request: Any) -> str:
+    """Часть ETag, зависящая от посетителя и адреса страницы."""
+    return '|'.join((
+        str(request.user.pk or ''),
+        request.GET.urlencode(),
+        str(timezone.now().year),
+    ))
+
+
+def _etag(request: Any, *parts: Any) -> str:
+    raw = '|'.join(map(str, parts + (_variant(request),)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _from_generations(request: Any, *namespaces: str) -> Validators:
+    version, last_modified = generations.validators(namespaces)
+    return _etag(request, version), last_modified
+
+
+def index_validators(request: Any) -> Validators:
+    return _from_generations(request, generations.POSTS)
+
+
+def group_validators(request: Any, slug: str) -> Validators:
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None, None
+    return _from_generations(
+        request, generations.group(group_id), generations.USERS
+    )
+
+
+def profile_validators(request: Any, username: str) -> Validators:
+    user_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if user_id is None:
+        return None, None
+    namespaces = [generations.profile(user_id), generations.GROUPS]
+    if request.user.is_authenticated:
+        # Кнопка подписки зависит от подписок самого посетителя.
+        namespaces.append(generations.follow(request.user.pk))
+    return _from_generations(request, *namespaces)
+
+
+def profile_stats_validators(request: Any, username: str) -> Validators:
+    """
+    Профиль со счетчиками подписок: подписка меняет поколение подписчика,
+    а не автора, поэтому счетчики входят в ETag сами. Без даты изменения:
+    по одному If-Modified-Since новый счетчик не был бы замечен.
+    """
+    row = User.objects.filter(username=username).values_list(
+        'pk', 'stats__followers_count', 'stats__following_count'
+    ).first()
+    if row is None:
+        return None, None
+    user_id, *counts = row
+    version, _ = generations.validators((
+        generations.profile(user_id), generations.author(user_id)
+    ))
+    return _etag(request, version, *counts), None
+
+
+def groups_validators(request: Any) -> Validators:
+    # Число постов группы меняется вместе с поколением постов.
+    return _from_generations(request, generations.GROUPS, generations.POSTS)
+
+
+def follow_validators(request: Any) -> Validators:
+    if not request.user.is_authenticated:
+        return None, None
+    return _from_generations(
+        request, generations.POSTS, generations.follow(request.user.pk)
+    )
+
+
+def with_comments(validators: Callable[..., Validators]) -> Callable:
+    """
+    Валидаторы списка постов API: в постах есть comments_count, а
+    комментарий поколения страниц не меняет.
+    """
+    @wraps(validators)
+    def wrapper(request: Any, *args: Any, **kwargs: Any) -> Validators:
+        etag, last_modified = validators(request, *args, **kwargs)
+        if etag is None:
+            return None, None
+        version, modified = generations.validators((generations.COMMENTS,))
+        return _etag(request, etag, version), max(
+            date for date in (last_modified, modified) if date
+        )
+    return wrapper
+
+
+def post_validators(request: Any, post_id: int) -> Validators:
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-created').values('created')[:1]
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list(
+        'author_id', 'group_id', 'updated_at', 'comments_count',
+        'last_comment'
+    ).order_by().first()
+    if row is None:
+        return None, None
+    author_id, group_id, updated_at, comments_count, last_comment = row
+    version, modified = generations.validators((
+        generations.profile(author_id),
+        generations.author(author_id),
+        group_id and generations.group_info(group_id),
+        generations.USERS,
+    ))
+    last_modified = max(
+        date for date in (updated_at, last_comment, modified) if date
+    )
+    return (
+        _etag(request, version, updated_at.timestamp(), comments_count),
+        last_modified,
+    )
+
+
+def feed_validators(validators: Callable[..., Validators]) -> Callable:
+    """Валидаторы страницы для ленты того же объекта в формате feed_format."""
+    def get(request: Any, feed_format: str, **kwargs: Any) -> Validators:
+        etag, last_modified = validators(request, **kwargs)
+        if etag is None:
+            return None, None
+        return _etag(request, etag, feed_format), last_modified
+    return get
+
+
+def conditional_page(validators: Callable[..., Validators]) -> Callable:
+    """
+    condition() с валидаторами, вычисляемыми один раз на запрос.
+
+    Для несуществующих объектов валидаторов нет, и представление само
+    отвечает 404.
+    """
+    def get(request: Any, *args: Any, **kwargs: Any) -> Validators:
+        if not hasattr(request, '_validators'):
+            request._validators = validators(request, *args, **kwargs)
+        return request._validators
+
+    def etag(*args: Any, **kwargs: Any) -> Optional[str]:
+        return get(*args, **kwargs)[0]
+
+    def last_modified(*args: Any, **kwargs: Any) -> Optional[datetime]:
+        return get(*args, **kwargs)[1]
+
+    def decorator(view: Callable) -> Callable:
+        conditional_view = condition(etag, last_modified)(view)
+        return wraps(view)(vary_on_cookie(conditional_view))
+
+    return decorator
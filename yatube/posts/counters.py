@@ -0,0 +1,104 @@
+"""
+Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются F-выражениями в сигналах моделей, поэтому страницы
+профиля и поста выводят «Всего постов» без агрегирующих запросов.
+Расхождения исправляет команда reconcile_counters. Строки UserStats
+нет у пользователей, загруженных loaddata: ее создают при первом
+увеличении счетчика, а страницы до этого считают посты сами.
+"""
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def bump(model, pk, field, delta=1):
+    if pk is None:
+        return
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    return rows.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta=1):
+    bump_users([user_id], field, delta)
+
+
+def bump_users(user_ids, field, delta=1):
+    """bump_user для многих пользователей одним UPDATE."""
+    user_ids = [pk for pk in user_ids if pk is not None]
+    if not user_ids:
+        return
+    rows = global_apps.get_model('posts', 'UserStats').objects.filter(
+        pk__in=user_ids
+    )
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    # Уменьшать счетчик без строки незачем: это и удаление пользователя,
+    # которому строку создавать нельзя.
+    if rows.update(**{field: F(field) + delta}) < len(user_ids) and delta > 0:
+        # Новая строка считается по данным, где изменение уже есть.
+        create_user_stats(user_ids)
+
+
+def create_user_stats(user_ids=None, apps=global_apps):
+    """Создает недостающие строки UserStats со счетчиками по данным."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    users = User.objects.filter(stats__isnull=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=list(user_ids))
+    missing = list(users.values_list('pk', flat=True))
+    if not missing:
+        return
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing], ignore_conflicts=True
+    )
+    UserStats.objects.filter(pk__in=missing).update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+
+
+def posts_count(user):
+    """Число постов пользователя: из UserStats или, без строки, COUNT."""
+    stats = getattr(user, 'stats', None)
+    if stats is None:
+        return user.posts.count()
+    return stats.posts_count
+
+
+def _count(model, field):
+    """Подзапрос числа строк model, ссылающихся на внешнюю строку."""
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def reconcile(apps=global_apps):
+    """Пересчитывает все счетчики по фактическим данным."""
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    create_user_stats(apps=apps)
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
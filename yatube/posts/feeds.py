@@ -0,0 +1,125 @@
+"""
+Отметки самых новых постов лент для клиентов, опрашивающих обновления.
+
+Отметка ленты - наибольшие id и дата публикации ее постов - хранится в
+кэше вместе с версией поколений ленты, при которой посчитана. Новый пост
+обновляет поколения лент, куда попал, сразу и еще раз после фиксации
+транзакции: отметка, посчитанная по базе до фиксации, не переживет
+второго обновления. Поэтому опрос, пока новых постов нет, - один
+get_many отметки и поколений, без запросов к базе.
+
+Так только с общим кэшем. В LocMemCache пост, добавленный другим
+процессом, поколений этого процесса не меняет, поэтому там отметка
+живет FEED_HEAD_LOCAL_TIMEOUT секунд и затем пересчитывается одним
+MAX(id) по индексу.
+
+Ленты групп и профилей называются по slug и username, чтобы опрос не
+искал id в базе; лента подписок зависит еще и от лент популярных авторов,
+чьи посты не раскладываются по Timeline.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from . import generations
+
+# Общее поколение всех лент: пересборка лент и импорт сбрасывают все
+# отметки разом.
+EPOCH = 'feed'
+POSTS = 'feed:posts'
+
+Head = Dict[str, Any]
+
+
+def group(slug: str) -> str:
+    return f'feed:group:{slug}'
+
+
+def profile(username: str) -> str:
+    return f'feed:profile:{username}'
+
+
+def author(user_id: int) -> str:
+    """Посты автора для лент подписчиков: по id, username может смениться."""
+    return f'feed:author:{user_id}'
+
+
+def follow(user_id: int) -> str:
+    return f'feed:follow:{user_id}'
+
+
+class Source(NamedTuple):
+    """Строки ленты: поле id поста, путь к посту и зависимые ленты."""
+    rows: Any
+    id_field: str = 'pk'
+    prefix: str = ''
+    depends: Tuple[str, ...] = ()
+
+
+def touch(*feeds: Optional[str]) -> None:
+    feeds = [feed for feed in feeds if feed]
+    generations.renew(*feeds)
+    transaction.on_commit(lambda: generations.renew(*feeds))
+
+
+def touch_post(post: Any, follower_ids: Iterable[int] = ()) -> None:
+    """Новый пост: глобальная лента, группа, автор и ленты подписчиков."""
+    touch(
+        POSTS,
+        profile(post.author.username),
+        author(post.author_id),
+        post.group_id and group(post.group.slug),
+        *(follow(user_id) for user_id in follower_ids)
+    )
+
+
+def _key(feed: str) -> str:
+    return f'feed-head:{feed}'
+
+
+def _timeout() -> int:
+    if generations.is_shared():
+        return settings.FEED_HEAD_TIMEOUT
+    return settings.FEED_HEAD_LOCAL_TIMEOUT
+
+
+def get_head(feed: str, source: Any) -> Head:
+    """
+    Отметка ленты {'id', 'pub_date'}; source() -> Source вызывается,
+    только если отметку нужно пересчитать.
+    """
+    key = _key(feed)
+    version, found = generations.read((EPOCH, feed), [key])
+    head = found.get(key)
+    if head is not None and head['version'] == version and (
+        not head['depends']
+        or generations.version(head['depends']) == head['depends_version']
+    ):
+        return head
+    # Поколения читаются до запросов к базе: пост, зафиксированный
+    # после чтения, поменяет их, и эта отметка больше не совпадет.
+    rows, id_field, _, depends = source()
+    head = {
+        'version': version,
+        'depends': depends,
+        'depends_version': depends and generations.version(depends),
+        **rows.order_by().aggregate(
+            id=Max(id_field), pub_date=Max('pub_date')
+        ),
+    }
+    cache.set(key, head, _timeout())
+    return head
+
+
+def has_newer(head: Head, since_id: Optional[int],
+              since_ts: Optional[datetime]) -> bool:
+    """Могут ли в ленте быть посты новее since_id и since_ts."""
+    if head['id'] is None:
+        return False
+    if since_id is not None and head['id'] <= since_id:
+        return False
+    return since_ts is None or head['pub_date'] > since_ts
@@ -0,0 +1,101 @@
+"""
+Подписка и отписка от многих авторов за одну операцию.
+
+Подписки вставляются одним bulk_create(ignore_conflicts=True), то есть
+INSERT ... ON CONFLICT DO NOTHING, а удаляются одним DELETE. Сигналы при
+этом не отправляются, поэтому счетчики, ленты и поколения кэша
+обновляются здесь же, в той же транзакции. Операции одного подписчика
+сериализуются блокировкой его строки UserStats: одновременные клики не
+упираются в ограничение user_author и не считают подписку дважды.
+"""
+from typing import Iterable, List
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import counters, feeds, generations, timeline
+from .models import Follow, UserStats
+
+
+def _lock(user_id: int) -> None:
+    """
+    Блокирует строку UserStats подписчика до конца транзакции.
+
+    Не select_for_update(), который SQLite пропускает, а UPDATE без
+    изменений: в PostgreSQL он так же блокирует строку, а в SQLite
+    первая запись транзакции берет блокировку записи всей базы.
+    """
+    counters.create_user_stats([user_id])
+    UserStats.objects.filter(pk=user_id).update(
+        following_count=F('following_count')
+    )
+
+
+def _delete(user_id: int, author_ids: List[int]) -> None:
+    """
+    Один DELETE подписок без сигналов post_delete.
+
+    delete() выбрал бы строки и для каждой повторил бы в обработчиках то,
+    что unfollow() делает разом: счетчики, ленту и поколения.
+    """
+    quote = connection.ops.quote_name
+    table = quote(Follow._meta.db_table)
+    user = quote(Follow._meta.get_field('user').column)
+    author = quote(Follow._meta.get_field('author').column)
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} '
+            f'WHERE {user} = %s AND {author} IN ({placeholders})',
+            [user_id, *author_ids]
+        )
+
+
+def follow(user_id: int, author_ids: Iterable[int]) -> List[int]:
+    """Подписывает user_id на авторов; возвращает новых авторов."""
+    author_ids = set(author_ids) - {user_id}
+    if not author_ids:
+        return []
+    with transaction.atomic():
+        _lock(user_id)
+        existing = set(Follow.objects.filter(
+            user_id=user_id, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        new = sorted(author_ids - existing)
+        if not new:
+            return []
+        # Посты популярных авторов подмешиваются при чтении ленты.
+        pull = timeline.pull_authors(new)
+        Follow.objects.bulk_create([
+            Follow(user_id=user_id, author_id=author_id,
+                   fanout=author_id not in pull)
+            for author_id in new
+        ], ignore_conflicts=True)
+        counters.bump_users(new, 'followers_count')
+        counters.bump_user(user_id, 'following_count', len(new))
+        timeline.backfill_authors(user_id, set(new) - pull)
+    generations.bump(generations.follow(user_id))
+    feeds.touch(feeds.follow(user_id))
+    return new
+
+
+def unfollow(user_id: int, author_ids: Iterable[int]) -> List[int]:
+    """Отписывает user_id от авторов; возвращает тех, от кого отписал."""
+    author_ids = set(author_ids)
+    if not author_ids:
+        return []
+    with transaction.atomic():
+        _lock(user_id)
+        rows = Follow.objects.filter(
+            user_id=user_id, author_id__in=author_ids
+        )
+        removed = sorted(rows.values_list('author_id', flat=True))
+        if not removed:
+            return []
+        _delete(user_id, removed)
+        counters.bump_users(removed, 'followers_count', -1)
+        counters.bump_user(user_id, 'following_count', -len(removed))
+        timeline.prune_authors(user_id, removed)
+    generations.bump(generations.follow(user_id))
+    feeds.touch(feeds.follow(user_id))
+    return removed
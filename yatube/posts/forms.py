@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Comment, Post
+from . import exporter
+from .images import ingest
+from .models import Comment, Group, Post, User
 
 
 class PostForm(forms.ModelForm):
@@ -16,8 +19,57 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class ExportForm(forms.Form):
+    """Параметры выгрузки: формат, диапазон дат, автор и группа."""
+    format = forms.ChoiceField(
+        choices=[(name, name) for name in exporter.CONTENT_TYPES],
+        required=False
+    )
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+    author = forms.CharField(required=False)
+    group = forms.SlugField(required=False)
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or exporter.NDJSON
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        pk = User.objects.filter(username=username).values_list(
+            'pk', flat=True
+        ).first()
+        if pk is None:
+            raise forms.ValidationError(f'Нет пользователя {username}')
+        return pk
+
+    def clean_group(self):
+        slug = self.cleaned_data['group']
+        if not slug:
+            return None
+        pk = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True
+        ).first()
+        if pk is None:
+            raise forms.ValidationError(f'Нет группы {slug}')
+        return pk
+
+    def filters(self):
+        return {
+            name: self.cleaned_data[name]
+            for name in ('since', 'until', 'author', 'group')
+        }
@@ -0,0 +1,215 @@
+"""
+Поколения кэша фрагментов.
+
+Ключ фрагмента включает номера поколений того, что в нем показано.
+Сигналы моделей увеличивают номер при изменении данных, и старый фрагмент
+просто перестает запрашиваться, поэтому фрагменты могут жить часами.
+
+Это верно, только если кэш общий для всех процессов. В LocMemCache
+у каждого процесса свои поколения, и изменение в одном процессе другие
+не видят; поэтому там поколения и все, что от них зависит, живут не
+дольше LOCAL_CACHE_TIMEOUT (см. timeout()).
+"""
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+PREFIX = 'generation'
+POSTS = 'posts'
+GROUPS = 'groups'
+USERS = 'users'
+# Комментарии: фрагменты страниц их числа не показывают, а посты API - да.
+COMMENTS = 'comments'
+
+
+def group(group_id: int) -> str:
+    return f'group:{group_id}'
+
+
+def profile(user_id: int) -> str:
+    return f'profile:{user_id}'
+
+
+def follow(user_id: int) -> str:
+    return f'follow:{user_id}'
+
+
+def author(user_id: int) -> str:
+    """Отображаемые данные автора: имя и username в карточках постов."""
+    return f'author:{user_id}'
+
+
+def group_info(group_id: int) -> str:
+    """Отображаемые данные группы: название и slug в карточках постов."""
+    return f'group-info:{group_id}'
+
+
+def is_shared() -> bool:
+    """Один ли кэш у всех процессов сайта."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def timeout(seconds: Optional[int] = None) -> Optional[int]:
+    """
+    Срок жизни в кэше значения, которое сбрасывает поколение.
+
+    В кэше процесса - не больше LOCAL_CACHE_TIMEOUT: так изменение,
+    сделанное в другом процессе, видно хотя бы с этой задержкой.
+    None - без срока, как у самих поколений в общем кэше.
+    """
+    if is_shared():
+        return seconds
+    if seconds is None:
+        return settings.LOCAL_CACHE_TIMEOUT
+    return min(seconds, settings.LOCAL_CACHE_TIMEOUT)
+
+
+def _key(namespace: str) -> str:
+    return f'{PREFIX}:{namespace}'
+
+
+def _modified_key(namespace: str) -> str:
+    return f'{PREFIX}-modified:{namespace}'
+
+
+def _fresh() -> int:
+    # Поколение, вытесненное из кэша, начинается с текущего времени,
+    # а не с единицы, чтобы не совпасть с уже закэшированными фрагментами.
+    return time.time_ns()
+
+
+def bump(*namespaces: Any) -> None:
+    for namespace in namespaces:
+        if namespace is None:
+            continue
+        try:
+            cache.incr(_key(namespace))
+        except ValueError:
+            cache.set(_key(namespace), _fresh(), timeout())
+    cache.set_many({
+        _modified_key(namespace): time.time()
+        for namespace in namespaces if namespace is not None
+    }, timeout())
+
+
+def _get(namespaces: Iterable[str]) -> Dict[str, int]:
+    keys = {namespace: _key(namespace) for namespace in namespaces}
+    found = cache.get_many(keys.values())
+    missing = {key: _fresh() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, timeout())
+        found.update(missing)
+    return {namespace: found[key] for namespace, key in keys.items()}
+
+
+def version(namespaces: Iterable[str]) -> str:
+    """Общая версия фрагмента по поколениям всех его пространств имен."""
+    return read(namespaces)[0]
+
+
+def read(namespaces: Iterable[str],
+         keys: Iterable[str] = ()) -> Tuple[str, Dict[str, Any]]:
+    """version() и значения ключей кэша keys одним get_many."""
+    namespaces = list(namespaces)
+    keys = list(keys)
+    found = cache.get_many(
+        [_key(namespace) for namespace in namespaces] + keys
+    )
+    missing = {
+        _key(namespace): _fresh() for namespace in namespaces
+        if _key(namespace) not in found
+    }
+    if missing:
+        cache.set_many(missing, timeout())
+        found.update(missing)
+    return (
+        '.'.join(str(found[_key(namespace)]) for namespace in namespaces),
+        {key: found[key] for key in keys if key in found},
+    )
+
+
+def renew(*namespaces: str) -> None:
+    """
+    bump() одним set_many, без времени изменения.
+
+    Новое поколение - текущее время, а не номер на единицу больше:
+    так тысячи пространств имен обновляются за одно обращение к кэшу.
+    """
+    if namespaces:
+        cache.set_many(
+            {_key(namespace): _fresh() for namespace in namespaces},
+            timeout()
+        )
+
+
+def validators(namespaces: Iterable[str]) -> Tuple[str, Optional[datetime]]:
+    """
+    Версия и время последнего изменения для условного GET.
+
+    Время изменения, вытесненное из кэша, считается текущим: клиент
+    один раз получит полный ответ, но никогда не получит устаревший.
+    """
+    namespaces = [
+        namespace for namespace in namespaces if namespace is not None
+    ]
+    keys = [_key(namespace) for namespace in namespaces]
+    modified_keys = [_modified_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys + modified_keys)
+    missing = {key: _fresh() for key in keys if key not in found}
+    missing.update(
+        (key, time.time()) for key in modified_keys if key not in found
+    )
+    if missing:
+        cache.set_many(missing, timeout())
+        found.update(missing)
+    version = '.'.join(str(found[key]) for key in keys)
+    last_modified = max(
+        (found[key] for key in modified_keys), default=None
+    )
+    if last_modified is not None:
+        last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+    return version, last_modified
+
+
+def card_versions(cards: Iterable[Tuple[int, Optional[int]]]) -> Dict:
+    """
+    Версии карточек по парам (author_id, group_id).
+
+    Поколения всех авторов и групп читаются одним get_many.
+    """
+    cards = set(cards)
+    namespaces = {author(author_id) for author_id, _ in cards}
+    namespaces.update(
+        group_info(group_id) for _, group_id in cards if group_id
+    )
+    generations = _get(namespaces)
+    return {
+        (author_id, group_id): '.'.join(
+            str(generations.get(namespace, 0)) for namespace in (
+                author(author_id), group_info(group_id)
+            )
+        )
+        for author_id, group_id in cards
+    }
+
+
+def annotate_cards(posts: Iterable[Any]) -> None:
+    """Проставляет постам card_version для кэша карточек."""
+    posts = list(posts)
+    versions = card_versions(
+        (post.author_id, post.group_id) for post in posts
+    )
+    for post in posts:
+        post.card_version = versions[post.author_id, post.group_id]
+
+
+def context(*namespaces: str) -> Dict[str, Any]:
+    """Переменные шаблона для тега {% cache %}."""
+    return {
+        'cache_timeout': timeout(settings.FRAGMENT_CACHE_TIMEOUT),
+        'cache_version': version(namespaces),
+    }
@@ -0,0 +1,148 @@
+"""
+Прием картинок постов.
+
+Размер и число пикселей проверяются по заголовку, до декодирования.
+JPEG декодируется сразу в уменьшенном виде (draft), поэтому память
+ограничена итоговым разрешением, а не исходным. Картинка поворачивается
+по EXIF, ужимается до POST_IMAGE_MAX_SIDE и пересохраняется без EXIF
+во временный файл, который хранилище читает кусками.
+
+Размеры, вес и крошечное превью картинки считаются один раз при
+сохранении поста (describe) и хранятся в нем: шаблонам не нужно
+открывать файл, чтобы узнать геометрию.
+"""
+import base64
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые Pillow читает, но не пишет.
+SAVE_FORMATS = {'MPO': 'JPEG'}
+LOSSY_FORMATS = ('JPEG', 'WEBP')
+JPEG_MODES = ('RGB', 'L', 'CMYK')
+# Значения EXIF Orientation, при которых ширина и высота меняются местами.
+ROTATED = (5, 6, 7, 8)
+PLACEHOLDER_QUALITY = 50
+
+
+def check_header(image: Image.Image, size: int) -> None:
+    if size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s байт.',
+            code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE},
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)sx%(height)s больше %(limit)s пикселей.',
+            code='too_many_pixels',
+            params={
+                'width': width,
+                'height': height,
+                'limit': settings.POST_IMAGE_MAX_PIXELS,
+            },
+        )
+
+
+def ingest(upload: Any) -> Any:
+    """Проверяет и нормализует загруженную картинку поста."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (Image.DecompressionBombError, OSError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image'
+        )
+    with image:
+        check_header(image, upload.size)
+        if getattr(image, 'is_animated', False):
+            # Анимацию не пересохраняем: кадры потерялись бы.
+            if max(image.size) > settings.POST_IMAGE_MAX_SIDE:
+                raise ValidationError(
+                    'Анимация больше %(limit)s точек по стороне.',
+                    code='animation_too_large',
+                    params={'limit': settings.POST_IMAGE_MAX_SIDE},
+                )
+            upload.seek(0)
+            return upload
+        image_format = SAVE_FORMATS.get(image.format, image.format)
+        if image_format not in Image.SAVE:
+            image_format = 'JPEG'
+        side = settings.POST_IMAGE_MAX_SIDE
+        image.draft(image.mode, (side, side))
+        result = ImageOps.exif_transpose(image)
+        result.thumbnail((side, side))
+        result.info.pop('exif', None)
+        if image_format == 'JPEG' and result.mode not in JPEG_MODES:
+            result = result.convert('RGB')
+        params = {}
+        if 'icc_profile' in image.info:
+            params['icc_profile'] = image.info['icc_profile']
+        if image_format in LOSSY_FORMATS:
+            params['quality'] = settings.POST_IMAGE_QUALITY
+        output = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        result.save(output, image_format, **params)
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(
+        output,
+        name=upload.name,
+        content_type=Image.MIME.get(image_format, upload.content_type),
+        size=size,
+    )
+
+
+def placeholder(image: Image.Image) -> str:
+    """Размытое превью картинки в виде data: URI."""
+    side = settings.POST_IMAGE_PLACEHOLDER_SIDE
+    image.draft('RGB', (side, side))
+    preview = ImageOps.exif_transpose(image)
+    preview.thumbnail((side, side))
+    if preview.mode in ('P', 'LA', 'PA') or 'transparency' in preview.info:
+        preview = preview.convert('RGBA')
+    if preview.mode == 'RGBA':
+        # Прозрачное превью ложится на тот же белый фон, что и миниатюры.
+        background = Image.new('RGB', preview.size, (255, 255, 255))
+        background.paste(preview, mask=preview.getchannel('A'))
+        preview = background
+    output = BytesIO()
+    preview.convert('RGB').save(output, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    encoded = base64.b64encode(output.getvalue()).decode('ascii')
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def describe(file: Any) -> Dict[str, Any]:
+    """
+    Поля поста с размерами, весом и превью картинки.
+
+    Для файла, который Pillow не читает, размеры остаются пустыми.
+    """
+    metadata = {
+        'image_width': None,
+        'image_height': None,
+        'image_size': file.size,
+        'image_placeholder': '',
+    }
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in ROTATED:
+                width, height = height, width
+            metadata.update(
+                image_width=width,
+                image_height=height,
+                image_placeholder=placeholder(image),
+            )
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        pass
+    file.seek(0)
+    return metadata
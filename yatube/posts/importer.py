@@ -0,0 +1,340 @@
+"""
+Потоковый импорт групп, пользователей, постов, комментариев и подписок.
+
+Вход - фикстура dumpdata (JSON-массив) или NDJSON с такими же записями
+{"model": ..., "pk": ..., "fields": {...}}. Файл читается кусками и
+проходится по разу на каждую модель в порядке MODELS, поэтому записи
+могут идти в любом порядке, а память не зависит от размера файла.
+
+Строки пишутся bulk_create пачками, без сигналов. Ключи новым строкам
+выдаются заранее, под блокировкой вставки в таблицу до конца транзакции
+пачки, и в ней же последовательность ключей сдвигается за выданные ключи,
+так что вставки сайта во время импорта их не занимают. Соответствие
+«ключ в источнике - ключ в базе» сохраняется в ImportedObject в той же
+транзакции, что и пачка: по нему
+переназначаются внешние ключи, и по нему же повторный запуск пропускает
+уже загруженное. Группы и пользователи с уже занятыми slug и username
+не создаются, а связываются с существующими.
+"""
+import json
+import re
+from contextlib import contextmanager
+from itertools import islice
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple)
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import counters, feeds, generations, media, timeline
+from .models import ImportedObject
+
+MODELS = (
+    'posts.group',
+    settings.AUTH_USER_MODEL.lower(),
+    'posts.post',
+    'posts.comment',
+    'posts.follow',
+)
+# Поле, по которому строка источника совпадает с уже существующей.
+NATURAL_KEYS = {
+    'posts.group': 'slug',
+    settings.AUTH_USER_MODEL.lower(): 'username',
+}
+# Повтор подписки не ошибка: уникальность проверяет база, а повтор
+# связывается с уже существующей строкой с теми же значениями полей.
+IGNORE_CONFLICTS = {'posts.follow': ('user_id', 'author_id')}
+CHUNK_SIZE = 64 * 1024
+SEPARATOR = re.compile(r'\s*,?\s*')
+
+
+def iter_json_array(file: Any, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Элементы JSON-массива по одному, без разбора всего документа."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидался JSON-массив')
+    position = 1
+    eof = False
+    while True:
+        position = SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            if position == len(buffer):
+                raise json.JSONDecodeError('Нет данных', buffer, position)
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Запись оборвалась на границе куска: дочитываем.
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield record
+
+
+def iter_ndjson(file: Any) -> Iterator:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_records(path: str) -> Iterator:
+    """Записи файла; формат определяется по первому символу."""
+    with open(path, encoding='utf-8') as file:
+        first = file.read(CHUNK_SIZE).lstrip()[:1]
+        file.seek(0)
+        if first == '[':
+            yield from iter_json_array(file)
+        else:
+            yield from iter_ndjson(file)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def preserved_timestamps(model: Any) -> Iterator[None]:
+    """
+    Отключает auto_now и auto_now_add, чтобы сохранить даты источника.
+
+    bulk_create, в отличие от loaddata, не умеет сырую вставку и
+    подставил бы текущее время в pub_date и created.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """
+    source - имя источника: соответствия ключей разных источников
+    не пересекаются. report(model, inserted, skipped, orphans) вызывается
+    после каждой пачки.
+    """
+
+    def __init__(self, path: str, source: str, batch_size: int = 1000,
+                 report: Optional[Callable] = None) -> None:
+        self.path = path
+        self.source = source
+        self.batch_size = batch_size
+        self.report = report
+
+    def run(self) -> Dict[str, Dict[str, int]]:
+        return {label: self.import_model(label) for label in MODELS}
+
+    def records(self, label: str) -> Iterator:
+        model = apps.get_model(label)
+        many_to_many = {field.name for field in model._meta.many_to_many}
+        for record in iter_records(self.path):
+            if record.get('model', '').lower() != label:
+                continue
+            fields = record.get('fields', {})
+            # Группы и права пользователей не переносятся.
+            record['fields'] = {
+                name: value for name, value in fields.items()
+                if name not in many_to_many
+            }
+            yield record
+
+    def import_model(self, label: str) -> Dict[str, int]:
+        model = apps.get_model(label)
+        totals = {'inserted': 0, 'skipped': 0, 'orphans': 0}
+        objects = (
+            deserialized.object for deserialized in
+            Deserializer(self.records(label), ignorenonexistent=True)
+        )
+        for batch in chunked(objects, self.batch_size):
+            counts = self.import_batch(model, batch)
+            for key, value in counts.items():
+                totals[key] += value
+            if self.report:
+                self.report(label, **counts)
+        return totals
+
+    def targets(self, label: str, source_pks: Iterable[int]) -> Dict:
+        return dict(ImportedObject.objects.filter(
+            source=self.source, model=label, source_pk__in=list(source_pks)
+        ).values_list('source_pk', 'target_pk'))
+
+    def remap(self, model: Any, objects: List[Any]) -> List[Any]:
+        """Переводит внешние ключи на строки базы; сирот отбрасывает."""
+        for field in model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            label = field.related_model._meta.label_lower
+            values = {getattr(obj, field.attname) for obj in objects}
+            mapping = self.targets(label, values - {None})
+            kept = []
+            for obj in objects:
+                value = getattr(obj, field.attname)
+                if value is not None and value in mapping:
+                    setattr(obj, field.attname, mapping[value])
+                elif value is not None and not field.null:
+                    continue
+                else:
+                    setattr(obj, field.attname, None)
+                kept.append(obj)
+            objects = kept
+        return objects
+
+    def import_batch(self, model: Any, objects: List[Any]) -> Dict[str, int]:
+        label = model._meta.label_lower
+        done = self.targets(label, [obj.pk for obj in objects])
+        fresh = [obj for obj in objects if obj.pk not in done]
+        remapped = self.remap(model, fresh)
+        counts = {
+            'inserted': 0,
+            'skipped': len(objects) - len(fresh),
+            'orphans': len(fresh) - len(remapped),
+        }
+        if not remapped:
+            return counts
+        now = timezone.now()
+        for obj in remapped:
+            for field in model._meta.concrete_fields:
+                if (getattr(field, 'auto_now', False)
+                        or getattr(field, 'auto_now_add', False)):
+                    if getattr(obj, field.attname) is None:
+                        setattr(obj, field.attname, now)
+        with transaction.atomic():
+            lock_table(model)
+            mapping, created = self.assign_keys(model, remapped)
+            with preserved_timestamps(model):
+                model.objects.bulk_create(
+                    created, ignore_conflicts=label in IGNORE_CONFLICTS
+                )
+            if label in IGNORE_CONFLICTS:
+                created = self.map_conflicts(
+                    model, IGNORE_CONFLICTS[label], mapping, created
+                )
+            reset_sequence(model)
+            ImportedObject.objects.bulk_create([
+                ImportedObject(
+                    source=self.source, model=label,
+                    source_pk=source_pk, target_pk=target_pk,
+                )
+                for source_pk, target_pk in mapping.items()
+            ])
+        counts['inserted'] = len(created)
+        return counts
+
+    def assign_keys(self, model: Any, objects: List[Any]):
+        """
+        Ключи новых строк и соответствие ключей источника.
+
+        Строки с занятым естественным ключом (и его повторы внутри
+        пачки) не создаются, а связываются с уже существующей строкой.
+        Ключи считаются от Max('pk'), поэтому вызывается только под
+        lock_table().
+        """
+        key = NATURAL_KEYS.get(model._meta.label_lower)
+        existing = {}
+        if key:
+            existing = dict(model.objects.filter(**{
+                f'{key}__in': [getattr(obj, key) for obj in objects]
+            }).values_list(key, 'pk'))
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        mapping = {}
+        created = []
+        for obj in objects:
+            source_pk = obj.pk
+            natural = getattr(obj, key) if key else None
+            if natural is not None and natural in existing:
+                mapping[source_pk] = existing[natural]
+                continue
+            last += 1
+            obj.pk = last
+            mapping[source_pk] = last
+            created.append(obj)
+            if natural is not None:
+                existing[natural] = last
+        return mapping, created
+
+    def map_conflicts(self, model: Any, fields: Tuple[str, ...],
+                      mapping: Dict, created: List[Any]) -> List[Any]:
+        """
+        Строки, которые bulk_create пропустил из-за конфликта: их ключ
+        в mapping меняется на ключ существующей строки с теми же fields.
+        Возвращает действительно вставленные строки.
+        """
+        inserted = set(model.objects.filter(
+            pk__in=[obj.pk for obj in created]
+        ).values_list('pk', flat=True))
+        skipped = [obj for obj in created if obj.pk not in inserted]
+        if not skipped:
+            return created
+        rows = model.objects.filter(**{
+            f'{field}__in': {getattr(obj, field) for obj in skipped}
+            for field in fields
+        }).values_list(*fields, 'pk')
+        existing = {tuple(row[:-1]): row[-1] for row in rows}
+        sources = {target: source for source, target in mapping.items()}
+        for obj in skipped:
+            mapping[sources[obj.pk]] = existing[
+                tuple(getattr(obj, field) for field in fields)
+            ]
+        return [obj for obj in created if obj.pk in inserted]
+
+
+def lock_table(model: Any) -> None:
+    """
+    Запрещает другим соединениям вставку в таблицу model до конца
+    транзакции; чтение не блокируется.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        else:
+            # SQLite блокирует на запись всю базу, и берет блокировку
+            # первая запись транзакции, даже если она не меняет строк.
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f'UPDATE {table} SET {pk} = {pk} WHERE 1 = 0')
+
+
+def reset_sequence(model: Any) -> None:
+    """Сдвигает последовательность ключей model за наибольший ключ."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+def finish() -> None:
+    """
+    Досчитывает то, что при сохранении делают сигналы.
+
+    Счетчики, ссылки на картинки и ленты подписок пересчитываются
+    по фактическим данным, закэшированные страницы сбрасываются.
+    """
+    counters.reconcile()
+    media.reconcile_references()
+    # Пока ленты пересобираются, остальные видят старые.
+    with transaction.atomic():
+        timeline.rebuild()
+    generations.bump(generations.POSTS, generations.GROUPS, generations.USERS)
+    feeds.touch(feeds.EPOCH)
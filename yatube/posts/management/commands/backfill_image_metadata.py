@@ -0,0 +1,44 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import batch, generations
+from posts.images import describe
+from posts.models import Post
+from posts.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, вес и превью картинок у постов, '
+        'сохраненных без них'
+    )
+
+    def handle(self, *args, **options):
+        # Один файл может быть у многих постов: читаем его один раз.
+        names = (
+            Post.objects.exclude(image='')
+            .filter(image_width__isnull=True)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        updated = missing = 0
+        for name in list(names):
+            try:
+                with content_storage.open(name) as file:
+                    metadata = describe(file)
+            except (OSError, SuspiciousFileOperation):
+                missing += 1
+                continue
+            if metadata['image_width'] is None:
+                missing += 1
+                continue
+            # Новая дата изменения сбрасывает закэшированные карточки.
+            posts = Post.objects.filter(image=name)
+            post_ids = list(posts.values_list('pk', flat=True))
+            updated += posts.update(updated_at=timezone.now(), **metadata)
+            batch.forget(*post_ids)
+        if updated:
+            generations.bump(generations.POSTS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {updated}, нечитаемых файлов: {missing}'
+        ))
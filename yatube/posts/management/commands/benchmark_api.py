@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.models import Post
+from posts.serializers import POSTS, Projection
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет скорость сериализации постов JSON API: выборка, '
+        'сборка объектов и кодирование в JSON, постов в секунду'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=10000,
+            help='Сколько постов сериализовать'
+        )
+        parser.add_argument(
+            '--fields', default='', help='Поля, как в ?fields='
+        )
+        parser.add_argument(
+            '--include', default='author,group',
+            help='Связи, как в ?include='
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Сколько раз повторить замер; выводится лучший'
+        )
+
+    def handle(self, *args, **options):
+        projection = Projection(
+            POSTS,
+            POSTS.parse_fields(options['fields']),
+            POSTS.parse_include(options['include']),
+        )
+        rows = Post.objects.order_by('-pub_date', '-pk').values_list(
+            *projection.columns
+        )[:options['limit']]
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        best = {}
+        for _ in range(options['repeat']):
+            # Процессорное время одного ядра, без ожидания диска.
+            started = time.process_time()
+            fetched = list(rows.all())
+            queried = time.process_time()
+            data, included = projection.serialize(fetched)
+            serialized = time.process_time()
+            encoder.encode({'data': data, 'included': included})
+            encoded = time.process_time()
+            for stage, elapsed in (
+                ('выборка', queried - started),
+                ('сборка', serialized - queried),
+                ('JSON', encoded - serialized),
+                ('всего', encoded - started),
+            ):
+                best[stage] = min(best.get(stage, elapsed), elapsed)
+        if not fetched:
+            self.stdout.write('Нет постов')
+            return
+        self.stdout.write(
+            f'Постов: {len(fetched)}, колонок: {len(projection.columns)}\n'
+            f'{"этап":<10}{"мс":>10}{"постов/с":>12}'
+        )
+        for stage, elapsed in best.items():
+            rate = len(fetched) / elapsed if elapsed else float('inf')
+            self.stdout.write(
+                f'{stage:<10}{elapsed * 1000:>10.1f}{rate:>12.0f}'
+            )
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,120 @@
+import os
+import time
+from collections import Counter
+from contextlib import ExitStack
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts import thumbnails
+from posts.models import Post
+
+CACHE_METHODS = ('get', 'get_many', 'set', 'set_many')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск миниатюр страницы по одной карточке и пачкой: '
+        'запросы к базе, обращения к кэшу и вызовы stat'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--variant', default='compact',
+            choices=settings.THUMBNAIL_VARIANTS,
+            help='Вариант миниатюры'
+        )
+        parser.add_argument(
+            '--per-page', type=int, default=settings.POSTS_PER_PAGE,
+            help='Сколько постов с картинками на странице'
+        )
+
+    def handle(self, *args, **options):
+        name = options['variant']
+        posts = [
+            post for post in Post.objects.exclude(image='').iterator()
+            if post.image.storage.exists(post.image.name)
+        ][:options['per_page']]
+        if not posts:
+            self.stdout.write('Нет постов с картинками')
+            return
+        for post in posts:
+            # Ресайз не должен попасть в замер.
+            thumbnails.generate(post.image)
+        geometry, variant_options = thumbnails.variant(name)
+        methods = (
+            ('sorl {% thumbnail %}', lambda: [
+                default.backend.get_thumbnail(
+                    post.image, geometry, **variant_options
+                ) for post in posts
+            ]),
+            ('lookup по карточке', lambda: [
+                thumbnails.lookup(post.image, name) for post in posts
+            ]),
+            ('annotate страницы', lambda: thumbnails.annotate(posts, name)),
+        )
+        self.stdout.write(
+            f'Постов на странице: {len(posts)}, вариант: {name}\n'
+            f'{"способ":<22}{"кэш":<8}{"запросы":>8}{"кэш-вызовы":>12}'
+            f'{"stat":>6}{"мс":>8}'
+        )
+        for label, method in methods:
+            for state in ('холодный', 'теплый'):
+                if state == 'холодный':
+                    self.forget(posts, name)
+                queries, calls, stats, elapsed = self.measure(method)
+                self.stdout.write(
+                    f'{label:<22}{state:<8}{queries:>8}{calls:>12}'
+                    f'{stats:>6}{elapsed:>8.2f}'
+                )
+
+    def forget(self, posts, name):
+        """Убирает записи миниатюр из кэша: sorl пойдет за ними в базу."""
+        geometry, options = thumbnails.variant(name)
+        default.kvstore.cache.delete_many([
+            add_prefix(thumbnails.thumbnail_file(
+                post.image, geometry, dict(options)
+            ).key)
+            for post in posts
+        ])
+
+    def measure(self, method):
+        store = default.kvstore.cache
+        calls = Counter()
+
+        def counting(original):
+            # get_many и set_many бэкенда сами зовут get и set:
+            # считаем только внешние обращения, то есть походы в кэш.
+            def wrapper(*args, **kwargs):
+                calls['depth'] += 1
+                if calls['depth'] == 1:
+                    calls['total'] += 1
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    calls['depth'] -= 1
+            return wrapper
+
+        with ExitStack() as stack:
+            for attr in CACHE_METHODS:
+                stack.enter_context(mock.patch.object(
+                    store, attr, counting(getattr(store, attr))
+                ))
+            stat = stack.enter_context(
+                mock.patch('os.stat', wraps=os.stat)
+            )
+            queries = stack.enter_context(CaptureQueriesContext(connection))
+            started = time.perf_counter()
+            method()
+            elapsed = (time.perf_counter() - started) * 1000
+        return (
+            len(queries),
+            calls['total'],
+            stat.call_count,
+            elapsed,
+        )
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов и их миниатюры, на которые '
+        'не ссылается ни один пост'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.POST_IMAGE_GC_GRACE,
+            help='Сколько секунд файл без ссылок хранится до удаления'
+        )
+        parser.add_argument(
+            '--scan', action='store_true',
+            help='Обойти каталог posts/ и найти файлы без учета ссылок'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено'
+        )
+
+    def handle(self, *args, **options):
+        names = media.collect(
+            grace=options['grace'],
+            scan=options['scan'],
+            dry_run=options['dry_run'],
+        )
+        for name in names:
+            self.stdout.write(name)
+        verb = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} файлов: {len(names)}'))
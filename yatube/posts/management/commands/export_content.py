@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии или подписки '
+        'в NDJSON или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=exporter.KINDS)
+        parser.add_argument(
+            '--format', default=exporter.NDJSON,
+            choices=exporter.CONTENT_TYPES, help='Формат выгрузки'
+        )
+        parser.add_argument('--since', help='С даты, ГГГГ-ММ-ДД')
+        parser.add_argument('--until', help='По дату включительно')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            name: options[name]
+            for name in ('format', 'since', 'until', 'author', 'group')
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        lines = exporter.lines(
+            options['kind'], form.cleaned_data['format'], **form.filters()
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as file:
+                file.writelines(lines)
+            return
+        for line in lines:
+            self.stdout.write(line, ending='')
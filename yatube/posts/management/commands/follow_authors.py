@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Подписывает пользователя на авторов списка или отписывает от них'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('authors', nargs='+')
+        parser.add_argument(
+            '--unfollow', action='store_true',
+            help='Отписать, а не подписать'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        authors = dict(User.objects.filter(
+            username__in=options['authors']
+        ).values_list('pk', 'username'))
+        unknown = set(options['authors']) - set(authors.values())
+        if unknown:
+            raise CommandError(
+                f'Авторы не найдены: {", ".join(sorted(unknown))}'
+            )
+        if options['unfollow']:
+            changed = follows.unfollow(user.pk, authors)
+            verb = 'Отписан от'
+        else:
+            changed = follows.follow(user.pk, authors)
+            verb = 'Подписан на'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} авторов: {len(changed)}')
+        )
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие миниатюры для картинок существующих постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASK_QUEUES['thumbnails'],
+            help='Сколько постов обрабатывать параллельно'
+        )
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').values_list(
+            'pk', flat=True
+        ).iterator()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            created = sum(pool.map(thumbnails.pregenerate_safely, post_ids))
+        self.stdout.write(
+            self.style.SUCCESS(f'Создано миниатюр: {created}')
+        )
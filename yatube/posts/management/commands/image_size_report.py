@@ -0,0 +1,55 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail.images import ImageFile
+
+from posts import media, thumbnails
+from posts.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает размер адаптивных версий миниатюр с исходными '
+        'картинками из media/posts/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory', default='posts',
+            help='Каталог исходников в хранилище медиафайлов'
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        names = list(media.walk(directory))
+        if not names:
+            self.stdout.write(f'Каталог {directory} пуст')
+            return
+        original = 0
+        totals = defaultdict(int)
+        for name in names:
+            image = ImageFile(name, content_storage)
+            thumbnails.generate(image)
+            original += content_storage.size(name)
+            for variant in settings.THUMBNAIL_VARIANTS:
+                for spec in thumbnails.specs(variant):
+                    image_format, width, geometry, spec_options = spec
+                    file = thumbnails.thumbnail_file(
+                        image, geometry, dict(spec_options)
+                    )
+                    if file.exists():
+                        key = (variant, image_format or 'основной', width)
+                        totals[key] += file.storage.size(file.name)
+        self.stdout.write(
+            f'Исходников: {len(names)}, байт: {original}\n'
+            f'Форматы: {", ".join(thumbnails.available_formats()) or "нет"}\n'
+            f'{"вариант":<10}{"формат":<10}{"ширина":>8}{"байт":>12}'
+            f'{"от исходника":>14}'
+        )
+        for (variant, image_format, width), size in sorted(totals.items()):
+            share = size / original if original else 0
+            self.stdout.write(
+                f'{variant:<10}{image_format:<10}{width:>8}{size:>12}'
+                f'{share:>14.1%}'
+            )
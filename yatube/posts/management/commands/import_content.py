@@ -0,0 +1,71 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует группы, пользователей, посты, комментарии '
+        'и подписки из фикстуры JSON или NDJSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON-массива или NDJSON')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк вставлять одним bulk_create'
+        )
+        parser.add_argument(
+            '--source',
+            help='Имя источника для возобновления; по умолчанию имя файла'
+        )
+        parser.add_argument(
+            '--skip-finish', action='store_true',
+            help=(
+                'Не пересчитывать счетчики и ленты: для импорта по частям, '
+                'последний запуск делается без этого флага'
+            )
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Нет файла {path}')
+        self.verbosity = options['verbosity']
+        self.started = time.perf_counter()
+        self.rows = 0
+        loader = importer.Importer(
+            path,
+            source=options['source'] or os.path.basename(path),
+            batch_size=options['batch_size'],
+            report=self.report,
+        )
+        try:
+            totals = loader.run()
+        except ValueError as error:
+            raise CommandError(f'Не удалось разобрать {path}: {error}')
+        elapsed = time.perf_counter() - self.started
+        for label, counts in totals.items():
+            self.stdout.write(
+                f'{label:<14} вставлено {counts["inserted"]}, '
+                f'уже было {counts["skipped"]}, '
+                f'без связанных строк {counts["orphans"]}'
+            )
+        if not options['skip_finish']:
+            importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано строк: {self.rows} за {elapsed:.1f} с '
+            f'({self.rows / elapsed if elapsed else 0:.0f} строк/с)'
+        ))
+
+    def report(self, label, inserted, skipped, orphans):
+        self.rows += inserted
+        if self.verbosity > 1:
+            elapsed = time.perf_counter() - self.started
+            self.stdout.write(
+                f'{label}: +{inserted}, всего {self.rows}, '
+                f'{self.rows / elapsed:.0f} строк/с'
+            )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import generations, search
+
+
+class Command(BaseCommand):
+    help = 'Заполняет полнотекстовый индекс постов заново'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько постов индексировать за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError(
+                'Полнотекстовый поиск доступен только в SQLite с FTS5'
+            )
+        with transaction.atomic():
+            search.install()
+            indexed = search.rebuild(options['chunk_size'])
+        # Закэшированные страницы поиска построены по старому индексу.
+        generations.bump(generations.POSTS)
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}')
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters, media
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики постов, комментариев, подписок '
+        'и ссылок на картинки'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counters.reconcile()
+            media.reconcile_references()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,135 @@
+"""
+Учет ссылок на файлы картинок и сборка мусора.
+
+Сигналы поста увеличивают и уменьшают StoredImage.refcount. Счетчик
+только подсказывает, что удалять: перед удалением сборщик проверяет,
+что на файл действительно не ссылается ни один пост и что файл
+не трогали дольше POST_IMAGE_GC_GRACE секунд.
+"""
+import os
+import posixpath
+import time
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .storage import content_storage
+
+
+def _stored_image():
+    return global_apps.get_model('posts', 'StoredImage')
+
+
+def retain(name):
+    if not name:
+        return
+    StoredImage = _stored_image()
+    StoredImage.objects.get_or_create(name=name)
+    StoredImage.objects.filter(name=name).update(
+        refcount=F('refcount') + 1, updated_at=timezone.now()
+    )
+
+
+def release(name):
+    if not name:
+        return
+    _stored_image().objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, updated_at=timezone.now()
+    )
+
+
+def reconcile_references(apps=global_apps):
+    """Пересчитывает refcount по фактическим ссылкам постов."""
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    counts = dict(
+        Post.objects.exclude(image='').order_by().values_list('image')
+        .annotate(total=Count('pk'))
+    )
+    StoredImage.objects.exclude(name__in=counts).update(refcount=0)
+    existing = set(
+        StoredImage.objects.filter(name__in=counts).values_list(
+            'name', flat=True
+        )
+    )
+    StoredImage.objects.bulk_create([
+        StoredImage(name=name, refcount=total)
+        for name, total in counts.items() if name not in existing
+    ])
+    for name in existing:
+        StoredImage.objects.filter(name=name).update(refcount=counts[name])
+
+
+def is_idle(name, grace):
+    """Файл не меняли дольше grace секунд (или его уже нет)."""
+    try:
+        modified = os.path.getmtime(content_storage.path(name))
+    except OSError:
+        return True
+    return time.time() - modified > grace
+
+
+def delete_file(name):
+    """Удаляет оригинал, его миниатюры и записи sorl о них."""
+    default.kvstore.delete(ImageFile(name, content_storage))
+    content_storage.delete(name)
+
+
+def collect(grace=None, scan=False, dry_run=False):
+    """
+    Удаляет файлы, на которые не ссылается ни один пост.
+
+    scan=True дополнительно обходит каталог posts/ и находит файлы,
+    которых нет в StoredImage, например загруженные до учета ссылок.
+    Возвращает список удаленных (или намеченных к удалению) имен.
+    """
+    Post = global_apps.get_model('posts', 'Post')
+    StoredImage = _stored_image()
+    if grace is None:
+        grace = settings.POST_IMAGE_GC_GRACE
+    deadline = timezone.now() - timedelta(seconds=grace)
+    tracked = list(StoredImage.objects.filter(
+        refcount=0, updated_at__lt=deadline
+    ).values_list('name', flat=True))
+    untracked = set()
+    if scan:
+        known = set(StoredImage.objects.values_list('name', flat=True))
+        untracked = {name for name in walk('posts') if name not in known}
+    deleted = []
+    for name in tracked + sorted(untracked):
+        if Post.objects.filter(image=name).exists():
+            continue
+        if not is_idle(name, grace):
+            continue
+        if dry_run:
+            deleted.append(name)
+            continue
+        # Условное удаление: если пост успел сослаться на файл, счетчик
+        # уже не нулевой, строка остается, а с ней и файл.
+        rows = StoredImage.objects.filter(name=name)
+        if name in untracked:
+            retained = rows.filter(refcount__gt=0).exists()
+        else:
+            retained = not rows.filter(refcount=0).delete()[0]
+        if retained:
+            continue
+        delete_file(name)
+        deleted.append(name)
+    return deleted
+
+
+def walk(directory):
+    """Все файлы каталога хранилища вместе с подкаталогами."""
+    if not content_storage.exists(directory):
+        return
+    subdirectories, files = content_storage.listdir(directory)
+    for file in files:
+        if not file.startswith('.'):
+            yield posixpath.join(directory, file)
+    for subdirectory in subdirectories:
+        yield from walk(posixpath.join(directory, subdirectory))
@@ -0,0 +1,135 @@
+"""
+Кэш целых страниц posts для анонимных посетителей.
+
+Запись хранится PAGE_CACHE_TIMEOUT + PAGE_CACHE_STALE_TIMEOUT секунд, но
+свежей считается только PAGE_CACHE_TIMEOUT секунд и пока не изменились
+поколения постов и комментариев. Устаревшую запись пересчитывает один
+запрос, взявший блокировку в кэше, а остальные тем временем получают
+старую копию, поэтому истечение записи под нагрузкой не запускает
+представление во всех процессах сразу.
+"""
+import hashlib
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.module_loading import import_string
+
+from . import generations
+
+logger = logging.getLogger(__name__)
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+
+page_cache_stats = Counter()
+
+
+def page_cache_exempt(view):
+    """Не кэшировать ответы представления, например для частого опроса."""
+    view.page_cache_exempt = True
+    return view
+
+
+def record_page_cache_event(event, request):
+    """Обработчик статистики по умолчанию: счетчики в памяти процесса."""
+    page_cache_stats[event] += 1
+    logger.debug('page cache %s: %s', event, request.path)
+
+
+class PageCacheMiddleware:
+    """
+    PAGE_CACHE_NAMESPACES: пространства имен URL, страницы которых кэшируются.
+    PAGE_CACHE_STATS_HOOK: путь к функции (event, request) или None.
+    """
+    header = 'X-Page-Cache'
+    # Комментарии видны на странице поста, но поколения постов не меняют.
+    depends = (generations.POSTS, generations.COMMENTS)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        hook = getattr(settings, 'PAGE_CACHE_STATS_HOOK', None)
+        self.hook = import_string(hook) if hook else None
+
+    def __call__(self, request):
+        if not self.is_cacheable(request):
+            return self.get_response(request)
+        key = self.key(request)
+        entry = cache.get(key)
+        version = generations.version(self.depends)
+        if entry is not None and self.is_fresh(entry, version):
+            return self.serve(request, entry, HIT)
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            if entry is not None:
+                return self.serve(request, entry, STALE)
+            # Копии еще нет: ждать некого, считаем страницу сами.
+            return self.render(request, key, version, MISS)
+        try:
+            return self.render(request, key, version, MISS)
+        finally:
+            cache.delete(lock)
+
+    def is_cacheable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if match.namespace not in settings.PAGE_CACHE_NAMESPACES:
+            return False
+        if getattr(match.func, 'page_cache_exempt', False):
+            return False
+        return not request.user.is_authenticated
+
+    def key(self, request):
+        url = request.build_absolute_uri()
+        return f'page:{hashlib.md5(url.encode()).hexdigest()}'
+
+    def is_fresh(self, entry, version):
+        return entry['version'] == version and entry['expires'] > time.time()
+
+    def render(self, request, key, version, event):
+        response = self.get_response(request)
+        if self.can_store(request, response):
+            cache.set(key, {
+                'response': response,
+                'version': version,
+                'expires': time.time() + settings.PAGE_CACHE_TIMEOUT,
+            }, settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE_TIMEOUT)
+        return self.report(request, response, event)
+
+    def can_store(self, request, response):
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
+
+    def serve(self, request, entry, event):
+        response = entry['response']
+        last_modified = response.get('Last-Modified')
+        conditional = get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=last_modified and parse_http_date_safe(
+                last_modified
+            ),
+            response=response,
+        )
+        return self.report(request, conditional, event)
+
+    def report(self, request, response, event):
+        response[self.header] = event
+        if self.hook is not None:
+            self.hook(event, request)
+        return response
@@ -0,0 +1,75 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:22
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timeline(apps, schema_editor):
+    """Раскладывает посты по лентам уже существующих подписок."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Timeline = apps.get_model('posts', 'Timeline')
+    db = schema_editor.connection.alias
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    authors = Follow.objects.using(db).values_list(
+        'author_id', flat=True
+    ).distinct()
+    for author_id in list(authors):
+        followers = Follow.objects.using(db).filter(author_id=author_id)
+        if followers[limit:limit + 1].exists():
+            # Посты популярных авторов подмешиваются при чтении ленты.
+            followers.update(fanout=False)
+            continue
+        posts = list(Post.objects.using(db).filter(
+            author_id=author_id
+        ).values_list('pk', 'pub_date'))
+        entries = (
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in followers.values_list('user_id', flat=True)
+            for post_id, pub_date in posts
+        )
+        while True:
+            batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+            if not batch:
+                break
+            Timeline.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_auto_20220219_1729'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='fanout',
+            field=models.BooleanField(default=True, verbose_name='Доставка постов в ленту при публикации'),
+        ),
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'ordering': ['-pub_date', '-post'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeline',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='timeline_user_post'),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    # reconcile() создает строку UserStats каждому пользователю, так что
+    # после миграции пользователей без счетчиков нет.
+    from posts.counters import reconcile
+    reconcile(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0011_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['created', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='comment_post_created'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# SQL записан здесь, а не взят из posts.search: миграция не должна
+# меняться вместе с кодом поиска.
+FTS_TABLE = 'posts_post_fts'
+
+INSTALL_SQL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    # Индекс с внешним содержимым заполняется из posts_post одной командой.
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+UNINSTALL_SQL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_search_index(apps, schema_editor):
+    if has_fts5(schema_editor.connection):
+        for sql in INSTALL_SQL:
+            schema_editor.execute(sql)
+
+
+def uninstall_search_index(apps, schema_editor):
+    if has_fts5(schema_editor.connection):
+        for sql in UNINSTALL_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
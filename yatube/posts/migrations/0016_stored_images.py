@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:47
+
+from django.db import migrations, models
+import posts.storage
+
+
+def fill_references(apps, schema_editor):
+    from posts.media import reconcile_references
+    reconcile_references(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.AddIndex(
+            model_name='storedimage',
+            index=models.Index(fields=['refcount', 'updated_at'], name='stored_image_refcount'),
+        ),
+        migrations.RunPython(fill_references, migrations.RunPython.noop),
+    ]
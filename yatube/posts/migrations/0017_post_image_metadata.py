@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_stored_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Размер картинки в байтах'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+    ]
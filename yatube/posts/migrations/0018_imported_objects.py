@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100, verbose_name='Источник')),
+                ('model', models.CharField(max_length=100, verbose_name='Модель')),
+                ('source_pk', models.BigIntegerField(verbose_name='Ключ в источнике')),
+                ('target_pk', models.BigIntegerField(verbose_name='Ключ в базе')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importedobject',
+            constraint=models.UniqueConstraint(fields=('source', 'model', 'source_pk'), name='imported_object_source'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import content_storage
+
 User = get_user_model()
 
 
@@ -13,6 +15,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -31,14 +37,57 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки в байтах',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'Превью картинки',
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date'
+            ),
+        ]
 
 
 class Group(models.Model):
@@ -56,6 +105,11 @@ class Group(models.Model):
         'Описание группы',
         help_text='Группа любителей Чебурашки'
     )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -83,6 +137,15 @@ class Comment(models.Model):
     def __str__(self):
         return self.text
 
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -97,6 +160,10 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+    fanout = models.BooleanField(
+        'Доставка постов в ленту при публикации',
+        default=True,
+    )
 
     class Meta:
         constraints = [
@@ -105,3 +172,96 @@ class Follow(models.Model):
                 name='user_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class StoredImage(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются."""
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['refcount', 'updated_at'],
+                name='stored_image_refcount'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImportedObject(models.Model):
+    """Соответствие строки источника импорта и созданной строки."""
+    source = models.CharField('Источник', max_length=100)
+    model = models.CharField('Модель', max_length=100)
+    source_pk = models.BigIntegerField('Ключ в источнике')
+    target_pk = models.BigIntegerField('Ключ в базе')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'model', 'source_pk'],
+                name='imported_object_source'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.source}:{self.model}:{self.source_pk}'
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date'
+            )
+        ]
@@ -0,0 +1,189 @@
+"""
+Уменьшенные копии картинок по подписанным адресам.
+
+Адрес /media/resize/<подпись>/<ш>x<в>/<путь> содержит подпись размера
+и пути, поэтому ресайзить можно только то, что сайт сам выдал в шаблонах,
+и перебор размеров не превращается в нагрузку на процессор. Готовые
+копии лежат в RESIZE_CACHE_ROOT, общий объем ограничен
+RESIZE_CACHE_MAX_SIZE: при переполнении удаляются давно не запрошенные.
+Одну копию кодирует один запрос, держащий блокировку в кэше, остальные
+ждут ее файла.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import Signer
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from PIL import Image, ImageOps
+
+from .storage import content_storage
+
+logger = logging.getLogger(__name__)
+
+TOTAL_KEY = 'resize-cache-total'
+LOCK_POLL_INTERVAL = 0.05
+# После вытеснения кэш заполнен не больше чем на эту долю.
+LOW_WATER_MARK = 0.9
+FORMATS = {'JPEG': 'JPEG', 'PNG': 'PNG', 'GIF': 'PNG', 'WEBP': 'WEBP'}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+signer = Signer(salt='posts.resize')
+
+
+def _value(width: int, height: int, name: str) -> str:
+    return f'{width}x{height}/{name}'
+
+
+def sign(width: int, height: int, name: str) -> str:
+    return signer.signature(_value(width, height, name))
+
+
+def is_valid(signature: str, width: int, height: int, name: str) -> bool:
+    return constant_time_compare(signature, sign(width, height, name))
+
+
+def url(name: str, width: int, height: int) -> str:
+    return reverse('resize_image', kwargs={
+        'signature': sign(width, height, name),
+        'width': width,
+        'height': height,
+        'name': name,
+    })
+
+
+def cache_path(width: int, height: int, name: str) -> Tuple[str, str]:
+    """Путь копии в кэше и ее формат."""
+    source_format = FORMATS.get(
+        Image.registered_extensions().get(
+            os.path.splitext(name)[1].lower()
+        ), 'JPEG'
+    )
+    key = hashlib.sha256(_value(width, height, name).encode()).hexdigest()
+    path = os.path.join(
+        settings.RESIZE_CACHE_ROOT, key[:2],
+        f'{key}.{EXTENSIONS[source_format]}'
+    )
+    return path, source_format
+
+
+def encode(source: str, target: str, width: int, height: int,
+           image_format: str) -> int:
+    """Уменьшает source в рамку width x height; возвращает размер копии."""
+    with content_storage.open(source) as file, Image.open(file) as image:
+        image.draft('RGB', (width, height))
+        result = ImageOps.exif_transpose(image)
+        result.thumbnail((width, height))
+        if image_format == 'JPEG' and result.mode not in ('RGB', 'L'):
+            result = result.convert('RGB')
+        params = {}
+        if image_format in ('JPEG', 'WEBP'):
+            params['quality'] = settings.POST_IMAGE_QUALITY
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.resize-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                result.save(output, image_format, **params)
+            os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+    return os.path.getsize(target)
+
+
+def _touch(path: str) -> bool:
+    """Отмечает копию как недавно запрошенную; False, если ее нет."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def render(width: int, height: int, name: str) -> Tuple[str, str]:
+    """Путь готовой копии и ее формат; кодирует, если копии нет."""
+    path, image_format = cache_path(width, height, name)
+    if _touch(path):
+        return path, image_format
+    lock = f'resize-lock:{os.path.basename(path)}'
+    timeout = settings.RESIZE_LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+    locked = cache.add(lock, 1, timeout)
+    while not locked:
+        time.sleep(LOCK_POLL_INTERVAL)
+        if _touch(path):
+            return path, image_format
+        if time.monotonic() > deadline:
+            # Кодировщик, похоже, умер вместе с процессом.
+            break
+        locked = cache.add(lock, 1, timeout)
+    try:
+        if not os.path.exists(path):
+            _account(encode(name, path, width, height, image_format))
+    finally:
+        if locked:
+            cache.delete(lock)
+    return path, image_format
+
+
+def _account(size: int) -> None:
+    try:
+        total = cache.incr(TOTAL_KEY, size)
+    except ValueError:
+        total = None
+    if total is None or total > settings.RESIZE_CACHE_MAX_SIZE:
+        evict()
+
+
+def _entries() -> List[Tuple[float, int, str]]:
+    """Копии в кэше: (дата изменения, размер, путь)."""
+    entries = []
+    for directory, _, files in os.walk(settings.RESIZE_CACHE_ROOT):
+        for file in files:
+            if file.startswith('.'):
+                # Копия, которую прямо сейчас пишет кодировщик.
+                continue
+            path = os.path.join(directory, file)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict(limit: Optional[int] = None) -> int:
+    """
+    Удаляет давно не запрошенные копии, пока объем кэша больше limit.
+
+    Дата изменения файла обновляется при каждой выдаче копии, по ней
+    и определяется давность. Возвращает число удаленных файлов.
+    """
+    if limit is None:
+        limit = int(settings.RESIZE_CACHE_MAX_SIZE * LOW_WATER_MARK)
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    cache.set(TOTAL_KEY, total, None)
+    if removed:
+        logger.info('Из кэша ресайза удалено файлов: %s', removed)
+    return removed
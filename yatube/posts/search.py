@@ -0,0 +1,282 @@
+"""
+Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts — таблица с внешним содержимым (content=posts_post):
+текст хранится только в posts_post, а триггеры поддерживают индекс при
+любых изменениях, включая bulk_create и QuerySet.update(). Django
+пересоздает posts_post при изменении схемы в SQLite и теряет триггеры,
+поэтому restore_triggers() вызывается после каждой миграции.
+
+Без FTS5 (другая СУБД или SQLite, собранный без него) поиск ищет
+подстроку через icontains и выводит посты по дате.
+"""
+from typing import Any, List, Optional, Tuple
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_bytes, force_str
+from django.utils.html import escape
+from django.utils.text import Truncator
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .utils import CURSOR_SEPARATOR, CursorPaginator
+from .utils import decode_cursor as decode_date_cursor
+
+FTS_TABLE = 'posts_post_fts'
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 24
+
+INSTALL_SQL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+UNINSTALL_SQL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def _check(using: Any, sql: str, params: Tuple = ()) -> bool:
+    if using.vendor != 'sqlite':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(sql, params)
+        return bool(cursor.fetchone()[0])
+
+
+def is_supported(using: Any = connection) -> bool:
+    """Можно ли создать индекс: SQLite, собранный с FTS5."""
+    return _check(using, "SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+
+
+def is_available(using: Any = connection) -> bool:
+    """Есть ли индекс, по которому можно искать; один запрос."""
+    return _check(
+        using,
+        "SELECT sqlite_compileoption_used('ENABLE_FTS5') AND EXISTS ("
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s)",
+        (FTS_TABLE,)
+    )
+
+
+def install(using: Any = connection) -> None:
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+
+
+def restore_triggers(using: Any = connection) -> None:
+    """Триггеры теряются, когда миграция пересоздает posts_post."""
+    if is_available(using):
+        install(using)
+
+
+def uninstall(using: Any = connection) -> None:
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for sql in UNINSTALL_SQL:
+            cursor.execute(sql)
+
+
+def rebuild(chunk_size: int = 1000) -> int:
+    """Заполняет индекс заново пачками по id; возвращает число постов."""
+    indexed = 0
+    last_id = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+        )
+        while True:
+            cursor.execute(
+                'SELECT COUNT(*), MAX(id) FROM (SELECT id FROM posts_post '
+                'WHERE id > %s ORDER BY id LIMIT %s)',
+                [last_id, chunk_size]
+            )
+            count, upper_id = cursor.fetchone()
+            if not count:
+                return indexed
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                'SELECT id, text FROM posts_post WHERE id > %s AND id <= %s',
+                [last_id, upper_id]
+            )
+            indexed += count
+            last_id = upper_id
+
+
+def match_expression(query: str) -> str:
+    """
+    Переводит пользовательский запрос в безопасное выражение MATCH.
+
+    Каждое слово берется в кавычки и ищется по префиксу, поэтому
+    спецсимволы FTS5 в запросе не вызывают синтаксических ошибок.
+    """
+    words = [word.replace('"', '""') for word in query.split()]
+    return ' '.join(f'"{word}"*' for word in words if word.strip('"'))
+
+
+def matching_ids(query: str) -> RawSQL:
+    """Подзапрос id постов, подходящих под запрос, для фильтра pk__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)]
+    )
+
+
+def highlight(snippet: str) -> str:
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def encode_cursor(score: float, pk: int) -> str:
+    return urlsafe_base64_encode(
+        force_bytes(f'{score!r}{CURSOR_SEPARATOR}{pk}')
+    )
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = force_str(urlsafe_base64_decode(cursor))
+        score, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        return float(score), int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+class SearchPaginator(CursorPaginator):
+    """
+    Постраничный вывод результатов по ключу (релевантность, id).
+
+    bm25() тем меньше, чем документ релевантнее, поэтому лента идет по
+    возрастанию оценки.
+    """
+
+    def __init__(self, query: str, per_page: int) -> None:
+        Paginator.__init__(self, [], per_page)
+        self.match = match_expression(query)
+
+    def page_after(self, cursor: Optional[Tuple[float, int]] = None) -> Any:
+        rows = self._search(cursor, '>', 'ASC')
+        return self._build_page(
+            rows[:self.per_page],
+            has_previous=cursor is not None,
+            has_next=len(rows) > self.per_page,
+        )
+
+    def page_before(self, cursor: Tuple[float, int]) -> Any:
+        rows = self._search(cursor, '<', 'DESC')
+        return self._build_page(
+            rows[:self.per_page][::-1],
+            has_previous=len(rows) > self.per_page,
+            has_next=True,
+        )
+
+    def page_objects(self, rows: List[Tuple[int, float, str]]) -> List[Post]:
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, score, snippet in rows]
+        )
+        results = []
+        for pk, score, snippet in rows:
+            post = posts.get(pk)
+            if post is None:
+                continue
+            post.score = score
+            post.snippet = highlight(snippet)
+            results.append(post)
+        return results
+
+    def _cursor(self, row: Tuple[int, float, str]) -> str:
+        pk, score, snippet = row
+        return encode_cursor(score, pk)
+
+    def _search(self, cursor: Optional[Tuple[float, int]], direction: str,
+                order: str) -> List[Tuple[int, float, str]]:
+        if not self.match:
+            return []
+        score = f'bm25({FTS_TABLE})'
+        sql = (
+            f"SELECT rowid, {score}, snippet({FTS_TABLE}, 0, %s, %s, "
+            f"'…', {SNIPPET_TOKENS}) FROM {FTS_TABLE} "
+            f'WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [MARK_START, MARK_END, self.match]
+        if cursor is not None:
+            sql += (
+                f' AND ({score} {direction} %s'
+                f' OR ({score} = %s AND rowid {direction} %s))'
+            )
+            params += [cursor[0], cursor[0], cursor[1]]
+        sql += f' ORDER BY {score} {order}, rowid {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            return db_cursor.fetchall()
+
+
+class ContainsPaginator(CursorPaginator):
+    """Поиск без индекса: посты с подстрокой запроса, новые первыми."""
+
+    def __init__(self, query: str, per_page: int) -> None:
+        posts = Post.objects.none()
+        if query:
+            posts = Post.objects.filter(text__icontains=query)
+        super().__init__(posts.select_related('author', 'group'), per_page)
+
+    def page_objects(self, items: List[Post]) -> List[Post]:
+        for post in items:
+            post.snippet = Truncator(post.text).words(SNIPPET_TOKENS)
+        return items
+
+
+def get_search_page(request: Any, query: str, per_page: int) -> Any:
+    if is_available():
+        paginator, decode = SearchPaginator(query, per_page), decode_cursor
+    else:
+        paginator = ContainsPaginator(query, per_page)
+        decode = decode_date_cursor
+    before = decode(request.GET.get('before'))
+    if before is not None:
+        return paginator.page_before(before)
+    return paginator.page_after(decode(request.GET.get('after')))
@@ -1,7 +1,178 @@
-from rest_framework.serializers import ModelSerializer
-from models import Post
+"""
+Сериализация ответов JSON API без Django REST framework.
 
-class PostSerializer(ModelSerializer):
-    class Meta:
-        model = Post
-        fields = ('text', 'author', 'pub_date')
+Ресурс описывает поля ответа путями колонок. ?fields= сужает проекцию
+values_list(), а ?include= добавляет в тот же запрос колонки связанных
+строк через JOIN; связанные объекты выводятся один раз в included.
+Модели не создаются: объект ответа - это zip кортежа с именами полей.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .storage import content_storage
+
+
+class InvalidQuery(Exception):
+    """Неизвестное поле или связь в параметрах запроса."""
+
+
+def image_url(name: str) -> Optional[str]:
+    return content_storage.url(name) if name else None
+
+
+def names(value: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(
+        name.strip() for name in (value or '').split(',') if name.strip()
+    ))
+
+
+class Resource:
+    """
+    columns - поле ответа и путь его колонки; default - поля без ?fields=,
+    included - поля объекта в included; relations - связь для ?include=:
+    ресурс и путь внешнего ключа.
+    """
+
+    def __init__(self, name: str, columns: Dict[str, str],
+                 default: Iterable[str] = (), included: Iterable[str] = (),
+                 relations: Optional[Dict[str, Tuple['Resource', str]]] = None,
+                 converters: Optional[Dict[str, Callable]] = None) -> None:
+        self.name = name
+        self.columns = columns
+        self.default = tuple(default) or tuple(columns)
+        self.included = tuple(included) or self.default
+        self.relations = relations or {}
+        self.converters = converters or {}
+
+    def parse_fields(self, value: Optional[str]) -> Tuple[str, ...]:
+        """Поля ?fields=; id выводится всегда."""
+        if not value:
+            return self.default
+        fields = names('id,' + value)
+        unknown = [name for name in fields if name not in self.columns]
+        if unknown:
+            raise InvalidQuery(f'Неизвестные поля: {", ".join(unknown)}')
+        return tuple(fields)
+
+    def parse_include(self, value: Optional[str]) -> Tuple[str, ...]:
+        include = names(value)
+        unknown = [name for name in include if name not in self.relations]
+        if unknown:
+            raise InvalidQuery(f'Неизвестные связи: {", ".join(unknown)}')
+        return tuple(include)
+
+    def converted(self, fields: Iterable[str]) -> List[Tuple[int, Callable]]:
+        return [
+            (index, self.converters[name])
+            for index, name in enumerate(fields) if name in self.converters
+        ]
+
+    def build(self, fields: Tuple[str, ...], values: Tuple) -> Dict:
+        item = dict(zip(fields, values))
+        for index, convert in self.converted(fields):
+            item[fields[index]] = convert(values[index])
+        return item
+
+    def dump(self, obj: Any, fields: Tuple[str, ...]) -> Dict:
+        """Поля ответа из объекта модели; колонки - поля самой модели."""
+        meta = obj._meta
+        return self.build(fields, tuple(
+            getattr(obj, meta.get_field(self.columns[name]).attname)
+            for name in fields
+        ))
+
+
+class Projection:
+    """
+    Колонки одного запроса и сборка ответа из его строк.
+
+    prefix - путь к ресурсу от модели запроса, например 'post__' для
+    строк ленты Timeline. Колонки связанных ресурсов идут после полей
+    основного, id связанного объекта - первая из них.
+    """
+
+    def __init__(self, resource: Resource, fields: Tuple[str, ...],
+                 include: Tuple[str, ...] = (), prefix: str = '') -> None:
+        self.resource = resource
+        self.fields = fields
+        self.columns = [prefix + resource.columns[name] for name in fields]
+        self.related = []
+        for name in include:
+            related, path = resource.relations[name]
+            start = len(self.columns)
+            self.columns += [
+                f'{prefix}{path}__{related.columns[field]}'
+                for field in related.included
+            ]
+            self.related.append((related, start, len(self.columns)))
+        self.converters = resource.converted(fields)
+
+    def item(self, row: Tuple) -> Dict:
+        # zip останавливается на полях основного ресурса.
+        item = dict(zip(self.fields, row))
+        for index, convert in self.converters:
+            item[self.fields[index]] = convert(row[index])
+        return item
+
+    def serialize(self, rows: Iterable[Tuple]) -> Tuple[List, Dict]:
+        """Объекты ответа и included по строкам values_list(*columns)."""
+        data = []
+        included = {related.name: {} for related, _, _ in self.related}
+        for row in rows:
+            data.append(self.item(row))
+            for related, start, stop in self.related:
+                objects = included[related.name]
+                pk = row[start]
+                if pk is not None and pk not in objects:
+                    objects[pk] = related.build(
+                        related.included, row[start:stop]
+                    )
+        return data, {
+            name: list(objects.values()) for name, objects in included.items()
+        }
+
+
+USERS = Resource('users', {
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}, included=('id', 'username', 'first_name', 'last_name'))
+
+GROUPS = Resource('groups', {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+}, included=('id', 'slug', 'title'))
+
+POSTS = Resource('posts', {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated_at': 'updated_at',
+    'author': 'author',
+    'group': 'group',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'image_placeholder': 'image_placeholder',
+    'comments_count': 'comments_count',
+}, default=(
+    'id', 'text', 'pub_date', 'updated_at', 'author', 'group', 'image',
+    'image_width', 'image_height', 'comments_count',
+), relations={
+    'author': (USERS, 'author'),
+    'group': (GROUPS, 'group'),
+}, converters={'image': image_url})
+
+COMMENTS = Resource('comments', {
+    'id': 'id',
+    'post': 'post',
+    'author': 'author',
+    'text': 'text',
+    'created': 'created',
+}, relations={'author': (USERS, 'author')})
@@ -0,0 +1,204 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import batch, counters, feeds, generations, media, timeline
+from .images import describe
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля пользователя, которые выводятся в карточках постов.
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.touch_post(instance, timeline.fan_out_post(instance))
+
+
+@receiver(post_save, sender=Post)
+def touch_moved_post_feed(sender, instance, created, raw=False, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if created or raw or instance.group_id in (None, previous_group_id):
+        return
+    feeds.touch(feeds.group(instance.group.slug))
+
+
+@receiver(pre_save, sender=Follow)
+def set_follow_fanout(sender, instance, raw=False, **kwargs):
+    if instance._state.adding and not raw:
+        instance.fanout = not timeline.is_pull_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    if not instance._state.adding and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        ) or (None, '')
+
+
+@receiver(pre_save, sender=Post)
+def fill_fixture_updated_at(sender, instance, raw=False, **kwargs):
+    # loaddata не заполняет auto_now, а в старых фикстурах поля нет.
+    if raw and instance.updated_at is None:
+        instance.updated_at = instance.pub_date or timezone.now()
+
+
+@receiver(pre_save, sender=Post)
+def describe_post_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    image = instance.image
+    if image and not image._committed:
+        # Новый файл еще в памяти или во временном файле загрузки.
+        for field, value in describe(image.file).items():
+            setattr(instance, field, value)
+    elif image.name != getattr(instance, '_previous_image', image.name):
+        # Чужой файл по имени: размеры заполнит backfill_image_metadata.
+        instance.image_width = instance.image_height = None
+        instance.image_size = None
+        instance.image_placeholder = ''
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count')
+        counters.bump(Group, instance.group_id, 'posts_count')
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        counters.bump(Group, previous_group_id, 'posts_count', -1)
+        counters.bump(Group, instance.group_id, 'posts_count')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_image = '' if created else instance._previous_image
+    if previous_image != instance.image.name:
+        media.release(previous_image)
+        media.retain(instance.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(Post, instance.post_id, 'comments_count')
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count')
+        counters.bump_user(instance.user_id, 'following_count')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_fragments(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    generations.bump(
+        generations.POSTS,
+        generations.profile(instance.author_id),
+        instance.group_id and generations.group(instance.group_id),
+        previous_group_id and generations.group(previous_group_id),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def expire_group_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.bump(
+            generations.GROUPS,
+            generations.POSTS,
+            generations.group(instance.pk),
+            generations.group_info(instance.pk),
+        )
+
+
+@receiver(post_save, sender=User)
+def expire_user_fragments(sender, instance, created, raw=False,
+                          update_fields=None, **kwargs):
+    if created or raw:
+        return
+    if update_fields and not USER_DISPLAY_FIELDS & set(update_fields):
+        return
+    generations.bump(
+        generations.USERS,
+        generations.POSTS,
+        generations.profile(instance.pk),
+        generations.author(instance.pk),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_follow_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.bump(generations.follow(instance.user_id))
+        feeds.touch(feeds.follow(instance.user_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_cached_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        batch.forget(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_commented_post(sender, instance, raw=False, **kwargs):
+    # В записи поста и в списках постов API есть число комментариев.
+    if not raw:
+        batch.forget(instance.post_id)
+        generations.bump(generations.COMMENTS)
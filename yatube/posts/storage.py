@@ -0,0 +1,70 @@
+"""
+Хранилище картинок постов с адресацией по содержимому.
+
+Имя файла - sha256 его содержимого, поэтому повторная загрузка той же
+картинки не создает копию и пользуется теми же миниатюрами. Ссылки
+на файлы считает модель StoredImage, а удаляет ненужные файлы команда
+collect_images.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+FANOUT = 2
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = self.digest(content)
+        name = posixpath.join(
+            directory, digest[:FANOUT], f'{digest}{extension}'
+        )
+        return super().save(name, content, max_length)
+
+    def digest(self, content):
+        sha = hashlib.sha256()
+        for chunk in content.chunks():
+            sha.update(chunk)
+        content.seek(0)
+        return sha.hexdigest()
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя значит одинаковое содержимое: суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Свежая дата изменения защищает файл от сборки мусора,
+            # пока пост, который на него сошлется, еще не сохранен.
+            os.utime(full_path)
+            return name
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.upload-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            # Параллельная загрузка того же файла запишет те же байты.
+            os.replace(temporary, full_path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        return name
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,197 @@
+"""
+Ленты RSS, Atom и JSON Feed: вся лента сайта, группы и авторы.
+
+Лента строится по последним SYNDICATION_ITEMS постам одним запросом и
+хранится в кэше готовым текстом под ключом с поколениями того, что в ней
+показано: новый, измененный или удаленный пост меняет поколение, и ключ
+просто перестает запрашиваться. ETag и Last-Modified те же, что у
+HTML-страниц, поэтому читатель с валидаторами получает 304.
+"""
+import json
+from typing import Any, Dict, Sequence
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import (Atom1Feed, Rss201rev2Feed,
+                                        SyndicationFeed)
+from django.utils.text import Truncator
+
+from . import generations
+from .models import Group, Post, User
+
+
+class JsonFeed(SyndicationFeed):
+    """JSON Feed 1.1: https://www.jsonfeed.org/version/1.1/"""
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def write(self, outfile: Any, encoding: str) -> None:
+        feed = {
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+            'language': self.feed['language'],
+            'items': [self.item(item) for item in self.items],
+        }
+        json.dump(
+            {key: value for key, value in feed.items() if value is not None},
+            outfile, ensure_ascii=False
+        )
+
+    def item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        fields = {
+            'id': item['unique_id'] or item['link'],
+            'url': item['link'],
+            'title': item['title'],
+            'content_text': item['description'],
+            'date_published': item['pubdate'] and item['pubdate'].isoformat(),
+            'date_modified': (
+                item['updateddate'] and item['updateddate'].isoformat()
+            ),
+            'authors': item['author_name'] and [{
+                'name': item['author_name'], 'url': item['author_link'],
+            }],
+            'tags': list(item['categories']) or None,
+        }
+        return {key: value for key, value in fields.items() if value}
+
+
+FEED_TYPES = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+    'json': JsonFeed,
+}
+
+
+class PostFeed(Feed):
+    """Лента всего сайта; подклассы сужают посты до группы или автора."""
+    name = 'index'
+
+    def __init__(self, feed_format: str = 'rss') -> None:
+        self.feed_format = feed_format
+        self.feed_type = FEED_TYPES[feed_format]
+
+    def __call__(self, request: Any, *args: Any,
+                 **kwargs: Any) -> HttpResponse:
+        self.request = request
+        obj = self.get_object(request, *args, **kwargs)
+        key = self.cache_key(request, obj)
+        content = cache.get(key)
+        if content is None:
+            content = self.get_feed(obj, request).writeString('utf-8')
+            cache.set(key, content, generations.timeout(
+                settings.SYNDICATION_CACHE_TIMEOUT
+            ))
+        return HttpResponse(content, content_type=self.feed_type.content_type)
+
+    def cache_key(self, request: Any, obj: Any) -> str:
+        # В ленте абсолютные ссылки: адрес сайта входит в ключ.
+        return ':'.join((
+            'syndication', self.name, str(obj and obj.pk or ''),
+            self.feed_format, request.scheme, request.get_host(),
+            generations.version(self.namespaces(obj)),
+        ))
+
+    def namespaces(self, obj: Any) -> Sequence[str]:
+        return (generations.POSTS,)
+
+    def get_object(self, request: Any, *args: Any, **kwargs: Any) -> Any:
+        return None
+
+    def posts(self, obj: Any) -> Any:
+        return Post.objects.all()
+
+    def items(self, obj: Any) -> Any:
+        return self.posts(obj).select_related('author', 'group').order_by(
+            '-pub_date', '-pk'
+        )[:settings.SYNDICATION_ITEMS]
+
+    def title(self, obj: Any) -> str:
+        return 'Yatube: последние обновления'
+
+    def link(self, obj: Any) -> str:
+        return reverse('posts:index')
+
+    def description(self, obj: Any) -> str:
+        return 'Новые посты всех авторов'
+
+    def item_title(self, item: Post) -> str:
+        first_line = item.text.splitlines()[0] if item.text else ''
+        return Truncator(first_line).chars(settings.SYNDICATION_TITLE_LENGTH)
+
+    def item_description(self, item: Post) -> str:
+        return item.text
+
+    def item_link(self, item: Post) -> str:
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item: Post) -> Any:
+        return item.pub_date
+
+    def item_updateddate(self, item: Post) -> Any:
+        return item.updated_at
+
+    def item_author_name(self, item: Post) -> str:
+        return item.author.get_full_name() or item.author.username
+
+    def item_author_link(self, item: Post) -> str:
+        # Адрес автора, в отличие от ссылок, Feed не дополняет доменом.
+        return self.request.build_absolute_uri(reverse(
+            'posts:profile', kwargs={'username': item.author.username}
+        ))
+
+    def item_categories(self, item: Post) -> Sequence[str]:
+        return [item.group.title] if item.group else []
+
+
+class GroupFeed(PostFeed):
+    name = 'group'
+
+    def namespaces(self, obj: Group) -> Sequence[str]:
+        return (generations.group(obj.pk), generations.USERS)
+
+    def get_object(self, request: Any, slug: str) -> Group:
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, obj: Group) -> Any:
+        return obj.posts.all()
+
+    def title(self, obj: Group) -> str:
+        return f'Yatube: {obj.title}'
+
+    def link(self, obj: Group) -> str:
+        return reverse('posts:group_posts', kwargs={'slug': obj.slug})
+
+    def description(self, obj: Group) -> str:
+        return obj.description
+
+
+class AuthorFeed(PostFeed):
+    name = 'author'
+
+    def namespaces(self, obj: User) -> Sequence[str]:
+        # Названия групп выводятся в категориях постов.
+        return (
+            generations.profile(obj.pk), generations.author(obj.pk),
+            generations.GROUPS,
+        )
+
+    def get_object(self, request: Any, username: str) -> User:
+        return get_object_or_404(User, username=username)
+
+    def posts(self, obj: User) -> Any:
+        return obj.posts.all()
+
+    def title(self, obj: User) -> str:
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def link(self, obj: User) -> str:
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def description(self, obj: User) -> str:
+        return f'Посты автора {obj.username}'
@@ -0,0 +1,21 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/thumbnail.html')
+def post_picture(post, variant, image_class=''):
+    """
+    <picture> с адаптивными версиями миниатюры или заглушка.
+
+    Синхронного ресайза не бывает. Списки находят миниатюры всей страницы
+    заранее (thumbnails.annotate), иначе миниатюра ищется для одного поста.
+    """
+    found = getattr(post, 'thumbnails', {})
+    if variant in found:
+        image = found[variant]
+    else:
+        image = thumbnails.lookup(post.image, variant)
+    return {'im': image, 'image_class': image_class}
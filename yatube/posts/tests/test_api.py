@@ -0,0 +1,412 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import batch, follows
+from ..models import Comment, Group, Post
+from .constant_list import (ANOTHER_USER, COMMENT, GROUP_DESCRIPTION,
+                            GROUP_SLUG, GROUP_TITLE, NEW_POST_TEXT, POST_TEXT,
+                            USERNAME)
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username=USERNAME, first_name='Лев'
+        )
+        cls.reader = User.objects.create_user(username=ANOTHER_USER)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'{POST_TEXT} {number}',
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text=COMMENT
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, params=None, **kwargs):
+        return self.client.get(
+            reverse(f'posts:{name}', kwargs=kwargs), params or {}
+        )
+
+    def test_pages_follow_keyset_cursors(self):
+        """Страницы идут от новых к старым по курсору next."""
+        seen = []
+        address = reverse('posts:api_posts') + '?limit=2'
+        while address:
+            body = self.client.get(address).json()
+            seen += [post['id'] for post in body['data']]
+            address = body['links']['next']
+        self.assertEqual(seen, [post.pk for post in self.posts[::-1]])
+        body = self.get('api_posts', {'limit': 2, 'after': 'мусор'}).json()
+        self.assertEqual(len(body['data']), 2)
+
+    def test_previous_link_returns_to_first_page(self):
+        first = self.get('api_posts', {'limit': 2}).json()
+        second = self.client.get(first['links']['next']).json()
+        back = self.client.get(second['links']['previous']).json()
+        self.assertEqual(back['data'], first['data'])
+
+    def test_sparse_fields_are_one_projection(self):
+        """?fields= выбирает из базы только нужные колонки."""
+        with CaptureQueriesContext(connection) as queries:
+            body = self.get('api_posts', {'fields': 'text'}).json()
+        self.assertEqual(set(body['data'][0]), {'id', 'text'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"image"', sql)
+        self.assertIn('"text"', sql)
+
+    def test_include_resolves_relations_in_one_query(self):
+        """?include= добавляет авторов и группы в тот же запрос."""
+        with CaptureQueriesContext(connection) as queries:
+            body = self.get(
+                'api_posts', {'include': 'author,group'}
+            ).json()
+        post_queries = [
+            query for query in queries.captured_queries
+            if '"posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertEqual(body['included']['users'], [{
+            'id': self.author.pk, 'username': USERNAME,
+            'first_name': 'Лев', 'last_name': '',
+        }])
+        self.assertEqual(body['included']['groups'], [{
+            'id': self.group.pk, 'slug': GROUP_SLUG, 'title': GROUP_TITLE,
+        }])
+        self.assertEqual(body['data'][0]['author'], self.author.pk)
+
+    def test_unknown_fields_are_bad_request(self):
+        for params in ({'fields': 'password'}, {'include': 'comments'},
+                       {'limit': '1000'}, {'limit': '²'}):
+            with self.subTest(params=params):
+                response = self.get('api_posts', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('errors', response.json())
+
+    def test_etag_returns_not_modified(self):
+        """Повторный запрос с ETag получает 304, а новый пост - 200."""
+        response = self.get('api_posts')
+        etag = response['ETag']
+        response = self.client.get(
+            reverse('posts:api_posts'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text=POST_TEXT)
+        response = self.client.get(
+            reverse('posts:api_posts'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_comment_changes_list_etags(self):
+        """comments_count в списках: комментарий меняет их ETag."""
+        addresses = (
+            reverse('posts:api_posts'),
+            reverse('posts:api_group_posts', kwargs={'slug': GROUP_SLUG}),
+            reverse('posts:api_profile_posts',
+                    kwargs={'username': self.author.username}),
+        )
+        etags = {address: self.client.get(address)['ETag']
+                 for address in addresses}
+        Comment.objects.create(
+            post=self.posts[1], author=self.reader, text=COMMENT
+        )
+        for address, etag in etags.items():
+            with self.subTest(address=address):
+                response = self.client.get(
+                    address, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_detail_endpoints(self):
+        post = self.posts[1]
+        body = self.get('api_post', {'include': 'group'},
+                        post_id=post.pk).json()
+        self.assertEqual(body['data']['text'], post.text)
+        self.assertEqual(body['included']['groups'][0]['slug'], GROUP_SLUG)
+        body = self.get('api_group', slug=GROUP_SLUG).json()
+        self.assertEqual(body['data']['posts_count'], 2)
+        body = self.get('api_profile', username=USERNAME).json()
+        self.assertEqual(body['data']['posts_count'], 5)
+        body = self.get('api_groups').json()
+        self.assertEqual([group['slug'] for group in body['data']],
+                         [GROUP_SLUG])
+        for name, kwargs in (
+            ('api_post', {'post_id': 0}),
+            ('api_comments', {'post_id': 0}),
+            ('api_group', {'slug': 'nope'}),
+            ('api_group_posts', {'slug': 'nope'}),
+            ('api_profile', {'username': 'nobody'}),
+            ('api_profile_posts', {'username': 'nobody'}),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name, **kwargs).status_code, 404)
+
+    def test_filtered_lists(self):
+        body = self.get('api_group_posts', slug=GROUP_SLUG).json()
+        self.assertEqual(len(body['data']), 2)
+        body = self.get('api_profile_posts', username=ANOTHER_USER).json()
+        self.assertEqual(body['data'], [])
+        body = self.get('api_comments', {'include': 'author'},
+                        post_id=self.posts[0].pk).json()
+        self.assertEqual(body['data'][0]['text'], COMMENT)
+        self.assertEqual(body['included']['users'][0]['username'],
+                         ANOTHER_USER)
+
+    def test_profile_etag_follows_counters(self):
+        """Подписка меняет ETag профиля автора."""
+        # Анонимным посетителям ответ отдает кэш страниц.
+        self.client.force_login(self.reader)
+        etag = self.get('api_profile', username=USERNAME)['ETag']
+        follows.follow(self.reader.pk, [self.author.pk])
+        response = self.client.get(
+            reverse('posts:api_profile', kwargs={'username': USERNAME}),
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['followers_count'], 1)
+
+    def test_follow_feed(self):
+        self.assertEqual(self.get('api_follow').status_code, 401)
+        self.client.force_login(self.reader)
+        follows.follow(self.reader.pk, [self.author.pk])
+        body = self.get('api_follow', {'limit': 3}).json()
+        self.assertEqual(
+            [post['id'] for post in body['data']],
+            [post.pk for post in self.posts[:1:-1]]
+        )
+        body = self.client.get(body['links']['next']).json()
+        self.assertEqual(len(body['data']), 2)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_feed_with_popular_author(self):
+        self.client.force_login(self.reader)
+        follows.follow(self.reader.pk, [self.author.pk])
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        body = self.get('api_follow', {'limit': 1}).json()
+        self.assertEqual(body['data'][0]['id'], new_post.pk)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_api', '--repeat', '1', stdout=out)
+        self.assertIn('постов/с', out.getvalue())
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=POST_TEXT),
+            Post.objects.create(
+                author=cls.author, text=POST_TEXT, group=cls.group
+            ),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.missing = self.posts[1].pk + 1000
+        self.ids = [self.posts[1].pk, self.missing, self.posts[0].pk]
+
+    def batch(self, ids):
+        return self.client.get(
+            reverse('posts:api_post_batch'),
+            {'ids': ','.join(map(str, ids))}
+        )
+
+    def test_batch_keeps_order_and_reports_missing(self):
+        body = self.batch(self.ids).json()
+        self.assertEqual(
+            [post['id'] for post in body['data']],
+            [self.posts[1].pk, self.posts[0].pk]
+        )
+        self.assertEqual(body['missing'], [self.missing])
+        self.assertEqual(body['included']['users'][0]['username'], USERNAME)
+        self.assertEqual(body['included']['groups'][0]['slug'], GROUP_SLUG)
+        self.assertEqual(body['data'][0]['comments_count'], 0)
+
+    def test_batch_is_one_query_then_cached(self):
+        """Промахи читаются одним запросом, повтор - без запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(batch.get_posts(self.ids).keys(),
+                             {self.posts[0].pk, self.posts[1].pk})
+        self.assertEqual(len(queries), 1)
+        with self.assertNumQueries(0):
+            batch.get_posts(self.ids[::2])
+
+    def test_changes_expire_cached_posts(self):
+        """Комментарий, правка поста и переименование группы видны сразу."""
+        post = self.posts[1]
+        batch.get_posts([post.pk])
+        Comment.objects.create(post=post, author=self.author, text=COMMENT)
+        self.assertEqual(
+            batch.get_posts([post.pk])[post.pk]['post']['comments_count'], 1
+        )
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(
+            batch.get_posts([post.pk])[post.pk]['group']['title'],
+            'Новое название'
+        )
+        post.delete()
+        self.assertEqual(batch.get_posts([post.pk]), {})
+
+    @override_settings(API_BATCH_SIZE=2)
+    def test_bad_ids_are_rejected(self):
+        self.assertEqual(self.batch(self.ids).status_code, 400)
+        self.assertEqual(self.batch([]).json()['data'], [])
+        bad = ['x', '0', '-1', '²', '٣', '1.5', str(2 ** 63), '9' * 5000]
+        for value in bad:
+            with self.subTest(value=value[:20]):
+                self.assertEqual(self.batch([value]).status_code, 400)
+        self.assertEqual(self.batch([str(2 ** 63 - 1)]).status_code, 200)
+
+
+class SinceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=USERNAME)
+        cls.reader = User.objects.create_user(username=ANOTHER_USER)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text=POST_TEXT, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.addresses = (
+            reverse('posts:api_posts_since'),
+            reverse('posts:api_group_posts_since',
+                    kwargs={'slug': GROUP_SLUG}),
+            reverse('posts:api_profile_posts_since',
+                    kwargs={'username': USERNAME}),
+        )
+
+    def poll(self, address, **params):
+        params.setdefault('since_id', self.post.pk)
+        return self.client.get(address, params)
+
+    def test_idle_poll_is_one_cache_read(self):
+        """Пока новых постов нет - 204 без запросов к базе."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                self.assertEqual(self.poll(address).status_code, 204)
+                with mock.patch.object(
+                    cache, 'get_many', wraps=cache.get_many
+                ) as get_many, self.assertNumQueries(0):
+                    response = self.poll(address)
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(get_many.call_count, 1)
+
+    @override_settings(FEED_HEAD_LOCAL_TIMEOUT=0)
+    def test_local_cache_rechecks_head(self):
+        """В кэше процесса отметка пересчитывается и без новых поколений."""
+        address = self.addresses[0]
+        self.assertEqual(self.poll(address).status_code, 204)
+        # Пост без сигналов - как пост, добавленный другим процессом.
+        Post.objects.bulk_create([
+            Post(author=self.author, text=NEW_POST_TEXT)
+        ])
+        self.assertEqual(self.poll(address).status_code, 200)
+
+    def test_new_post_is_returned(self):
+        for address in self.addresses:
+            self.poll(address)
+        new_post = Post.objects.create(
+            author=self.author, text=NEW_POST_TEXT, group=self.group
+        )
+        for address in self.addresses:
+            with self.subTest(address=address):
+                body = self.poll(address).json()
+                self.assertEqual(
+                    [post['id'] for post in body['data']], [new_post.pk]
+                )
+                self.assertEqual(body['head']['id'], new_post.pk)
+
+    def test_moved_post_appears_in_group_feed(self):
+        other = Group.objects.create(title='Другая', slug='other')
+        address = reverse('posts:api_group_posts_since',
+                          kwargs={'slug': 'other'})
+        self.assertEqual(self.poll(address, since_id=0).status_code, 204)
+        self.post.group = other
+        self.post.save()
+        body = self.poll(address, since_id=0).json()
+        self.assertEqual(body['data'][0]['id'], self.post.pk)
+
+    def test_since_ts_and_pages(self):
+        posts = [
+            Post.objects.create(author=self.author, text=NEW_POST_TEXT)
+            for _ in range(3)
+        ]
+        since_ts = self.post.pub_date.isoformat()
+        body = self.client.get(
+            self.addresses[0], {'since_ts': since_ts, 'limit': 2}
+        ).json()
+        self.assertEqual(
+            [post['id'] for post in body['data']],
+            [post.pk for post in posts[:2]]
+        )
+        body = self.client.get(body['links']['next']).json()
+        self.assertEqual([post['id'] for post in body['data']],
+                         [posts[2].pk])
+        self.assertIsNone(body['links']['next'])
+
+    def test_bad_params(self):
+        for params in ({}, {'since_id': 'x'}, {'since_ts': 'вчера'},
+                       {'since_id': '²'}, {'since_id': '9' * 5000},
+                       {'since_id': 1, 'fields': 'password'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.addresses[0], params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_follow_feed(self):
+        address = reverse('posts:api_follow_since')
+        self.assertEqual(self.poll(address).status_code, 401)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.poll(address, since_id=0).status_code, 204)
+        follows.follow(self.reader.pk, [self.author.pk])
+        body = self.poll(address, since_id=0).json()
+        self.assertEqual(body['data'][0]['id'], self.post.pk)
+        self.assertEqual(self.poll(address).status_code, 204)
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        body = self.poll(address).json()
+        self.assertEqual(body['data'][0]['id'], new_post.pk)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_feed_with_popular_author(self):
+        address = reverse('posts:api_follow_since')
+        self.client.force_login(self.reader)
+        follows.follow(self.reader.pk, [self.author.pk])
+        # Первый пост переводит автора в чтение по запросу.
+        Post.objects.create(author=self.author, text=POST_TEXT)
+        head = self.poll(address, since_id=0).json()['head']['id']
+        self.assertEqual(self.poll(address, since_id=head).status_code, 204)
+        new_post = Post.objects.create(author=self.author, text=POST_TEXT)
+        body = self.poll(address, since_id=head).json()
+        self.assertEqual(body['data'][0]['id'], new_post.pk)
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from .constant_list import (ANOTHER_USER, COMMENT, GROUP_DESCRIPTION,
+                            GROUP_SLUG, GROUP_TITLE, NEW_POST_TEXT, POST_TEXT,
+                            USERNAME)
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.reader = User.objects.create_user(username=ANOTHER_USER)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text=POST_TEXT,
+            group=cls.group,
+        )
+        cls.addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': GROUP_SLUG}),
+            reverse('posts:profile', kwargs={'username': USERNAME}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Повторный запрос с валидаторами получает 304 без тела."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertIn('Last-Modified', response)
+                for headers in (
+                    {'HTTP_IF_NONE_MATCH': response['ETag']},
+                    {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+                ):
+                    again = self.client.get(address, **headers)
+                    self.assertEqual(again.status_code, 304)
+                    self.assertEqual(again.content, b'')
+                    self.assertIn('Cookie', again['Vary'])
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост и комментарий меняют ETag затронутых страниц."""
+        etags = {
+            address: self.client.get(address)['ETag']
+            for address in self.addresses
+        }
+        Post.objects.create(
+            author=self.user, text=NEW_POST_TEXT, group=self.group
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text=COMMENT
+        )
+        for address, etag in etags.items():
+            with self.subTest(address=address):
+                response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_visitor(self):
+        """Анонимный и авторизованный посетители получают разные ETag."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                etag = self.client.get(address)['ETag']
+                response = Client().get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_missing_objects_still_return_not_found(self):
+        """Для несуществующих объектов валидаторов нет, ответ 404."""
+        addresses = (
+            reverse('posts:group_posts', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import follows
+from ..models import Comment, Follow, Group, Post, UserStats
+from .constant_list import (ANOTHER_USER, COMMENT, GROUP_DESCRIPTION,
+                            GROUP_SLUG, GROUP_TITLE, NEW_GROUP_DESCRIPTION,
+                            NEW_GROUP_SLUG, NEW_GROUP_TITLE, POST_TEXT,
+                            USERNAME)
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=USERNAME)
+        self.reader = User.objects.create_user(username=ANOTHER_USER)
+        self.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        self.new_group = Group.objects.create(
+            title=NEW_GROUP_TITLE,
+            slug=NEW_GROUP_SLUG,
+            description=NEW_GROUP_DESCRIPTION,
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text=POST_TEXT,
+            group=self.group,
+        )
+
+    def assertCounter(self, obj, field, expected):
+        obj.refresh_from_db()
+        self.assertEqual(getattr(obj, field), expected, field)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счетчики."""
+        self.assertCounter(self.user.stats, 'posts_count', 1)
+        self.assertCounter(self.group, 'posts_count', 1)
+        self.post.group = self.new_group
+        self.post.save()
+        self.assertCounter(self.group, 'posts_count', 0)
+        self.assertCounter(self.new_group, 'posts_count', 1)
+        self.post.delete()
+        self.assertCounter(self.user.stats, 'posts_count', 0)
+        self.assertCounter(self.new_group, 'posts_count', 0)
+
+    def test_comment_counter(self):
+        """Комментарии учитываются в счетчике поста."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text=COMMENT
+        )
+        self.assertCounter(self.post, 'comments_count', 1)
+        comment.delete()
+        self.assertCounter(self.post, 'comments_count', 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счетчики обоих пользователей."""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounter(self.user.stats, 'followers_count', 1)
+        self.assertCounter(self.reader.stats, 'following_count', 1)
+        follow.delete()
+        self.assertCounter(self.user.stats, 'followers_count', 0)
+        self.assertCounter(self.reader.stats, 'following_count', 0)
+
+    def test_counters_do_not_go_negative(self):
+        """Расхождение счетчика не приводит к отрицательному значению."""
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        self.post.delete()
+        self.assertCounter(self.group, 'posts_count', 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        UserStats.objects.filter(user=self.user).update(posts_count=42)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCounter(self.user.stats, 'posts_count', 1)
+        self.assertCounter(self.group, 'posts_count', 1)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+
+    def test_pages_render_without_aggregates(self):
+        """Профиль и пост выводят число постов без COUNT."""
+        links = (
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        client = Client()
+        for link in links:
+            with self.subTest(link=link):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(link)
+                self.assertEqual(response.context['count'], 1)
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('COUNT(', sql.upper())
+
+    def test_user_without_stats(self):
+        """Пользователь без UserStats, как после loaddata, видит страницы."""
+        UserStats.objects.filter(user=self.user).delete()
+        links = (
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        client = Client()
+        for link in links:
+            with self.subTest(link=link):
+                response = client.get(link)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['count'], 1)
+
+    def test_bump_creates_missing_stats(self):
+        """Увеличение счетчика создает строку со значениями по данным."""
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.create(author=self.user, text=POST_TEXT)
+        self.assertCounter(self.user.stats, 'posts_count', 2)
+        UserStats.objects.filter(user=self.reader).delete()
+        follows.follow(self.reader.pk, [self.user.pk])
+        self.assertCounter(self.user.stats, 'followers_count', 1)
+        self.assertCounter(self.reader.stats, 'following_count', 1)
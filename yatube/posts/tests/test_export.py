@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models.query import QuerySet
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post
+from .constant_list import GROUP_SLUG, USERNAME
+
+User = get_user_model()
+
+
+class ExportContentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=USERNAME)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug=GROUP_SLUG, description='Описание'
+        )
+        cls.old = Post.objects.create(
+            author=cls.author, text='Старый', group=cls.group
+        )
+        cls.new = Post.objects.create(author=cls.reader, text='Новый')
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.make_aware(datetime(2020, 1, 1, 12))
+        )
+        Comment.objects.create(post=cls.old, author=cls.reader, text='Да')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_content', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson_export_uses_fixture_format(self):
+        """NDJSON - записи фикстуры, которые читает import_content."""
+        records = [
+            json.loads(line) for line in self.export('posts').splitlines()
+        ]
+        self.assertEqual(
+            [record['pk'] for record in records], [self.old.pk, self.new.pk]
+        )
+        self.assertEqual(records[0]['model'], 'posts.post')
+        self.assertEqual(records[0]['fields']['text'], 'Старый')
+        self.assertEqual(records[0]['fields']['author'], self.author.pk)
+        self.assertEqual(records[0]['fields']['group'], self.group.pk)
+
+    def test_filters(self):
+        """Фильтры по датам, автору и группе."""
+        cases = (
+            (('posts', '--until', '2020-01-01'), [self.old.pk]),
+            (('posts', '--since', '2020-01-02'), [self.new.pk]),
+            (('posts', '--author', 'reader'), [self.new.pk]),
+            (('posts', '--group', GROUP_SLUG), [self.old.pk]),
+            (('comments', '--group', GROUP_SLUG),
+             [self.old.comments.get().pk]),
+            (('follows', '--author', USERNAME), [Follow.objects.get().pk]),
+        )
+        for args, expected in cases:
+            with self.subTest(args=args):
+                records = [
+                    json.loads(line)['pk']
+                    for line in self.export(*args).splitlines()
+                ]
+                self.assertEqual(records, expected)
+
+    def test_unknown_author_is_an_error(self):
+        with self.assertRaises(CommandError):
+            self.export('posts', '--author', 'nobody')
+
+    def test_csv_export_to_file(self):
+        descriptor, path = tempfile.mkstemp(suffix='.csv')
+        os.close(descriptor)
+        try:
+            self.export('follows', '--format', 'csv', '--output', path)
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = list(csv.reader(file))
+        finally:
+            os.remove(path)
+        self.assertEqual(rows, [
+            ['id', 'user', 'author'],
+            [str(Follow.objects.get().pk), str(self.reader.pk),
+             str(self.author.pk)],
+        ])
+
+    def test_rows_are_read_with_iterator(self):
+        """Строки читаются кусками через iterator(), а не списком."""
+        with mock.patch.object(
+            QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator
+        ) as iterator:
+            self.export('posts')
+        self.assertEqual(iterator.call_count, 1)
+        self.assertEqual(iterator.call_args[1], {'chunk_size': 2000})
+
+    def test_endpoint_is_staff_only(self):
+        """Выгрузка по HTTP доступна только персоналу."""
+        address = reverse('posts:export', kwargs={'kind': 'posts'})
+        client = Client()
+        self.assertEqual(client.get(address).status_code, 302)
+        client.force_login(self.reader)
+        self.assertEqual(client.get(address).status_code, 302)
+
+    def test_endpoint_streams_csv(self):
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(
+            reverse('posts:export', kwargs={'kind': 'comments'}),
+            {'format': 'csv', 'author': 'reader'}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('comments.csv', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.splitlines()[0], 'id,post,author,text,created')
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_endpoint_rejects_bad_filters(self):
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(
+            reverse('posts:export', kwargs={'kind': 'posts'}),
+            {'since': 'вчера'}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = client.get(
+            reverse('posts:export', kwargs={'kind': 'users'})
+        )
+        self.assertEqual(response.status_code, 404)
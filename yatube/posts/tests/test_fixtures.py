@@ -0,0 +1,35 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+
+DUMP = os.path.join(settings.BASE_DIR, 'dump.json')
+# Служебные таблицы Django в базе тестов уже заполнены миграциями.
+DUMP_EXCLUDE = ('contenttypes', 'auth.permission', 'admin', 'sessions')
+
+
+def load_dump():
+    call_command(
+        'loaddata', DUMP, exclude=list(DUMP_EXCLUDE), verbosity=0
+    )
+
+
+class DumpFixtureTest(TestCase):
+    def test_dump_loads_and_renders(self):
+        """dump.json без updated_at загружается и открывается на страницах."""
+        load_dump()
+        post = Post.objects.first()
+        self.assertEqual(post.updated_at, post.pub_date)
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': post.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        client = Client()
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertEqual(client.get(address).status_code, 200)
@@ -1,8 +1,14 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import follows
+from ..models import Follow, Group, Post, Timeline
 from .constant_list import (ANOTHER_USER, GROUP_DESCRIPTION, GROUP_SLUG,
                             GROUP_TITLE, NEW_POST_TEXT, NEW_USER, POST_TEXT,
                             USERNAME)
@@ -107,3 +113,171 @@ class FollowingTest(TestCase):
             reverse('posts:follow_index')
         )
         self.assertIsNone(response.context)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=USERNAME)
+        cls.user = User.objects.create_user(username=ANOTHER_USER)
+        cls.post = Post.objects.create(author=cls.author, text=POST_TEXT)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}
+            )
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит посты автора в ленту подписчика."""
+        self.follow()
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=self.post).exists()
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text=NEW_POST_TEXT)
+        entry = Timeline.objects.get(user=self.user, post=new_post)
+        self.assertEqual(entry.pub_date, new_post.pub_date)
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка удаляет посты автора из ленты."""
+        self.follow()
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text=NEW_POST_TEXT)
+        self.assertFalse(
+            Timeline.objects.filter(post=new_post).exists(),
+            'Пост популярного автора не должен раскладываться по лентам'
+        )
+        self.assertFalse(Follow.objects.get(user=self.user).fanout)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        self.follow()
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=ANOTHER_USER)
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(author=cls.authors[0], text=POST_TEXT)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def bulk(self, action, usernames):
+        return self.authorized_client.post(
+            reverse('posts:follow_bulk'),
+            {'action': action, 'author': usernames}
+        )
+
+    def test_follow_is_one_insert(self):
+        """Подписка на нескольких авторов - один INSERT."""
+        with CaptureQueriesContext(connection) as queries:
+            follows.follow(self.user.pk, [a.pk for a in self.authors])
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT')
+            and '"posts_follow"' in query['sql']
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=self.post).exists()
+        )
+
+    def test_repeated_follow_is_counted_once(self):
+        """Повторная подписка ничего не меняет и не ломает счетчики."""
+        ids = [self.user.pk] + [author.pk for author in self.authors[:2]]
+        self.assertEqual(len(follows.follow(self.user.pk, ids)), 2)
+        self.assertEqual(follows.follow(self.user.pk, ids), [])
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 2)
+        self.authors[0].stats.refresh_from_db()
+        self.assertEqual(self.authors[0].stats.followers_count, 1)
+
+    def test_follow_does_not_count_followers(self):
+        """Счетчики меняются на разницу, без COUNT по подпискам."""
+        ids = [author.pk for author in self.authors]
+        for action in (follows.follow, follows.unfollow):
+            with self.subTest(action=action.__name__):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(action(self.user.pk, ids), ids)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if 'COUNT(' in query['sql']
+                ])
+
+    def test_bulk_endpoint(self):
+        usernames = [author.username for author in self.authors] + ['nobody']
+        response = self.bulk('follow', usernames)
+        self.assertEqual(response.json(), {
+            'action': 'follow',
+            'changed': usernames[:3],
+            'unknown': ['nobody'],
+        })
+        response = self.bulk('unfollow', usernames[:2])
+        self.assertEqual(response.json()['changed'], usernames[:2])
+        self.assertEqual(
+            list(self.user.follower.values_list('author', flat=True)),
+            [self.authors[2].pk]
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 1)
+        self.authors[0].stats.refresh_from_db()
+        self.assertEqual(self.authors[0].stats.followers_count, 0)
+
+    @override_settings(FOLLOW_BULK_LIMIT=2)
+    def test_bulk_endpoint_rejects_bad_requests(self):
+        usernames = [author.username for author in self.authors]
+        self.assertEqual(self.bulk('follow', usernames).status_code, 400)
+        self.assertEqual(self.bulk('block', usernames[:1]).status_code, 400)
+        response = self.authorized_client.get(reverse('posts:follow_bulk'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_follow_authors_command(self):
+        usernames = [author.username for author in self.authors]
+        out = StringIO()
+        call_command('follow_authors', ANOTHER_USER, *usernames, stdout=out)
+        self.assertIn('3', out.getvalue())
+        call_command(
+            'follow_authors', ANOTHER_USER, usernames[0], '--unfollow',
+            stdout=StringIO()
+        )
+        self.assertEqual(self.user.follower.count(), 2)
+        with self.assertRaises(CommandError):
+            call_command('follow_authors', ANOTHER_USER, 'nobody')
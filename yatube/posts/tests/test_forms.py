@@ -1,13 +1,21 @@
+import hashlib
 import shutil
+import struct
 import tempfile
+import tracemalloc
+import zlib
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
-from ..models import Group, Post
+from ..forms import PostForm
+
+from ..models import Group, Post, StoredImage
 from .constant_list import (ANOTHER_USER, COMMENT, GROUP_DESCRIPTION,
                             GROUP_SLUG, GROUP_TITLE, NEW_POST_TEXT, POST_TEXT,
                             USERNAME)
@@ -78,7 +86,11 @@ class PostFormTests(TestCase):
         ).exclude(id__in=exist_posts_id)[0]
         self.assertEqual(expected_post.text, form_data['text'])
         self.assertEqual(expected_post.group.id, form_data['group'])
-        self.assertEqual(expected_post.image, 'posts/small.gif')
+        with expected_post.image.open() as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        self.assertEqual(
+            expected_post.image, f'posts/{digest[:2]}/{digest}.gif'
+        )
 
     def test_edit_post(self):
         """Валидная форма редактирует пост."""
@@ -197,3 +209,105 @@ class PostFormTests(TestCase):
                          'текст комментария не совпадает с заданым')
         self.assertEqual(comment.author, self.user,
                          'автор комментария не совпадает')
+
+
+def png_header(width, height):
+    """PNG с огромными размерами в заголовке и почти пустыми данными."""
+    def chunk(kind, data):
+        return (
+            struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data))
+        )
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+        + chunk(b'IDAT', zlib.compress(b'\x00')) + chunk(b'IEND', b'')
+    )
+
+
+def image_upload(size, name='image.jpg', image_format='JPEG', **params):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, image_format, **params)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def clean(self, upload):
+        form = PostForm(data={'text': POST_TEXT}, files={'image': upload})
+        valid = form.is_valid()
+        return form, valid and Image.open(form.cleaned_data['image'])
+
+    def test_huge_image_is_rejected_by_header(self):
+        """Гигантская картинка отклоняется по заголовку, без декодирования."""
+        upload = SimpleUploadedFile(
+            'bomb.png', png_header(8000, 8000), 'image/png'
+        )
+        tracemalloc.start()
+        try:
+            form, image = self.clean(upload)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertFalse(image)
+        self.assertIn('image', form.errors)
+        # Полное декодирование заняло бы 64 Мб.
+        self.assertLess(peak, 10 * 1024 * 1024)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_pixel_limit_comes_from_settings(self):
+        """Лимит пикселей настраивается в settings."""
+        form, image = self.clean(image_upload((101, 100)))
+        self.assertEqual(
+            form.errors['image'][0],
+            'Картинка 101x100 больше 10000 пикселей.'
+        )
+        form, image = self.clean(image_upload((100, 100)))
+        self.assertEqual(image.size, (100, 100))
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_file_size_limit(self):
+        """Слишком большой файл отклоняется."""
+        form, image = self.clean(image_upload((100, 100)))
+        self.assertFalse(image)
+        self.assertEqual(form.errors['image'][0], 'Файл больше 100 байт.')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=64)
+    def test_resolution_is_capped(self):
+        """Оригинал ужимается до POST_IMAGE_MAX_SIDE с сохранением формы."""
+        form, image = self.clean(image_upload((1024, 512)))
+        self.assertEqual(image.size, (64, 32))
+        self.assertEqual(image.format, 'JPEG')
+
+    def test_exif_is_stripped_and_orientation_applied(self):
+        """EXIF удаляется, а поворот из него применяется к пикселям."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        form, image = self.clean(image_upload((40, 20), exif=exif.tobytes()))
+        self.assertEqual(image.size, (20, 40))
+        self.assertNotIn('exif', image.info)
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с двумя ссылками."""
+        user = User.objects.create_user(username=USERNAME)
+        client = Client()
+        client.force_login(user)
+        for name in ('photo.jpg', 'copy.jpg'):
+            client.post(reverse('posts:post_create'), {
+                'text': POST_TEXT,
+                'image': image_upload((300, 200), name=name),
+            })
+        first, second = Post.objects.filter(author=user)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/\w{2}/\w{64}\.jpg$')
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).refcount, 2
+        )
+        with Image.open(first.image) as image:
+            self.assertEqual(image.size, (300, 200))
@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import importer
+from ..models import Comment, Follow, Group, ImportedObject, Post, Timeline
+
+User = get_user_model()
+
+RECORDS = [
+    {'model': 'posts.comment', 'pk': 1, 'fields': {
+        'post': 7, 'author': 2, 'text': 'Комментарий',
+        'created': '2020-01-02T00:00:00Z',
+    }},
+    {'model': 'posts.follow', 'pk': 1, 'fields': {'user': 3, 'author': 2}},
+    {'model': 'posts.post', 'pk': 7, 'fields': {
+        'text': 'Старый пост', 'pub_date': '1854-03-14T00:00:00Z',
+        'author': 2, 'group': 5, 'image': '',
+    }},
+    {'model': 'posts.post', 'pk': 8, 'fields': {
+        'text': 'Пост без автора', 'pub_date': '1854-03-15T00:00:00Z',
+        'author': 99, 'group': None, 'image': '',
+    }},
+    {'model': 'auth.user', 'pk': 2, 'fields': {
+        'username': 'leo', 'password': '!', 'groups': [1],
+    }},
+    {'model': 'auth.user', 'pk': 3, 'fields': {
+        'username': 'existing', 'password': '!',
+    }},
+    {'model': 'posts.group', 'pk': 5, 'fields': {
+        'title': 'Толстой', 'slug': 'leo', 'description': 'Группа',
+    }},
+    {'model': 'sessions.session', 'pk': 'x', 'fields': {}},
+]
+
+
+class ImportContentTests(TestCase):
+    def setUp(self):
+        # Ключи источника заняты в базе: импорт должен их переназначить.
+        self.existing = User.objects.create_user(username='existing')
+        for number in range(3):
+            User.objects.create_user(username=f'user{number}')
+        descriptor, self.path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            for record in RECORDS:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def import_content(self, *args):
+        out = StringIO()
+        call_command('import_content', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_remaps_keys_and_keeps_dates(self):
+        """Ключи переназначаются, даты и связи сохраняются."""
+        output = self.import_content('--batch-size', '1')
+        self.assertIn('строк/с', output)
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.group.slug, 'leo')
+        self.assertEqual(post.pub_date.year, 1854)
+        self.assertEqual(post.comments_count, 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, post)
+        self.assertEqual(comment.created.year, 2020)
+        follow = Follow.objects.get()
+        self.assertEqual(follow.user, self.existing)
+        self.assertEqual(follow.author, post.author)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.existing, post=post).exists()
+        )
+        # Пост несуществующего автора пропущен.
+        self.assertFalse(Post.objects.filter(text='Пост без автора').exists())
+        self.assertFalse(User.objects.get(username='leo').groups.exists())
+
+    def test_keys_are_assigned_under_table_lock(self):
+        """Max('pk') читается после блокировки вставки в таблицу."""
+        with CaptureQueriesContext(connection) as queries:
+            self.import_content()
+        sql = [query['sql'] for query in queries.captured_queries]
+        lock = next(
+            number for number, query in enumerate(sql)
+            if query.startswith('UPDATE "posts_post"')
+        )
+        last = next(
+            number for number, query in enumerate(sql)
+            if 'MAX("posts_post"."id")' in query
+        )
+        self.assertLess(lock, last)
+
+    def test_skip_finish_still_resets_sequences(self):
+        """Последовательности ключей сдвигаются и без пересчета."""
+        reset = mock.Mock(wraps=importer.reset_sequence)
+        with mock.patch.object(importer, 'reset_sequence', reset):
+            self.import_content('--skip-finish')
+        self.assertIn(Post, [call.args[0] for call in reset.call_args_list])
+        post = Post.objects.create(author=self.existing, text='Новый пост')
+        self.assertGreater(post.pk, Post.objects.exclude(pk=post.pk).get().pk)
+
+    def test_repeated_follow_maps_to_existing_row(self):
+        """Повтор подписки связывается с уже вставленной строкой."""
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'model': 'posts.follow', 'pk': 2,
+                                   'fields': {'user': 3, 'author': 2}}))
+        self.import_content()
+        follow = Follow.objects.get()
+        self.assertEqual(
+            list(ImportedObject.objects.filter(
+                model='posts.follow'
+            ).values_list('target_pk', flat=True)),
+            [follow.pk, follow.pk]
+        )
+
+    def test_interrupted_import_resumes(self):
+        """Повторный запуск после сбоя догружает только недостающее."""
+        original = importer.Importer.import_batch
+        calls = []
+
+        def failing(self, model, objects):
+            calls.append(model)
+            if len(calls) == 4:
+                raise RuntimeError('Сбой')
+            return original(self, model, objects)
+
+        with mock.patch.object(importer.Importer, 'import_batch', failing):
+            with self.assertRaises(RuntimeError):
+                self.import_content('--batch-size', '1')
+        self.assertEqual(Group.objects.count(), 1)
+        self.import_content('--batch-size', '1')
+        self.import_content()
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(User.objects.filter(username='leo').count(), 1)
+        self.assertEqual(
+            ImportedObject.objects.filter(model='posts.post').count(), 1
+        )
+
+    def test_import_fixture_streams_json_array(self):
+        """dump.json загружается без loaddata."""
+        path = os.path.join(settings.BASE_DIR, 'dump.json')
+        with open(path, encoding='utf-8') as file:
+            expected = sum(
+                record['model'] == 'posts.post' for record in json.load(file)
+            )
+        call_command('import_content', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), expected)
+
+    def test_json_array_is_read_in_chunks(self):
+        records = [{'model': 'x', 'pk': pk, 'text': ']' * pk}
+                   for pk in range(50)]
+        file = StringIO(json.dumps(records, indent=2))
+        self.assertEqual(
+            list(importer.iter_json_array(file, chunk_size=16)), records
+        )
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from .constant_list import (ANOTHER_USER, COMMENT, GROUP_DESCRIPTION,
+                            GROUP_SLUG, GROUP_TITLE, USERNAME)
+
+User = get_user_model()
+NUMBER_OF_POSTS = 13
+LISTING_TABLES = ('posts_post', 'posts_timeline', 'posts_comment',
+                  'posts_follow')
+
+
+class QueryPlanTest(TestCase):
+    """Запросы списков идут по индексам, без полного обхода и сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.reader = User.objects.create_user(username=ANOTHER_USER)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(NUMBER_OF_POSTS):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group
+            )
+        Comment.objects.create(post=cls.post, author=cls.reader, text=COMMENT)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def listing_queries(self, address, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(address, params or {})
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and any(table in query['sql'] for table in LISTING_TABLES)
+        ], response
+
+    def assertIndexedPlan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        for step in plan:
+            self.assertNotIn('TEMP B-TREE', step, f'{sql}\n{plan}')
+            if step.startswith('SCAN'):
+                self.assertIn('INDEX', step, f'{sql}\n{plan}')
+
+    def test_listing_queries_use_indexes(self):
+        """EXPLAIN QUERY PLAN списков не содержит SCAN и TEMP B-TREE."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for address in addresses:
+            queries, response = self.listing_queries(address)
+            page_obj = response.context.get('page_obj')
+            pages = [{}]
+            if page_obj is not None:
+                pages += [{'after': page_obj.next_cursor}, {'page': 2}]
+            for params in pages[1:]:
+                queries += self.listing_queries(address, params)[0]
+            for sql in queries:
+                with self.subTest(address=address, sql=sql):
+                    self.assertIndexedPlan(sql)
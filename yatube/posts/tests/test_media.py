@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import media, thumbnails
+from ..models import Post, StoredImage
+from ..storage import content_storage
+from .constant_list import POST_TEXT, USERNAME
+from .test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaCollectTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text=POST_TEXT,
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def files(self):
+        return [
+            name for _, _, names in os.walk(TEMP_MEDIA_ROOT) for name in names
+        ]
+
+    def test_refcount_follows_posts(self):
+        """Счетчик ссылок меняется при создании, правке и удалении постов."""
+        first = self.create_post()
+        second = self.create_post('other.gif')
+        name = first.image.name
+        self.assertEqual(name, second.image.name)
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 2)
+        second.image = ''
+        second.save()
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 1)
+        first.delete()
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 0)
+
+    def test_unreferenced_image_and_thumbnails_are_deleted(self):
+        """Файл без ссылок удаляется вместе с миниатюрами."""
+        post = self.create_post()
+        name = post.image.name
+        self.assertGreater(thumbnails.generate(post.image), 0)
+        post.delete()
+        self.assertEqual(media.collect(grace=0), [name])
+        self.assertFalse(content_storage.exists(name))
+        self.assertEqual(self.files(), [])
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+
+    def test_referenced_image_is_kept(self):
+        """Файл, на который ссылается пост, не удаляется."""
+        post = self.create_post()
+        self.create_post().delete()
+        self.assertEqual(media.collect(grace=0, scan=True), [])
+        self.assertTrue(content_storage.exists(post.image.name))
+
+    def test_grace_period_protects_fresh_files(self):
+        """Недавно загруженный файл без ссылок переживает сборку."""
+        post = self.create_post()
+        post.delete()
+        self.assertEqual(media.collect(grace=60), [])
+        self.assertTrue(content_storage.exists(post.image.name))
+
+    def test_scan_finds_untracked_files(self):
+        """--scan находит файлы без учета ссылок, --dry-run их не трогает."""
+        name = content_storage.save(
+            'posts/legacy.gif',
+            SimpleUploadedFile('legacy.gif', SMALL_GIF, 'image/gif'),
+        )
+        out = StringIO()
+        call_command(
+            'collect_images', grace=0, scan=True, dry_run=True, stdout=out
+        )
+        self.assertIn(name, out.getvalue())
+        self.assertTrue(content_storage.exists(name))
+        call_command('collect_images', grace=0, scan=True, stdout=StringIO())
+        self.assertFalse(content_storage.exists(name))
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from ..middleware import (HIT, MISS, STALE, PageCacheMiddleware,
+                          page_cache_stats)
+from ..models import Comment, Post
+from .constant_list import COMMENT, NEW_POST_TEXT, POST_TEXT, USERNAME
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(author=cls.user, text=POST_TEXT)
+        cls.url = reverse('posts:index')
+
+    def setUp(self):
+        cache.clear()
+        page_cache_stats.clear()
+        self.client = Client()
+
+    def lock(self):
+        request = RequestFactory().get(self.url)
+        cache.add(f'{PageCacheMiddleware(None).key(request)}:lock', 1)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """Повторный анонимный запрос отдается из кэша без SQL."""
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], MISS)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], HIT)
+        self.assertContains(response, POST_TEXT)
+        self.assertEqual(page_cache_stats, {MISS: 1, HIT: 1})
+
+    def test_authenticated_page_is_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются целиком."""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_api_is_not_cached(self):
+        """Ответы API не попадают в кэш страниц."""
+        for url in (reverse('posts:api_posts'), reverse('posts:api_groups')):
+            with self.subTest(url=url):
+                self.assertNotIn('X-Page-Cache', self.client.get(url))
+
+    def test_new_post_recomputes_page(self):
+        """Новый пост делает копию устаревшей, и страница пересчитывается."""
+        self.client.get(self.url)
+        Post.objects.create(author=self.user, text=NEW_POST_TEXT)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], MISS)
+        self.assertContains(response, NEW_POST_TEXT)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_new_comment_recomputes_post_page(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], MISS)
+        Comment.objects.create(
+            post=self.post, author=self.user, text=COMMENT
+        )
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], MISS)
+        self.assertContains(response, COMMENT)
+
+    def test_stale_copy_is_served_while_locked(self):
+        """Пока страницу пересчитывает другой запрос, отдается старая копия."""
+        self.client.get(self.url)
+        Post.objects.create(author=self.user, text=NEW_POST_TEXT)
+        self.lock()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], STALE)
+        self.assertNotContains(response, NEW_POST_TEXT)
+
+    def test_cached_page_answers_conditional_get(self):
+        """Кэшированная страница отвечает 304 на совпадающий ETag."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Page-Cache'], HIT)
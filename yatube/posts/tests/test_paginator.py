@@ -1,6 +1,9 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Group, Post
@@ -29,6 +32,9 @@ class PaginatorViewsTest(TestCase):
             )
             posts_list.append(cls.post)
 
+    def setUp(self):
+        cache.clear()
+
     def test_1st_page_contains_10_records(self):
         """Проверка работы паджинатора на первой странице"""
         links = (
@@ -64,3 +70,64 @@ class PaginatorViewsTest(TestCase):
                         number_of_posts,
                         (remaining_posts % settings.POSTS_PER_PAGE)
                     )
+
+    def test_next_cursor_page_contains_remaining_records(self):
+        """Курсор следующей страницы ведет к оставшимся постам."""
+        response = self.client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertIsNotNone(next_cursor)
+        response = self.client.get(
+            reverse('posts:index'), {'after': next_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            len(page_obj), NUMBER_OF_POSTS - settings.POSTS_PER_PAGE
+        )
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        self.assertEqual(page_obj[0], posts_list[2])
+
+    def test_previous_cursor_page_returns_first_page(self):
+        """Курсор предыдущей страницы возвращает на первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        previous_cursor = response.context['page_obj'].previous_cursor
+        response = self.client.get(
+            reverse('posts:index'), {'before': previous_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            list(page_obj),
+            posts_list[::-1][:settings.POSTS_PER_PAGE]
+        )
+        self.assertFalse(page_obj.has_previous())
+
+    def test_cursor_pages_do_not_count_posts(self):
+        """Постраничный вывод не считает все посты через COUNT."""
+        response = self.client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        for params in ({}, {'after': next_cursor}, {'page': 2}):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse('posts:index'), params)
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('COUNT(', sql.upper())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'after': 'broken'}
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_huge_page_number_returns_last_page(self):
+        """Номер страницы за пределами целых базы - последняя страница."""
+        for page in ('999', '9' * 23):
+            with self.subTest(page=page):
+                response = self.client.get(
+                    reverse('posts:index'), {'page': page}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    NUMBER_OF_POSTS - settings.POSTS_PER_PAGE
+                )
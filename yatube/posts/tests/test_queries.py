@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.middleware import NPlusOneError, QueryBudgetExceeded, QueryInspector
+
+from .. import thumbnails
+from ..models import Comment, Follow, Group, Post
+from .constant_list import (ANOTHER_USER, COMMENT, GROUP_DESCRIPTION,
+                            GROUP_SLUG, GROUP_TITLE, NEW_USER, USERNAME)
+from .test_fixtures import load_dump
+
+User = get_user_model()
+NUMBER_OF_POSTS = 60
+PAGE_SIZES = (1, 10, 50)
+# Каждый IMAGE_STEP-й пост с картинкой, у половины из них есть миниатюры.
+IMAGE_STEP = 3
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(number):
+    file = BytesIO()
+    Image.new('RGB', (8, 8), (number % 256, 0, 0)).save(file, 'GIF')
+    return SimpleUploadedFile(f'{number}.gif', file.getvalue(), 'image/gif')
+
+
+@override_settings(
+    QUERY_INSPECTOR_ACTION='raise', MEDIA_ROOT=TEMP_MEDIA_ROOT
+)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.reader = User.objects.create_user(username=ANOTHER_USER)
+        authors = [
+            User.objects.create_user(username=USERNAME),
+            User.objects.create_user(username=NEW_USER),
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(NUMBER_OF_POSTS):
+            cls.post = Post.objects.create(
+                author=authors[i % len(authors)],
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+                image=make_image(i) if i % IMAGE_STEP == 0 else None,
+            )
+            if i % (IMAGE_STEP * 2) == 0:
+                thumbnails.pregenerate(cls.post.pk)
+        for author in authors:
+            Comment.objects.create(post=cls.post, author=author, text=COMMENT)
+        cls.author = authors[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_views_fit_query_budget(self):
+        """
+        Страницы укладываются в бюджет запросов при любом размере.
+
+        Кэш очищается перед каждой страницей: миниатюры и фрагменты
+        читаются из базы.
+        """
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for per_page in PAGE_SIZES:
+            for address in addresses:
+                with self.subTest(address=address, per_page=per_page):
+                    cache.clear()
+                    with self.settings(POSTS_PER_PAGE=per_page):
+                        response = self.client.get(address)
+                    self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 0})
+    def test_budget_overrun_is_reported(self):
+        """Превышение бюджета запросов приводит к ошибке."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    def test_repeated_query_is_detected(self):
+        """Повторяющийся в цикле запрос распознается как N+1."""
+        inspector = QueryInspector('raise', threshold=3)
+        with self.assertRaises(NPlusOneError):
+            with connection.execute_wrapper(inspector):
+                for post in Post.objects.all()[:3]:
+                    post.author.username
+
+
+@override_settings(QUERY_INSPECTOR_ACTION='raise')
+class DumpQueryBudgetTest(TestCase):
+    def test_dump_pages_fit_query_budget(self):
+        """Страницы с картинками и подписками из dump.json в бюджете."""
+        load_dump()
+        post = Post.objects.exclude(image='').exclude(group=None).first()
+        client = Client()
+        client.force_login(Follow.objects.first().user)
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': post.group.slug}),
+            reverse('posts:profile', kwargs={'username': post.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                cache.clear()
+                self.assertEqual(client.get(address).status_code, 200)
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import resize
+from ..storage import content_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_RESIZE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(size=(400, 200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, RESIZE_CACHE_ROOT=TEMP_RESIZE_ROOT
+)
+class ResizeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT):
+            cls.name = content_storage.save('posts/photo.jpg', jpeg())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_RESIZE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_RESIZE_ROOT, ignore_errors=True)
+        self.client = Client()
+
+    def cached_files(self):
+        return [
+            name for _, _, names in os.walk(TEMP_RESIZE_ROOT)
+            for name in names
+        ]
+
+    def test_signed_url_returns_resized_copy(self):
+        """Подписанный адрес отдает копию в рамке и долгий Cache-Control."""
+        response = self.client.get(resize.url(self.name, 100, 100))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.size, (100, 50))
+
+    def test_unsigned_geometry_is_refused(self):
+        """Чужая подпись или подмененный размер дают 403 без ресайза."""
+        signature = resize.sign(100, 100, self.name)
+        addresses = (
+            reverse('resize_image', kwargs={
+                'signature': signature, 'width': 101, 'height': 100,
+                'name': self.name,
+            }),
+            reverse('resize_image', kwargs={
+                'signature': 'forged', 'width': 100, 'height': 100,
+                'name': self.name,
+            }),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.cached_files(), [])
+
+    def test_missing_source_is_not_found(self):
+        response = self.client.get(resize.url('posts/missing.jpg', 50, 50))
+        self.assertEqual(response.status_code, 404)
+
+    def test_second_request_is_served_from_disk_cache(self):
+        """Повторный запрос не декодирует картинку."""
+        address = resize.url(self.name, 60, 60)
+        self.client.get(address)
+        with mock.patch.object(resize, 'encode') as encode:
+            response = self.client.get(address)
+        self.assertEqual(response.status_code, 200)
+        encode.assert_not_called()
+
+    def test_concurrent_requests_wait_for_one_encoder(self):
+        """Одновременные запросы одной копии кодирует один поток."""
+        original = resize.encode
+        calls = []
+
+        def slow_encode(*args):
+            calls.append(args)
+            threading.Event().wait(0.2)
+            return original(*args)
+
+        results = []
+        with mock.patch.object(resize, 'encode', slow_encode):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        resize.render(80, 80, self.name)
+                    )
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(results)), 1)
+
+    def test_cache_evicts_least_recently_used(self):
+        """При переполнении удаляются давно не запрошенные копии."""
+        old, _ = resize.render(40, 40, self.name)
+        os.utime(old, (1, 1))
+        recent, _ = resize.render(50, 50, self.name)
+        size = os.path.getsize(old) + os.path.getsize(recent)
+        with override_settings(RESIZE_CACHE_MAX_SIZE=size):
+            newest, _ = resize.render(60, 60, self.name)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(newest))
+        resize.evict(limit=0)
+        self.assertEqual(self.cached_files(), [])
+        self.assertEqual(cache.get(resize.TOTAL_KEY), 0)
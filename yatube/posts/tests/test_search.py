@@ -0,0 +1,122 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from .constant_list import USERNAME
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Чебурашка <b>ищет</b> друзей',
+        )
+        cls.relevant_post = Post.objects.create(
+            author=cls.user,
+            text='Чебурашка, Чебурашка и крокодил Гена',
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user,
+            text='Старуха Шапокляк',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response, list(response.context['page_obj'])
+
+    def test_search_ranks_and_highlights(self):
+        """Поиск возвращает подходящие посты по релевантности."""
+        response, posts = self.search('чебураш')
+        self.assertEqual(posts, [self.relevant_post, self.post])
+        self.assertContains(response, '<mark>Чебурашка</mark>')
+
+    def test_snippet_is_escaped(self):
+        """HTML из текста поста экранируется в сниппете."""
+        response, posts = self.search('друзей')
+        self.assertEqual(posts, [self.post])
+        self.assertContains(response, '&lt;b&gt;ищет&lt;/b&gt;')
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other_post.text = 'Крокодил Гена'
+        self.other_post.save()
+        self.assertIn(self.other_post, self.search('гена')[1])
+        self.assertEqual(self.search('шапокляк')[1], [])
+        Post.objects.filter(pk=self.other_post.pk).delete()
+        self.assertNotIn(self.other_post, self.search('гена')[1])
+
+    def test_special_characters_do_not_break_search(self):
+        """Спецсимволы FTS5 в запросе не приводят к ошибке."""
+        for query in ('"', 'AND OR', '*', 'NEAR(', '(^)', ''):
+            with self.subTest(query=query):
+                response, posts = self.search(query)
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pagination_keeps_query(self):
+        """Курсорные ссылки сохраняют поисковый запрос."""
+        response, posts = self.search('чебурашка')
+        page_obj = response.context['page_obj']
+        self.assertContains(response, 'q=%D1%87')
+        response, next_posts = self.search(
+            'чебурашка', after=page_obj.next_cursor
+        )
+        self.assertEqual(posts + next_posts, [self.relevant_post, self.post])
+        previous_cursor = response.context['page_obj'].previous_cursor
+        response, previous_posts = self.search(
+            'чебурашка', before=previous_cursor
+        )
+        self.assertEqual(previous_posts, posts)
+
+    def test_rebuild_search_index_command(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(self.search('шапокляк')[1], [])
+        call_command(
+            'rebuild_search_index', chunk_size=1, stdout=StringIO()
+        )
+        self.assertEqual(self.search('шапокляк')[1], [self.other_post])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке использует полнотекстовый индекс."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'шапокляк'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other_post]
+        )
+
+    def test_search_without_index_falls_back_to_contains(self):
+        """Без FTS5 поиск находит подстроку, а не падает."""
+        with mock.patch.object(search, 'is_available', return_value=False):
+            response, posts = self.search('Чебурашка')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(posts, [self.relevant_post, self.post])
+            self.assertContains(response, 'Чебурашка &lt;b&gt;ищет')
@@ -0,0 +1,130 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+from .constant_list import (GROUP_DESCRIPTION, GROUP_SLUG, GROUP_TITLE,
+                            NEW_POST_TEXT, POST_TEXT, USERNAME)
+
+User = get_user_model()
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username=USERNAME, first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE, slug=GROUP_SLUG, description=GROUP_DESCRIPTION
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text=POST_TEXT, group=cls.group
+        )
+        Post.objects.create(author=cls.author, text=NEW_POST_TEXT)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def feed(self, name, feed_format, **kwargs):
+        return reverse(
+            f'posts:{name}', kwargs={'feed_format': feed_format, **kwargs}
+        )
+
+    def test_formats(self):
+        response = self.client.get(self.feed('index_feed', 'rss'))
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/rss+xml'
+        ))
+        channel = ElementTree.fromstring(response.content).find('channel')
+        self.assertEqual(len(channel.findall('item')), 2)
+        response = self.client.get(self.feed('index_feed', 'atom'))
+        self.assertIn(b'xmlns="http://www.w3.org/2005/Atom"',
+                      response.content)
+        response = self.client.get(self.feed('index_feed', 'json'))
+        feed = json.loads(response.content)
+        self.assertEqual(feed['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual(feed['items'][0]['content_text'], NEW_POST_TEXT)
+        self.assertEqual(feed['items'][0]['authors'][0], {
+            'name': 'Лев Толстой',
+            'url': f'http://testserver/profile/{USERNAME}/',
+        })
+        self.assertTrue(feed['items'][1]['url'].endswith(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ))
+        self.assertEqual(feed['items'][1]['tags'], [GROUP_TITLE])
+        self.assertEqual(
+            self.client.get(self.feed('index_feed', 'xml')).status_code, 404
+        )
+
+    def test_group_and_author_feeds(self):
+        feed = json.loads(self.client.get(
+            self.feed('group_feed', 'json', slug=GROUP_SLUG)
+        ).content)
+        self.assertEqual([item['content_text'] for item in feed['items']],
+                         [POST_TEXT])
+        feed = json.loads(self.client.get(
+            self.feed('profile_feed', 'json', username=USERNAME)
+        ).content)
+        self.assertEqual(len(feed['items']), 2)
+        for address in (self.feed('group_feed', 'rss', slug='nope'),
+                        self.feed('profile_feed', 'rss', username='nobody')):
+            with self.subTest(address=address):
+                self.assertEqual(self.client.get(address).status_code, 404)
+
+    @override_settings(SYNDICATION_ITEMS=1)
+    def test_feed_is_bounded(self):
+        feed = json.loads(
+            self.client.get(self.feed('index_feed', 'json')).content
+        )
+        self.assertEqual(len(feed['items']), 1)
+
+    def test_feed_is_cached_until_posts_change(self):
+        """Готовая лента берется из кэша; новый пост ее сбрасывает."""
+        address = self.feed('group_feed', 'json', slug=GROUP_SLUG)
+        self.client.get(address)
+        # Без кэша страниц: ключ ленты проверяется сам по себе.
+        client = Client()
+        client.force_login(self.author)
+        with self.assertNumQueries(4):
+            # Сессия, пользователь, валидаторы и группа; постов не читаем.
+            client.get(address)
+        Post.objects.create(
+            author=self.author, text='Свежий пост', group=self.group
+        )
+        feed = json.loads(client.get(address).content)
+        self.assertEqual(feed['items'][0]['content_text'], 'Свежий пост')
+
+    def test_not_modified(self):
+        for address in (
+            self.feed('index_feed', 'rss'),
+            self.feed('group_feed', 'atom', slug=GROUP_SLUG),
+            self.feed('profile_feed', 'json', username=USERNAME),
+        ):
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertIn('Last-Modified', response)
+                response = self.client.get(
+                    address, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_formats_have_distinct_etags(self):
+        etags = {
+            self.client.get(self.feed('index_feed', feed_format))['ETag']
+            for feed_format in ('rss', 'atom', 'json')
+        }
+        self.assertEqual(len(etags), 3)
+
+    def test_pages_link_feeds(self):
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': GROUP_SLUG})
+        )
+        self.assertContains(
+            response, self.feed('group_feed', 'atom', slug=GROUP_SLUG)
+        )
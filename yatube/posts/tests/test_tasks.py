@@ -0,0 +1,179 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import OperationalError, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+from .constant_list import USERNAME
+
+User = get_user_model()
+
+CALLS = []
+
+
+@tasks.task()
+def record(value):
+    CALLS.append(value)
+
+
+@tasks.task(max_attempts=2)
+def broken(value):
+    raise ValueError(value)
+
+
+@override_settings(TASK_QUEUES={'default': 1, 'email': 1})
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_stores_call(self):
+        tasks.enqueue(record, 'значение')
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'posts.tests.test_tasks.record')
+        self.assertEqual(task.queue, 'default')
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(CALLS, [], 'Задача выполнена при постановке')
+
+    def test_idempotency_key(self):
+        tasks.enqueue(record, 1, key='record:1')
+        tasks.enqueue(record, 1, key='record:1')
+        tasks.enqueue(record, 2, key='record:2')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_rolled_back_request_drops_task(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                tasks.enqueue(record, 1)
+                raise RuntimeError
+        self.assertFalse(Task.objects.exists())
+
+    def test_work_runs_ready_tasks(self):
+        tasks.enqueue(record, 1)
+        tasks.enqueue(record, 2)
+        tasks.enqueue(record, 3, delay=60)
+        self.assertEqual(tasks.work('default', 'test', once=True), 2)
+        self.assertEqual(CALLS, [1, 2])
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE, slot=None).count(), 2
+        )
+        self.assertTrue(Task.objects.filter(status=Task.QUEUED).exists())
+
+    def test_failed_task_is_retried_with_backoff(self):
+        tasks.enqueue(broken, 'ошибка')
+        start = timezone.now()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.work('default', 'test', once=True)
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('ValueError: ошибка', task.error)
+        self.assertGreaterEqual(task.run_at, start + timedelta(seconds=5))
+        self.assertLessEqual(
+            task.run_at, timezone.now() + timedelta(seconds=10)
+        )
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.work('default', 'test', once=True)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    def test_failed_task_can_be_enqueued_again(self):
+        tasks.enqueue(broken, 1, key='broken:1')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.work('default', 'test', once=True)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.work('default', 'test', once=True)
+        tasks.enqueue(broken, 1, key='broken:1')
+        tasks.enqueue(broken, 1, key='broken:1')
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('status', flat=True)),
+            [Task.FAILED, Task.QUEUED]
+        )
+
+    def test_database_error_does_not_stop_worker(self):
+        stop = threading.Event()
+        calls = []
+
+        def claim(queue, worker):
+            calls.append(worker)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            stop.set()
+
+        with mock.patch.object(tasks, 'claim', claim), \
+                mock.patch.object(tasks, 'backoff', return_value=0), \
+                self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.work('default', 'test', stop), 0)
+        self.assertEqual(len(calls), 2)
+
+    def test_backoff_doubles_up_to_limit(self):
+        with self.settings(TASK_RETRY_DELAY=10, TASK_RETRY_DELAY_MAX=60):
+            self.assertTrue(10 <= tasks.backoff(2) <= 20)
+            self.assertTrue(30 <= tasks.backoff(10) <= 60)
+
+    def test_queue_concurrency_limit(self):
+        tasks.enqueue(record, 1)
+        tasks.enqueue(record, 2)
+        first = tasks.claim('default', 'first')
+        self.assertEqual(first.slot, 0)
+        self.assertIsNone(
+            tasks.claim('default', 'second'), 'Очередь превысила свой предел'
+        )
+        tasks.execute(first)
+        self.assertEqual(tasks.claim('default', 'second').args, '[2]')
+
+    def test_abandoned_task_is_taken_over(self):
+        tasks.enqueue(record, 1)
+        abandoned = tasks.claim('default', 'dead')
+        Task.objects.update(locked_until=timezone.now())
+        task = tasks.claim('default', 'alive')
+        self.assertEqual((task.pk, task.slot), (abandoned.pk, abandoned.slot))
+        self.assertEqual(task.attempts, 2)
+        tasks.execute(abandoned)
+        self.assertEqual(
+            Task.objects.get().status, Task.RUNNING,
+            'Старый обработчик завершил чужую задачу'
+        )
+        tasks.execute(task)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_purge_frees_idempotency_key(self):
+        tasks.enqueue(record, 1, key='record:1')
+        tasks.enqueue(broken, 1)
+        Task.objects.filter(name=broken.task_name).update(max_attempts=1)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.work('default', 'test', once=True)
+        self.assertEqual(tasks.purge(), 0)
+        Task.objects.update(updated_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(tasks.purge(), 2)
+        tasks.enqueue(record, 1, key='record:1')
+        self.assertTrue(Task.objects.filter(status=Task.QUEUED).exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        tasks.enqueue(record, [1, 2])
+        self.assertEqual(CALLS, [[1, 2]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_password_reset_email_is_queued(self):
+        User.objects.create_user(
+            username=USERNAME, email='boris@example.com', password='secret'
+        )
+        response = Client().post(
+            reverse('users:password_reset'), {'email': 'boris@example.com'}
+        )
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(mail.outbox, [], 'Письмо отправлено в запросе')
+        self.assertEqual(Task.objects.get().queue, 'email')
+        self.assertEqual(tasks.work('email', 'test', once=True), 1)
+        self.assertEqual(mail.outbox[0].to, ['boris@example.com'])
@@ -0,0 +1,207 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import generations, thumbnails
+from ..models import Post
+from ..storage import content_storage
+from .constant_list import NEW_POST_TEXT, POST_TEXT, USERNAME
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text=POST_TEXT,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        cls.missing = Post.objects.create(
+            author=cls.user,
+            text=NEW_POST_TEXT,
+            image='posts/missing.gif',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def thumbnail_files(self):
+        return [
+            name for _, _, names in os.walk(TEMP_MEDIA_ROOT) for name in names
+        ]
+
+    def test_pages_render_placeholder_without_resizing(self):
+        """Пока миниатюр нет, страницы показывают заглушку и не ресайзят."""
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': USERNAME}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        files = self.thumbnail_files()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, 'data:image/jpeg;base64,')
+                self.assertNotContains(response, '/media/cache/')
+        self.assertEqual(self.thumbnail_files(), files)
+
+    def test_upload_stores_image_metadata(self):
+        """Размеры, вес и превью картинки сохраняются в посте."""
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (1, 1)
+        )
+        self.assertEqual(self.post.image_size, len(SMALL_GIF))
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        self.assertIsNone(self.missing.image_width)
+
+    def test_listing_does_not_touch_storage(self):
+        """Карточки с размерами и превью рендерятся без чтения файлов."""
+        thumbnails.pregenerate(self.post.pk)
+        cache.clear()
+        with mock.patch.object(
+            content_storage, 'open', side_effect=AssertionError
+        ), mock.patch.object(
+            content_storage, 'exists', side_effect=AssertionError
+        ):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="100" height="100"')
+        self.assertContains(response, self.post.image_placeholder)
+
+    def test_backfill_image_metadata_command(self):
+        """Команда заполняет размеры у старых постов и пропускает битые."""
+        Post.objects.update(
+            image_width=None, image_height=None, image_size=None,
+            image_placeholder=''
+        )
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('Обновлено постов: 1, нечитаемых файлов: 1',
+                      out.getvalue())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (1, 1))
+        self.assertEqual(post.image_placeholder, self.post.image_placeholder)
+
+    def test_pregenerate_checks_existing_files_at_once(self):
+        """Готовые миниатюры проверяются одним запросом, а не по файлу."""
+        thumbnails.pregenerate(self.post.pk)
+        cache.clear()
+        # Пост и записи хранилища ключей sorl.
+        with self.assertNumQueries(2):
+            self.assertEqual(thumbnails.pregenerate(self.post.pk), 0)
+
+    def test_pregenerate_expires_only_its_card(self):
+        """Новые миниатюры меняют дату поста, но не поколение постов."""
+        version = generations.version([generations.POSTS])
+        thumbnails.pregenerate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertGreater(post.updated_at, self.post.updated_at)
+        self.assertEqual(generations.version([generations.POSTS]), version)
+
+    def test_pregenerate_creates_every_variant(self):
+        """Все варианты создаются заранее, а шаблон их только находит."""
+        # Основная миниатюра и половинная версия каждого варианта.
+        self.assertEqual(
+            thumbnails.pregenerate(self.post.pk),
+            2 * len(settings.THUMBNAIL_VARIANTS)
+        )
+        self.assertEqual(thumbnails.pregenerate(self.post.pk), 0)
+        for name in settings.THUMBNAIL_VARIANTS:
+            with self.subTest(variant=name):
+                image = thumbnails.lookup(self.post.image, name)
+                self.assertIsNotNone(image.url)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, '/media/cache/')
+
+    def test_missing_source_keeps_placeholder(self):
+        """Для отсутствующего файла миниатюр нет, страница не падает."""
+        self.assertEqual(thumbnails.pregenerate(self.missing.pk), 0)
+        image = thumbnails.lookup(self.missing.image, 'detail')
+        self.assertIsNone(image.url)
+        self.assertEqual((image.width, image.height), (600, 600))
+
+    def test_page_thumbnails_are_found_in_one_batch(self):
+        """Миниатюры страницы находятся одним get_many и одним запросом."""
+        thumbnails.pregenerate(self.post.pk)
+        cache.clear()
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            thumbnails.annotate(posts, 'wide')
+        with self.assertNumQueries(0):
+            thumbnails.annotate(posts, 'wide')
+        found = {post: post.thumbnails['wide'] for post in posts}
+        self.assertIsNotNone(found[self.post].url)
+        self.assertIsNone(found[self.missing].url)
+
+    def test_listing_uses_batched_thumbnails(self):
+        """Страница списка не ищет миниатюры по одной карточке."""
+        thumbnails.pregenerate(self.post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '/media/cache/')
+        lookups = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    @override_settings(RESPONSIVE_FORMATS=('PNG', 'NOSUCHFORMAT'))
+    def test_picture_lists_responsive_versions(self):
+        """<picture> перечисляет ширины и доступные Pillow форматы."""
+        self.assertEqual(thumbnails.available_formats(), ['PNG'])
+        thumbnails.pregenerate(self.post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, '<source type="image/png"')
+        self.assertContains(response, ' 300w, ', count=2)
+        self.assertContains(response, ' 600w"', count=2)
+
+    def test_image_size_report_command(self):
+        """Отчет сравнивает размер версий с исходниками."""
+        out = StringIO()
+        call_command('image_size_report', stdout=out)
+        self.assertIn('Исходников: 1', out.getvalue())
+        self.assertIn('detail', out.getvalue())
+
+    def test_benchmark_command(self):
+        """Бенчмарк сравнивает поиск по карточке и пачкой."""
+        out = StringIO()
+        call_command('benchmark_thumbnail_lookups', stdout=out)
+        self.assertIn('annotate страницы', out.getvalue())
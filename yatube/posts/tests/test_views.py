@@ -9,6 +9,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from .. import generations
 from ..models import Group, Post
 from .constant_list import (GROUP_DESCRIPTION, GROUP_SLUG, GROUP_TITLE,
                             NEW_GROUP_DESCRIPTION, NEW_GROUP_POST_TEXT,
@@ -227,8 +228,8 @@ class PostViewTests(TestCase):
         """Кэш index сформирован с правильным контекстом."""
         response = self.client.get(reverse('posts:index'))
         content_with_post = response.content
-        post_delete = Post.objects.get(pk=self.post.id)
-        post_delete.delete()
+        # Обновление в обход сигналов не сбрасывает фрагмент из кэша
+        Post.objects.filter(pk=self.post.id).update(text=NEW_POST_TEXT)
         response = self.client.get(reverse('posts:index'))
         cache_content = response.content
         self.assertEqual(content_with_post, cache_content)
@@ -236,3 +237,93 @@ class PostViewTests(TestCase):
         response = self.client.get(reverse('posts:index'))
         clear_cache_content = response.content
         self.assertNotEqual(content_with_post, clear_cache_content)
+
+    def test_local_cache_shortens_timeouts(self):
+        """В кэше процесса поколения и фрагменты живут недолго."""
+        with self.settings(LOCAL_CACHE_TIMEOUT=20):
+            self.assertEqual(generations.timeout(), 20)
+            self.assertEqual(
+                generations.context(generations.POSTS)['cache_timeout'], 20
+            )
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}
+        with self.settings(CACHES=shared):
+            self.assertIsNone(generations.timeout())
+            self.assertEqual(
+                generations.timeout(settings.FRAGMENT_CACHE_TIMEOUT),
+                settings.FRAGMENT_CACHE_TIMEOUT
+            )
+
+    def test_post_changes_expire_cached_fragments(self):
+        """Изменение поста сразу сбрасывает кэш страниц со списками."""
+        links = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for link in links:
+            self.client.get(link)
+        post = Post.objects.get(pk=self.post.id)
+        post.text = NEW_POST_TEXT
+        post.save()
+        for link in links:
+            with self.subTest(link=link):
+                response = self.client.get(link)
+                self.assertContains(response, NEW_POST_TEXT)
+
+    def test_author_rename_expires_cached_fragments(self):
+        """Переименование автора сбрасывает кэш страницы группы."""
+        link = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        self.client.get(link)
+        self.user.first_name = 'Чебурашка'
+        self.user.save()
+        self.assertContains(self.client.get(link), 'Чебурашка')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text=POST_TEXT,
+            group=cls.group,
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user,
+            text=NEW_GROUP_POST_TEXT,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_edit_rerenders_only_changed_card(self):
+        """Правка поста перерисовывает только его карточку."""
+        self.client.get(reverse('posts:index'))
+        # Обновление в обход сигналов: карточка остается в кэше
+        Post.objects.filter(pk=self.other_post.pk).update(text='Устарело')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = NEW_POST_TEXT
+        post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, NEW_POST_TEXT)
+        self.assertContains(response, NEW_GROUP_POST_TEXT)
+        self.assertNotContains(response, 'Устарело')
+
+    def test_group_change_rerenders_its_cards(self):
+        """Изменение группы перерисовывает карточки ее постов."""
+        self.client.get(reverse('posts:index'))
+        self.group.slug = NEW_GROUP_SLUG
+        self.group.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            reverse('posts:group_posts', kwargs={'slug': NEW_GROUP_SLUG})
+        )
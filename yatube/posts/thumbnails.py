@@ -0,0 +1,283 @@
+"""
+Миниатюры постов, подготовленные заранее.
+
+Все варианты из THUMBNAIL_VARIANTS создаются фоновой задачей очереди
+thumbnails сразу после сохранения картинки, а шаблоны только ищут готовую
+миниатюру в хранилище ключей sorl и, пока ее нет, показывают заглушку.
+Так первый посетитель нового поста не ждет декодирования и ресайза.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+from sorl.thumbnail.parsers import parse_geometry
+
+from core import tasks
+
+from . import batch
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+Spec = Tuple[Optional[str], int, str, Dict[str, Any]]
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+}
+
+
+class Placeholder:
+    """Заглушка размером с будущую миниатюру."""
+    url = None
+    srcset = ''
+    sources = ()
+
+    def __init__(self, geometry: str, preview: str = '') -> None:
+        self.width, self.height = parse_geometry(geometry)
+        self.preview = preview
+
+
+def _preview(image: Any) -> str:
+    """Превью, сохраненное в посте картинки, если это поле модели."""
+    post = getattr(image, 'instance', None)
+    return getattr(post, 'image_placeholder', '')
+
+
+def variant(name: str) -> Tuple[str, Dict[str, Any]]:
+    geometry, options = settings.THUMBNAIL_VARIANTS[name]
+    return geometry, dict(options)
+
+
+def available_formats() -> List[str]:
+    """Форматы RESPONSIVE_FORMATS, которые умеет сохранять этот Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.RESPONSIVE_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def specs(name: str) -> List[Spec]:
+    """
+    Все файлы варианта name: (формат, ширина 1x, геометрия, параметры).
+
+    Формат None - формат основной миниатюры, ею же остается масштаб 1.
+    """
+    geometry, options = variant(name)
+    width, height = parse_geometry(geometry)
+    result = []
+    for image_format in [None] + available_formats():
+        for scale in settings.RESPONSIVE_SCALES:
+            spec_options = dict(options)
+            if image_format is not None:
+                spec_options['format'] = image_format
+            result.append((
+                image_format,
+                round(width * scale),
+                f'{round(width * scale)}x{round(height * scale)}',
+                spec_options,
+            ))
+    return result
+
+
+def thumbnail_file(source: Any, geometry: str,
+                   options: Dict[str, Any]) -> ImageFile:
+    """
+    Миниатюра, которую создал бы get_thumbnail(), без обращения к диску.
+
+    Параметры дополняются так же, как в ThumbnailBackend.get_thumbnail(),
+    иначе имя файла и ключ в хранилище не совпадут.
+    """
+    backend = ThumbnailBackend()
+    source = ImageFile(source)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _fetch(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Записи хранилища ключей sorl одним get_many и одним key IN (...).
+
+    Как и sorl, запоминает в кэше отсутствие записи, чтобы не ходить
+    за ней в базу снова.
+    """
+    keys = set(keys)
+    store = default.kvstore.cache
+    found = store.get_many(keys)
+    missing = keys - set(found)
+    if missing:
+        rows = dict(KVStore.objects.filter(key__in=missing).values_list(
+            'key', 'value'
+        ))
+        fetched = {key: rows.get(key, EMPTY_VALUE) for key in missing}
+        store.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {
+        key: deserialize_image_file(value)
+        for key, value in found.items() if value and value != EMPTY_VALUE
+    }
+
+
+def resolve(images: List[Any], name: str) -> List[Optional[Any]]:
+    """
+    Готовые миниатюры варианта name для картинок; ресайза здесь нет.
+
+    У найденной миниатюры есть srcset в ее формате и sources - список
+    (mime-тип, srcset) в современных форматах. Вместо ненайденной
+    отдается заглушка ее размера. У обеих есть preview - размытое превью
+    из поста, которое видно, пока грузится сама миниатюра.
+    """
+    geometry, options = variant(name)
+    variant_specs = specs(name)
+    keys = {}
+    for index, image in enumerate(images):
+        if not image:
+            continue
+        keys[index, None] = add_prefix(
+            thumbnail_file(image, geometry, dict(options)).key
+        )
+        for number, spec in enumerate(variant_specs):
+            image_format, width, spec_geometry, spec_options = spec
+            keys[index, number] = add_prefix(thumbnail_file(
+                image, spec_geometry, dict(spec_options)
+            ).key)
+    found = _fetch(keys.values())
+    results = []
+    for index, image in enumerate(images):
+        thumbnail = found.get(keys.get((index, None)))
+        if thumbnail is None:
+            results.append(
+                image and Placeholder(geometry, _preview(image)) or None
+            )
+            continue
+        srcsets = {}
+        for number, spec in enumerate(variant_specs):
+            image_format, width, spec_geometry, spec_options = spec
+            file = found.get(keys[index, number])
+            if file is not None:
+                srcsets.setdefault(image_format, []).append(
+                    f'{file.url} {width}w'
+                )
+        thumbnail.srcset = ', '.join(srcsets.pop(None, []))
+        thumbnail.sources = [
+            (MIME_TYPES.get(image_format, ''), ', '.join(srcset))
+            for image_format, srcset in srcsets.items()
+        ]
+        thumbnail.preview = _preview(image)
+        results.append(thumbnail)
+    return results
+
+
+def lookup(image: Any, name: str) -> Optional[Any]:
+    """Готовая миниатюра одной картинки или заглушка."""
+    return resolve([image], name)[0]
+
+
+def annotate(posts: Iterable[Post], name: str) -> None:
+    """
+    Находит миниатюры варианта name для всей страницы сразу.
+
+    Вместо обращения к хранилищу ключей sorl в каждой карточке: один
+    get_many к кэшу и, для промахов, один запрос key IN (...). Результат
+    кладется в post.thumbnails[name], его берет тег post_picture.
+    """
+    posts = list(posts)
+    thumbnails = resolve([post.image for post in posts], name)
+    for post, thumbnail in zip(posts, thumbnails):
+        post.thumbnails = getattr(post, 'thumbnails', {})
+        post.thumbnails[name] = thumbnail
+
+
+def generate(image: Any) -> int:
+    """Создает недостающие файлы всех вариантов; возвращает их число."""
+    if not image.storage.exists(image.name):
+        logger.info('Нет исходника для миниатюр: %s', image.name)
+        return 0
+    files = []
+    for name in settings.THUMBNAIL_VARIANTS:
+        geometry, options = variant(name)
+        files.append((geometry, options))
+        files += [
+            (spec_geometry, spec_options)
+            for _, _, spec_geometry, spec_options in specs(name)
+        ]
+    # Основная миниатюра совпадает с версией масштаба 1 без формата.
+    thumbnails = {}
+    for file_geometry, file_options in files:
+        thumbnail = thumbnail_file(image, file_geometry, dict(file_options))
+        thumbnails.setdefault(
+            add_prefix(thumbnail.key),
+            (thumbnail, file_geometry, file_options)
+        )
+    # Готовые файлы - одним запросом; промахи _fetch запоминает в кэше,
+    # и sorl не проверяет их в базе еще раз по одному.
+    found = _fetch(thumbnails)
+    created = 0
+    for key, (thumbnail, file_geometry, file_options) in thumbnails.items():
+        if key in found:
+            continue
+        default.backend.get_thumbnail(image, file_geometry, **file_options)
+        # Битый исходник sorl не пишет в хранилище ключей,
+        # и пост остается с заглушкой.
+        if default.kvstore.get(thumbnail):
+            created += 1
+    return created
+
+
+@tasks.task(queue='thumbnails')
+def pregenerate(post_id: int) -> int:
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return 0
+    created = generate(post.image)
+    if created:
+        # Новая дата изменения сбрасывает закэшированную карточку с
+        # заглушкой. Без сохранения и его сигналов: миниатюры одного
+        # поста не стоят сброса поколения всех постов, страницы списков
+        # подхватят их по истечении своих фрагментов.
+        Post.objects.filter(pk=post.pk).update(updated_at=timezone.now())
+        batch.forget(post.pk)
+    return created
+
+
+def pregenerate_safely(post_id: int) -> int:
+    """Для пула generate_thumbnails: ошибки пишутся в лог, а не теряются."""
+    try:
+        return pregenerate(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+        return 0
+    finally:
+        connections.close_all()
+
+
+def schedule(post: Post) -> None:
+    """Ставит создание миниатюр в очередь вместе с сохранением поста."""
+    if not post.image:
+        return
+    # Одна задача на файл поста: повторное сохранение ее не дублирует.
+    tasks.enqueue(
+        pregenerate, post.pk, key=f'thumbnails:{post.pk}:{post.image.name}'
+    )
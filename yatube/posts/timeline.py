@@ -0,0 +1,126 @@
+"""
+Материализованные ленты подписок (fan-out-on-write).
+
+Новый пост раскладывается по строкам Timeline всех подписчиков автора,
+поэтому страница /follow/ читается одним диапазоном по индексу
+(user, pub_date). Посты авторов, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, не раскладываются, а подмешиваются при чтении.
+"""
+from itertools import islice
+from typing import Any, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import feeds
+from .models import Follow, Post, Timeline
+from .utils import CursorPaginator, TimelinePaginator, get_paginator_page
+
+
+def bulk_insert(entries: Iterable[Timeline]) -> None:
+    """Вставка строк ленты пачками, не держа их все в памяти."""
+    entries = iter(entries)
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pull_author(author_id: int) -> bool:
+    return Follow.objects.filter(author_id=author_id, fanout=False).exists()
+
+
+def pull_authors(author_ids: Iterable[int]) -> Set[int]:
+    """is_pull_author для многих авторов одним запросом."""
+    return set(Follow.objects.filter(
+        author_id__in=list(author_ids), fanout=False
+    ).values_list('author_id', flat=True).distinct())
+
+
+def fan_out_post(post: Post) -> List[int]:
+    """Раскладывает пост по лентам подписчиков; возвращает их id."""
+    followers = Follow.objects.filter(author_id=post.author_id, fanout=True)
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if followers[limit:limit + 1].exists():
+        # Автор стал слишком популярным: его посты теперь читаются
+        # подписчиками при показе ленты, а не раскладываются по ним.
+        followers.update(fanout=False)
+        feeds.touch(feeds.EPOCH)
+        return []
+    user_ids = list(followers.values_list('user_id', flat=True))
+    bulk_insert(
+        Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in user_ids
+    )
+    return user_ids
+
+
+def backfill(follow: Follow) -> None:
+    if follow.fanout:
+        backfill_authors(follow.user_id, [follow.author_id])
+
+
+def backfill_authors(user_id: int, author_ids: Iterable[int]) -> None:
+    """Переносит посты авторов в ленту user_id одним запросом к постам."""
+    posts = Post.objects.filter(author_id__in=list(author_ids))
+    bulk_insert(
+        Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.values_list('pk', 'pub_date').iterator()
+    )
+
+
+def prune(follow: Follow) -> None:
+    prune_authors(follow.user_id, [follow.author_id])
+
+
+def prune_authors(user_id: int, author_ids: Iterable[int]) -> None:
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id__in=list(author_ids)
+    ).delete()
+
+
+def rebuild() -> int:
+    """Пересобирает все ленты с нуля; возвращает число подписок."""
+    Timeline.objects.all().delete()
+    Follow.objects.update(fanout=True)
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    authors = Follow.objects.values_list('author_id', flat=True).distinct()
+    follows = 0
+    for author_id in authors.iterator():
+        followers = Follow.objects.filter(author_id=author_id)
+        if followers[limit:limit + 1].exists():
+            followers.update(fanout=False)
+        for follow in followers.iterator():
+            backfill(follow)
+            follows += 1
+    feeds.touch(feeds.EPOCH)
+    return follows
+
+
+def follow_rows(user: Any) -> Tuple[Any, List[int]]:
+    """
+    Строки ленты подписок и авторы, чьи посты читаются по запросу.
+
+    Пока таких авторов нет, строки - записи Timeline. Иначе лента
+    читается из постов: материализованные записи плюс посты этих авторов.
+    """
+    pull_authors = list(
+        user.follower.filter(fanout=False).values_list('author', flat=True)
+    )
+    if not pull_authors:
+        return Timeline.objects.filter(user=user), pull_authors
+    return Post.objects.filter(
+        Q(pk__in=Timeline.objects.filter(user=user).values('post'))
+        | Q(author__in=pull_authors)
+    ), pull_authors
+
+
+def get_follow_page(request: Any, user: Any) -> Any:
+    rows, pull_authors = follow_rows(user)
+    if not pull_authors:
+        entries = rows.select_related('post__author', 'post__group')
+        return get_paginator_page(request, entries, TimelinePaginator)
+    post_list = rows.select_related('author', 'group')
+    return get_paginator_page(request, post_list, CursorPaginator)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -8,7 +8,18 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('feed/<str:feed_format>/', views.index_feed, name='index_feed'),
+    path(
+        'group/<slug:slug>/feed/<str:feed_format>/',
+        views.group_feed, name='group_feed'
+    ),
+    path(
+        'profile/<str:username>/feed/<str:feed_format>/',
+        views.profile_feed, name='profile_feed'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
+    path('export/<str:kind>/', views.export_content, name='export'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -16,6 +27,7 @@ urlpatterns = [
         views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -25,5 +37,37 @@ urlpatterns = [
         'profile/<str:username>/unfollow/',
         views.profile_unfollow,
         name='profile_unfollow'
-    )
+    ),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/posts/batch/', api.post_batch, name='api_post_batch'),
+    path('api/posts/since/', api.post_since, name='api_posts_since'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comment_list, name='api_comments'
+    ),
+    path('api/groups/', api.group_list, name='api_groups'),
+    path('api/groups/<slug:slug>/', api.group_detail, name='api_group'),
+    path(
+        'api/groups/<slug:slug>/posts/',
+        api.group_post_list, name='api_group_posts'
+    ),
+    path(
+        'api/groups/<slug:slug>/posts/since/',
+        api.group_post_since, name='api_group_posts_since'
+    ),
+    path(
+        'api/profiles/<str:username>/',
+        api.profile_detail, name='api_profile'
+    ),
+    path(
+        'api/profiles/<str:username>/posts/',
+        api.profile_post_list, name='api_profile_posts'
+    ),
+    path(
+        'api/profiles/<str:username>/posts/since/',
+        api.profile_post_since, name='api_profile_posts_since'
+    ),
+    path('api/follow/', api.follow_list, name='api_follow'),
+    path('api/follow/since/', api.follow_since, name='api_follow_since'),
 ]
@@ -1,10 +1,178 @@
-from typing import Any
+import sys
+from datetime import datetime
+from math import ceil
+from typing import Any, List, Optional, Tuple
 
 from django.conf import settings
 from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
+CURSOR_AFTER = 'after'
+CURSOR_BEFORE = 'before'
+CURSOR_SEPARATOR = '|'
 
-def get_paginator_page(request: Any, query_set: Any) -> Page:
-    paginator = Paginator(query_set, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(pub_date: datetime, pk: int) -> str:
+    """Непрозрачный курсор по ключу (pub_date, id) поста."""
+    raw = f'{pub_date.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    if not cursor:
+        return None
+    try:
+        raw = force_str(urlsafe_base64_decode(cursor))
+        pub_date, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу (pub_date, id).
+
+    Страница выбирается одним запросом LIMIT per_page + 1 по индексу,
+    без COUNT(*) и OFFSET, поэтому ее стоимость не зависит от глубины.
+    """
+    is_cursor = True
+    key_fields = ('pub_date', 'pk')
+
+    def __init__(self, object_list: Any, per_page: int) -> None:
+        super().__init__(
+            object_list.order_by(*(f'-{key}' for key in self.key_fields)),
+            per_page
+        )
+
+    def page_after(self, cursor: Optional[Cursor] = None) -> Page:
+        query_set = self.object_list
+        if cursor is not None:
+            query_set = query_set.filter(self._key_filter(cursor, 'lt'))
+        items = list(query_set[:self.per_page + 1])
+        return self._build_page(
+            items[:self.per_page],
+            has_previous=cursor is not None,
+            has_next=len(items) > self.per_page,
+        )
+
+    def page_before(self, cursor: Cursor) -> Page:
+        query_set = self.object_list.filter(
+            self._key_filter(cursor, 'gt')
+        ).order_by(*self.key_fields)
+        items = list(query_set[:self.per_page + 1])
+        return self._build_page(
+            items[:self.per_page][::-1],
+            has_previous=len(items) > self.per_page,
+            has_next=True,
+        )
+
+    def page_number(self, number: int) -> Page:
+        """Старые ссылки вида ?page=N: OFFSET, но без подсчета записей."""
+        offset = (number - 1) * self.per_page
+        items = []
+        # OFFSET больше целого базы - заведомо за концом ленты.
+        if offset + self.per_page + 1 <= sys.maxsize:
+            items = list(self.object_list[offset:offset + self.per_page + 1])
+        if not items and number > 1:
+            # Закладка указывает за конец ленты: как и Paginator.get_page,
+            # отдаем последнюю страницу. COUNT нужен только в этом случае.
+            return self.page_number(max(1, ceil(self.count / self.per_page)))
+        return self._build_page(
+            items[:self.per_page],
+            has_previous=number > 1,
+            has_next=len(items) > self.per_page,
+            number=number,
+        )
+
+    def page_objects(self, items: List[Any]) -> List[Any]:
+        return items
+
+    def _key_filter(self, cursor: Cursor, lookup: str) -> Q:
+        date_field, id_field = self.key_fields
+        pub_date, pk = cursor
+        return (
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__{lookup}': pk})
+        )
+
+    def _cursor(self, item: Any) -> str:
+        return encode_cursor(
+            *(getattr(item, key) for key in self.key_fields)
+        )
+
+    def _build_page(self, items: List[Any], has_previous: bool,
+                    has_next: bool, number: Optional[int] = None) -> Page:
+        if number is None:
+            number = 2 if has_previous else 1
+        # Page.has_next() и has_previous() опираются на number и num_pages,
+        # поэтому num_pages задаем по наличию соседней страницы.
+        self.num_pages = number + 1 if has_next else number
+        page = self._get_page(self.page_objects(items), number, self)
+        page.next_cursor = (
+            self._cursor(items[-1]) if has_next and items else None
+        )
+        page.previous_cursor = (
+            self._cursor(items[0]) if has_previous and items else None
+        )
+        return page
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок по материализованной таблице Timeline."""
+    key_fields = ('pub_date', 'post_id')
+
+    def page_objects(self, items: List[Any]) -> List[Any]:
+        return [entry.post for entry in items]
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    """CursorPaginator по кортежам values_list; ключ - последние колонки."""
+
+    def __init__(self, object_list: Any, per_page: int,
+                 key_fields: Tuple[str, str] = ('pub_date', 'pk')) -> None:
+        self.key_fields = key_fields
+        super().__init__(object_list, per_page)
+
+    def _cursor(self, item: Any) -> str:
+        return encode_cursor(*item[-len(self.key_fields):])
+
+
+def get_paginator_page(request: Any, query_set: Any,
+                       paginator_class: Any = CursorPaginator) -> Page:
+    page = _get_cursor_page(request, query_set, paginator_class)
+    # Позиция страницы в ленте: ключ для кэша фрагментов вместо number,
+    # который у курсорных страниц не уникален.
+    page.position = '&'.join(
+        f'{key}={request.GET[key]}'
+        for key in (CURSOR_BEFORE, CURSOR_AFTER, 'page')
+        if request.GET.get(key)
+    )
+    return page
+
+
+def _get_cursor_page(request: Any, query_set: Any,
+                     paginator_class: Any) -> Page:
+    paginator = paginator_class(query_set, settings.POSTS_PER_PAGE)
+    before = decode_cursor(request.GET.get(CURSOR_BEFORE))
+    if before is not None:
+        return paginator.page_before(before)
+    after = decode_cursor(request.GET.get(CURSOR_AFTER))
+    if after is not None:
+        return paginator.page_after(after)
+    try:
+        number = int(request.GET.get('page', 1))
+    except (TypeError, ValueError):
+        number = 1
+    if number > 1:
+        return paginator.page_number(number)
+    return paginator.page_after()
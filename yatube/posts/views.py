@@ -1,70 +1,108 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import Http404
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.db import transaction
+from django.http import (FileResponse, Http404, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST, require_safe
+from PIL import Image
 
-from .forms import CommentForm, PostForm
+from . import (counters, exporter, follows, generations, resize,
+               syndication, thumbnails)
+from .conditional import (conditional_page, feed_validators,
+                          group_validators, index_validators,
+                          post_validators, profile_validators)
+from .forms import CommentForm, ExportForm, PostForm
 from .models import Follow, Group, Post, User
+from .search import get_search_page
+from .timeline import get_follow_page
 from .utils import get_paginator_page
 
 
+@conditional_page(index_validators)
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.select_related()
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = get_paginator_page(request, post_list)
+    generations.annotate_cards(page_obj)
+    thumbnails.annotate(page_obj, 'compact')
     context = {
         'title': title,
         'page_obj': page_obj,
+        **generations.context(generations.POSTS),
     }
     return render(request, template, context)
 
 
+@conditional_page(group_validators)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     title = "Записи сообщества: " + group.__str__()
 
-    post_list = Post.objects.filter(group=group)
-    if not post_list.exists():
+    # Счетчик равен нулю и у групп, загруженных loaddata: проверяем посты.
+    if not group.posts_count and not group.posts.exists():
         raise Http404()
+    post_list = group.posts.select_related('author')
     page_obj = get_paginator_page(request, post_list)
+    generations.annotate_cards(page_obj)
+    thumbnails.annotate(page_obj, 'wide')
 
     context = {
         'title': title,
         'group': group,
         'page_obj': page_obj,
+        **generations.context(
+            generations.group(group.pk), generations.USERS
+        ),
     }
     return render(request, template, context)
 
 
+@conditional_page(profile_validators)
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(author=user, user=request.user).exists()
     )
 
-    post_list = user.posts.all()
+    post_list = user.posts.select_related('group')
     title = f'Профайл пользователя {user}'
 
-    count = post_list.count()
+    count = counters.posts_count(user)
     page_obj = get_paginator_page(request, post_list)
+    generations.annotate_cards(page_obj)
+    thumbnails.annotate(page_obj, 'wide')
     context = {
         'title': title,
         'author': user,
         'page_obj': page_obj,
         'count': count,
         'following': following,
+        **generations.context(
+            generations.profile(user.pk), generations.GROUPS
+        ),
     }
     return render(request, template, context)
 
 
+@conditional_page(post_validators)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    count = Post.objects.filter(author=post.author).count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    count = counters.posts_count(post.author)
+    comments = post.comments.select_related('author')
     form = CommentForm()
     is_edit = post.author == request.user
     title = post.text
@@ -79,7 +117,22 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    title = f'Поиск: {query}' if query else 'Поиск'
+    page_obj = get_search_page(request, query, settings.POSTS_PER_PAGE)
+    context = {
+        'title': title,
+        'query': query,
+        'query_string': urlencode({'q': query}),
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -87,6 +140,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', post.author.username)
     return render(request, template, {'form': form})
 
@@ -103,7 +157,9 @@ def post_edit(request, post_id):
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -114,6 +170,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -125,34 +182,118 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def _feed(feed_class, feed_format):
+    if feed_format not in syndication.FEED_TYPES:
+        raise Http404
+    return feed_class(feed_format)
+
+
+@conditional_page(feed_validators(index_validators))
+def index_feed(request, feed_format):
+    return _feed(syndication.PostFeed, feed_format)(request)
+
+
+@conditional_page(feed_validators(group_validators))
+def group_feed(request, slug, feed_format):
+    return _feed(syndication.GroupFeed, feed_format)(request, slug=slug)
+
+
+@conditional_page(feed_validators(profile_validators))
+def profile_feed(request, username, feed_format):
+    return _feed(syndication.AuthorFeed, feed_format)(
+        request, username=username
+    )
+
+
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Последние обновления'
-    user = request.user
-    authors = user.follower.all().values('author')
-    post_list = Post.objects.filter(author__in=authors)
-    page_obj = get_paginator_page(request, post_list)
+    page_obj = get_follow_page(request, request.user)
+    generations.annotate_cards(page_obj)
+    thumbnails.annotate(page_obj, 'compact')
     context = {
         'title': title,
         'page_obj': page_obj,
+        **generations.context(
+            generations.POSTS, generations.follow(request.user.pk)
+        ),
     }
     return render(request, template, context)
 
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(user=user, author=author)
-    if request.user != author and not following.exists():
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user.pk, [author.pk])
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=author, user=user).delete()
+    follows.unfollow(request.user.pk, [author.pk])
     return redirect('posts:profile', username=author)
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка на авторов списка author или отписка от них."""
+    usernames = request.POST.getlist('author')
+    action = request.POST.get('action', 'follow')
+    if action not in ('follow', 'unfollow'):
+        return HttpResponseBadRequest('Неизвестное действие')
+    if len(usernames) > settings.FOLLOW_BULK_LIMIT:
+        return HttpResponseBadRequest('Слишком много авторов')
+    authors = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('pk', 'username'))
+    changed = getattr(follows, action)(request.user.pk, authors)
+    return JsonResponse({
+        'action': action,
+        'changed': [authors[pk] for pk in changed],
+        'unknown': sorted(set(usernames) - set(authors.values())),
+    })
+
+
+@require_safe
+def resize_image(request, signature, width, height, name):
+    if not resize.is_valid(signature, width, height, name):
+        raise PermissionDenied
+    side = settings.POST_IMAGE_MAX_SIDE
+    if not (0 < width <= side and 0 < height <= side):
+        raise Http404
+    try:
+        path, image_format = resize.render(width, height, name)
+        file = open(path, 'rb')
+    except (OSError, SuspiciousFileOperation):
+        raise Http404
+    response = FileResponse(file, content_type=Image.MIME[image_format])
+    # Имя картинки - хэш содержимого, поэтому копия не устаревает.
+    patch_cache_control(
+        response, public=True, immutable=True,
+        max_age=settings.RESIZE_CACHE_MAX_AGE,
+    )
+    return response
+
+
+@staff_member_required
+@require_safe
+def export_content(request, kind):
+    if kind not in exporter.KINDS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(
+            form.errors.as_text(), content_type='text/plain; charset=utf-8'
+        )
+    export_format = form.cleaned_data['format']
+    response = StreamingHttpResponse(
+        exporter.lines(kind, export_format, **form.filters()),
+        content_type=exporter.CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{exporter.filename(kind, export_format)}"'
+    )
+    return response
@@ -1,5 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+from django.template import loader
+
+from core.tasks import enqueue
+
+from .tasks import send_email
 
 User = get_user_model()
 
@@ -8,3 +13,20 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо собирается в запросе, а отправляется фоновой задачей."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = ''.join(
+            loader.render_to_string(subject_template_name, context)
+            .splitlines()
+        )
+        body = loader.render_to_string(email_template_name, context)
+        html = None
+        if html_email_template_name is not None:
+            html = loader.render_to_string(html_email_template_name, context)
+        enqueue(send_email, subject, body, from_email, [to_email], html)
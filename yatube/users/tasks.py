@@ -0,0 +1,14 @@
+from typing import List, Optional
+
+from django.core.mail import EmailMultiAlternatives
+
+from core.tasks import task
+
+
+@task(queue='email')
+def send_email(subject: str, body: str, from_email: Optional[str],
+               to: List[str], html: Optional[str] = None) -> None:
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
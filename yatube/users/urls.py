@@ -7,6 +7,7 @@ from django.contrib.auth.views import (LoginView, LogoutView,
                                        PasswordResetView)
 from django.urls import path
 
+from .forms import QueuedPasswordResetForm
 from .views import SignUp
 
 app_name = 'users'
@@ -45,7 +46,8 @@ urlpatterns = [
     path(
         'password_reset/',
         PasswordResetView.as_view(
-            template_name='users/password_reset.html'
+            template_name='users/password_reset.html',
+            form_class=QueuedPasswordResetForm
         ),
         name='password_reset'
     ),
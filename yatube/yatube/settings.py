@@ -54,7 +54,9 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'posts.middleware.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryInspectorMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -138,18 +140,131 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+# Размер страницы JSON API по умолчанию и наибольший для ?limit=.
+API_PAGE_SIZE = 20
+API_PAGE_SIZE_MAX = 100
+# Сколько постов можно запросить одним /api/posts/batch/ и сколько
+# секунд сериализованный пост живет в общем кэше (см. LOCAL_CACHE_TIMEOUT).
+API_BATCH_SIZE = 100
+POST_CACHE_TIMEOUT = 60 * 60
+# Лента RSS, Atom и JSON Feed: число постов, длина заголовка поста и
+# срок жизни готовой ленты в общем кэше; изменения постов сбрасывают ее
+# раньше.
+SYNDICATION_ITEMS = 20
+SYNDICATION_TITLE_LENGTH = 60
+SYNDICATION_CACHE_TIMEOUT = 24 * 60 * 60
+# Сколько секунд живет отметка самого нового поста ленты для опроса
+# /since/; при новых постах она пересчитывается раньше. В LocMemCache
+# другие процессы ее не сбрасывают, и срок - FEED_HEAD_LOCAL_TIMEOUT.
+FEED_HEAD_TIMEOUT = 24 * 60 * 60
+FEED_HEAD_LOCAL_TIMEOUT = 5
+
+# Авторы, у которых подписчиков больше лимита, не раскладывают посты
+# по лентам подписчиков: их посты подмешиваются при чтении /follow/.
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BATCH_SIZE = 1000
+# Сколько авторов можно подписать или отписать одним запросом.
+FOLLOW_BULK_LIMIT = 100
+# Сколько строк выгрузка export_content читает из базы за раз.
+EXPORT_CHUNK_SIZE = 2000
+
+# Поиск N+1 и бюджеты SQL-запросов: 'log', 'raise' или None.
+# manage.py test запускается с 'raise' (core.testing.TestRunner).
+QUERY_INSPECTOR_ACTION = 'log'
+NPLUSONE_THRESHOLD = 3
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_posts': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:follow_index': 4,
+    'posts:search': 3,
+}
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+TEST_RUNNER = 'core.testing.TestRunner'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Прием картинок постов: размер файла и число пикселей проверяются
+# по заголовку до декодирования, оригинал ужимается до стороны MAX_SIDE.
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_QUALITY = 85
+# Сколько секунд файл без ссылок хранится до удаления сборщиком мусора.
+POST_IMAGE_GC_GRACE = 60 * 60 * 24
+# Сторона размытого превью, которое хранится в посте и видно до загрузки.
+POST_IMAGE_PLACEHOLDER_SIDE = 16
+
+# Фрагменты сбрасываются сигналами моделей, поэтому в общем кэше могут
+# жить долго.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Кэш страниц posts для анонимов: столько секунд страница свежая,
+# еще столько отдается устаревшая копия, пока один запрос ее пересчитывает.
+PAGE_CACHE_NAMESPACES = ('posts',)
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_STALE_TIMEOUT = 30
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_STATS_HOOK = 'posts.middleware.record_page_cache_event'
+
 THUMBNAIL_PADDING = True
 THUMBNAIL_PADDING_COLOR = '#ffffff'
 
+# Варианты миниатюр, создаваемые заранее: имя -> (геометрия, параметры).
+THUMBNAIL_VARIANTS = {
+    'compact': ('100x100', {'upscale': True}),
+    'wide': ('600x300', {'upscale': False}),
+    'detail': ('600x600', {}),
+}
+# Адаптивные версии миниатюр: доли ширины варианта для srcset и
+# современные форматы для <picture>; недоступные в Pillow пропускаются.
+RESPONSIVE_SCALES = (0.5, 1)
+RESPONSIVE_FORMATS = ('AVIF', 'WEBP')
+
+# Фоновые задачи (core.tasks), их выполняет run_workers: очередь ->
+# сколько ее задач выполняется одновременно во всех процессах.
+TASK_QUEUES = {
+    'default': 2,
+    'email': 1,
+    'thumbnails': 2,
+}
+# Попытки задачи и пауза перед повтором: TASK_RETRY_DELAY секунд,
+# удваивается с каждой попыткой, но не больше TASK_RETRY_DELAY_MAX.
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_RETRY_DELAY_MAX = 60 * 60
+# Задача, не завершенная за столько секунд, считается брошенной
+# и достается другому обработчику.
+TASK_LEASE_TIMEOUT = 10 * 60
+# Как часто свободный обработчик проверяет очередь, в секундах.
+TASK_POLL_INTERVAL = 1
+# Сколько хранятся выполненные и упавшие задачи: до удаления ключи
+# идемпотентности выполненных не дают поставить ту же задачу снова.
+TASK_RETENTION = 7 * 24 * 60 * 60
+# Выполнять задачи сразу при постановке, без run_workers: для отладки
+# и тестов, которым нужен результат задачи.
+TASKS_EAGER = False
+
+# Ресайз по подписанным адресам /media/resize/: каталог копий, его предел
+# в байтах, ожидание чужого кодировщика и срок кэширования в браузере.
+RESIZE_CACHE_ROOT = os.path.join(BASE_DIR, 'resize_cache')
+RESIZE_CACHE_MAX_SIZE = 512 * 1024 * 1024
+RESIZE_LOCK_TIMEOUT = 30
+RESIZE_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Поколения кэша (posts.generations) сбрасывают фрагменты, ленты и посты
+# API во всех процессах, только если кэш у них общий: при нескольких
+# процессах нужен Memcached или Redis. В LocMemCache у каждого процесса
+# свой кэш, и там поколения и зависящие от них записи живут не дольше
+# LOCAL_CACHE_TIMEOUT секунд, какими бы ни были сроки *_CACHE_TIMEOUT.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'my_cache',
     }
 }
+LOCAL_CACHE_TIMEOUT = 20
@@ -18,7 +18,13 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from posts.views import resize_image
+
 urlpatterns = [
+    path(
+        'media/resize/<str:signature>/<int:width>x<int:height>/<path:name>',
+        resize_image, name='resize_image'
+    ),
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),